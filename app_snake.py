@@ -0,0 +1,767 @@
+"""貪吃蛇應用程式：規則（SnakeEngine）、遊戲區的繪圖層與手錶上的 App
+
+main.py 在第一次進入遊戲時才匯入這個模組，返回主畫面後卸載。
+"""
+import time
+import random
+import framebuf
+from array import array
+
+import ui
+from ui import SCREEN_WIDTH, SCREEN_HEIGHT, BLACK, WHITE, RED, GREEN, BLUE, YELLOW, GRAY, TextField
+
+# 遊戲設定
+BLOCK_SIZE = 10
+GRID_WIDTH = 18
+GRID_HEIGHT = 18
+OFFSET_X = (SCREEN_WIDTH - (GRID_WIDTH * BLOCK_SIZE)) // 2
+OFFSET_Y = (SCREEN_HEIGHT - (GRID_HEIGHT * BLOCK_SIZE)) // 2
+CELL_COUNT = GRID_WIDTH * GRID_HEIGHT  # 格子編號 = y * GRID_WIDTH + x
+NO_CELL = -1
+
+# 遊戲區的繪圖方式
+RENDER_DIRECT = 0  # 每個 fill_rect 直接一次 SPI 傳輸
+RENDER_BATCH = 1  # 一幀的繪圖指令合併成最少的 SPI 視窗
+RENDER_FRAMEBUF = 2  # 遊戲區存在 RAM（GS4，16 KB），只傳送變動的區域；需要 v1.20 以上
+RENDER_MODE = RENDER_DIRECT
+RENDER_SCRATCH_PIXELS = GRID_WIDTH * BLOCK_SIZE * BLOCK_SIZE  # 合併視窗的暫存區（3600 位元組）
+RENDER_MAX_RECTS = 8  # 一次最多累積的視窗數
+RENDER_MAX_OPS = 24  # 一次最多累積的繪圖指令數
+RENDER_MERGE_SLACK = BLOCK_SIZE * BLOCK_SIZE  # 合併後多傳的像素不超過一格就合併
+
+# 方向定義
+UP = 0
+RIGHT = 1
+DOWN = 2
+LEFT = 3
+
+# 方向查表：遊戲每一步只查表，不建立 dict 或 tuple
+OPPOSITE = bytes((DOWN, LEFT, UP, RIGHT))
+STEP_X = (0, 1, 0, -1)
+STEP_Y = (-1, 0, 1, 0)
+DIRECTION_NAMES = ("上", "右", "下", "左")
+GAME_DEBUG = False  # True: 印出每次方向改變（會格式化字串、配置記憶體）
+
+# SnakeEngine.step() 的結果
+STEP_MOVED = 0
+STEP_ATE = 1
+STEP_WON = 2  # 吃到食物後棋盤已滿
+STEP_WALL = 3
+STEP_SELF = 4
+STEP_OVER = 5  # 遊戲已經結束，沒有移動
+
+
+def _swap565(color):
+    """framebuf 的 RGB565 是小端序，驅動程式要大端序"""
+    return ((color & 0xFF) << 8) | (color >> 8)
+
+
+class DirectCanvas:
+    """遊戲區繪圖層：直接呼叫驅動程式，並統計 SPI 傳輸（其他模式的比較基準）"""
+    name = "direct"
+    
+    def __init__(self, display):
+        self.display = display
+        self.reset_stats()
+    
+    def reset_stats(self):
+        self.frames = 0  # 有傳輸的幀數
+        self.windows = 0  # SPI 位址視窗（傳輸）次數
+        self.bytes = 0  # 像素資料位元組數
+        self._frame_windows = 0
+    
+    def fill_rect(self, x, y, w, h, color):
+        self.windows += 1
+        self.bytes += w * h * 2
+        self.display.fill_rect(x, y, w, h, color)
+    
+    def reset(self, color):
+        """呼叫端已經把整個遊戲區清成 color"""
+        pass
+    
+    def flush(self):
+        """一幀結束：送出累積的繪圖並計數"""
+        if self.windows != self._frame_windows:
+            self.frames += 1
+            self._frame_windows = self.windows
+    
+    def report(self):
+        frames = self.frames or 1
+        print(f"[繪圖] {self.name}: {self.frames} 幀, 每幀 {self.windows / frames:.1f} 次 SPI 傳輸, "
+              f"{self.bytes // frames} 位元組")
+
+
+class BatchCanvas(DirectCanvas):
+    """把一幀的 fill_rect 合併成最少的 SPI 視窗
+    
+    新矩形落在某個視窗內、或與視窗左右/上下拼成更大的矩形時併入該視窗；
+    與視窗有其他重疊時先送出全部視窗，保持繪圖順序。單色的視窗用 fill_rect，
+    多個指令的視窗先畫進暫存區再以 blit_buffer 一次送出。
+    """
+    name = "batch"
+    
+    def __init__(self, display):
+        super().__init__(display)
+        self.scratch = bytearray(RENDER_SCRATCH_PIXELS * 2)
+        self._targets = {}  # 寬 << 8 | 高 -> (暫存區上的 FrameBuffer, 傳給驅動程式的 memoryview)
+        # 視窗表
+        self.win_x = array('h', [0] * RENDER_MAX_RECTS)
+        self.win_y = array('h', [0] * RENDER_MAX_RECTS)
+        self.win_w = array('h', [0] * RENDER_MAX_RECTS)
+        self.win_h = array('h', [0] * RENDER_MAX_RECTS)
+        self.win_count = 0
+        # 繪圖指令，op_win 是所屬的視窗
+        self.op_x = array('h', [0] * RENDER_MAX_OPS)
+        self.op_y = array('h', [0] * RENDER_MAX_OPS)
+        self.op_w = array('h', [0] * RENDER_MAX_OPS)
+        self.op_h = array('h', [0] * RENDER_MAX_OPS)
+        self.op_color = array('H', [0] * RENDER_MAX_OPS)
+        self.op_win = bytearray(RENDER_MAX_OPS)
+        self.op_count = 0
+    
+    def fill_rect(self, x, y, w, h, color):
+        if w <= 0 or h <= 0:
+            return
+        if self.op_count == RENDER_MAX_OPS:
+            self._send()
+        win = -1
+        x1 = x + w
+        y1 = y + h
+        for i in range(self.win_count):
+            wx = self.win_x[i]
+            wy = self.win_y[i]
+            ww = self.win_w[i]
+            wh = self.win_h[i]
+            if x1 <= wx or x >= wx + ww or y1 <= wy or y >= wy + wh:
+                # 不重疊：同高且左右相鄰、或同寬且上下相鄰時可以拼成一個視窗
+                if win < 0:
+                    if y == wy and h == wh and (x1 == wx or x == wx + ww):
+                        if (ww + w) * h <= RENDER_SCRATCH_PIXELS:
+                            win = i
+                    elif x == wx and w == ww and (y1 == wy or y == wy + wh):
+                        if w * (wh + h) <= RENDER_SCRATCH_PIXELS:
+                            win = i
+                continue
+            if (x >= wx and y >= wy and x1 <= wx + ww and y1 <= wy + wh
+                    and ww * wh <= RENDER_SCRATCH_PIXELS):
+                win = i
+            else:
+                self._send()
+                win = -1
+            break
+        else:
+            if win >= 0:
+                # 拼接：視窗範圍擴大到兩者的聯集
+                wx = self.win_x[win]
+                wy = self.win_y[win]
+                if x < wx:
+                    self.win_x[win] = x
+                if y < wy:
+                    self.win_y[win] = y
+                self.win_w[win] = max(x1, wx + self.win_w[win]) - self.win_x[win]
+                self.win_h[win] = max(y1, wy + self.win_h[win]) - self.win_y[win]
+        if win < 0:
+            if self.win_count == RENDER_MAX_RECTS:
+                self._send()
+            win = self.win_count
+            self.win_x[win] = x
+            self.win_y[win] = y
+            self.win_w[win] = w
+            self.win_h[win] = h
+            self.win_count = win + 1
+        n = self.op_count
+        self.op_x[n] = x
+        self.op_y[n] = y
+        self.op_w[n] = w
+        self.op_h[n] = h
+        self.op_color[n] = color
+        self.op_win[n] = win
+        self.op_count = n + 1
+    
+    def reset(self, color):
+        self.win_count = 0
+        self.op_count = 0
+    
+    def flush(self):
+        self._send()
+        super().flush()
+    
+    def _target(self, w, h):
+        """暫存區上 w x h 的 RGB565 畫布"""
+        key = w << 8 | h
+        target = self._targets.get(key)
+        if target is None:
+            if len(self._targets) >= 16:
+                self._targets.clear()
+            target = (framebuf.FrameBuffer(self.scratch, w, h, framebuf.RGB565),
+                      memoryview(self.scratch)[:w * h * 2])
+            self._targets[key] = target
+        return target
+    
+    def _send(self):
+        """送出所有視窗，每個視窗一次 SPI 傳輸"""
+        op_win = self.op_win
+        for i in range(self.win_count):
+            wx = self.win_x[i]
+            wy = self.win_y[i]
+            ww = self.win_w[i]
+            wh = self.win_h[i]
+            # 最後一個蓋滿整個視窗的指令之前的指令都會被覆蓋
+            first = -1
+            last = -1
+            for j in range(self.op_count):
+                if op_win[j] == i:
+                    last = j
+                    if (self.op_x[j] == wx and self.op_y[j] == wy
+                            and self.op_w[j] == ww and self.op_h[j] == wh):
+                        first = j
+            if first == last:
+                self.display.fill_rect(wx, wy, ww, wh, self.op_color[first])
+            else:
+                target, view = self._target(ww, wh)
+                for j in range(max(first, 0), last + 1):
+                    if op_win[j] == i:
+                        target.fill_rect(self.op_x[j] - wx, self.op_y[j] - wy, self.op_w[j],
+                                         self.op_h[j], _swap565(self.op_color[j]))
+                self.display.blit_buffer(view, wx, wy, ww, wh)
+            self.windows += 1
+            self.bytes += ww * wh * 2
+        self.win_count = 0
+        self.op_count = 0
+
+
+class FrameCanvas(BatchCanvas):
+    """遊戲區存在 RAM 的 GS4 framebuf（每像素 4 位元、16 色），只傳送變動的區域
+    
+    繪圖只改 framebuf 並記錄變動範圍；相近的範圍合併成一個視窗，一幀結束時
+    以調色盤 blit 轉成 RGB565，每次最多 RENDER_SCRATCH_PIXELS 像素送出。
+    """
+    name = "framebuf"
+    
+    def __init__(self, display):
+        super().__init__(display)
+        self.width = GRID_WIDTH * BLOCK_SIZE
+        self.height = GRID_HEIGHT * BLOCK_SIZE
+        self.fb = framebuf.FrameBuffer(bytearray(self.width * self.height // 2),
+                                       self.width, self.height, framebuf.GS4_HMSB)
+        self.palette = framebuf.FrameBuffer(bytearray(32), 16, 1, framebuf.RGB565)
+        self.colors = {}  # RGB565 顏色 -> 調色盤索引
+    
+    def _index(self, color):
+        index = self.colors.get(color)
+        if index is None:
+            index = len(self.colors)
+            if index == 16:
+                raise ValueError("FrameCanvas 最多只能使用 16 種顏色")
+            self.palette.pixel(index, 0, _swap565(color))
+            self.colors[color] = index
+        return index
+    
+    def fill_rect(self, x, y, w, h, color):
+        x0 = max(0, x - OFFSET_X)
+        y0 = max(0, y - OFFSET_Y)
+        x1 = min(self.width, x + w - OFFSET_X)
+        y1 = min(self.height, y + h - OFFSET_Y)
+        if x0 >= x1 or y0 >= y1:
+            return
+        self.fb.fill_rect(x0, y0, x1 - x0, y1 - y0, self._index(color))
+        self._mark(x0, y0, x1, y1)
+    
+    def _mark(self, x0, y0, x1, y1):
+        """把變動範圍併入視窗表；合併後多傳的像素不多時併入既有視窗"""
+        area = (x1 - x0) * (y1 - y0)
+        for i in range(self.win_count):
+            wx = self.win_x[i]
+            wy = self.win_y[i]
+            wx1 = wx + self.win_w[i]
+            wy1 = wy + self.win_h[i]
+            ux0 = min(x0, wx)
+            uy0 = min(y0, wy)
+            ux1 = max(x1, wx1)
+            uy1 = max(y1, wy1)
+            if (ux1 - ux0) * (uy1 - uy0) <= (wx1 - wx) * (wy1 - wy) + area + RENDER_MERGE_SLACK:
+                self.win_x[i] = ux0
+                self.win_y[i] = uy0
+                self.win_w[i] = ux1 - ux0
+                self.win_h[i] = uy1 - uy0
+                return
+        if self.win_count == RENDER_MAX_RECTS:
+            self._send()
+        n = self.win_count
+        self.win_x[n] = x0
+        self.win_y[n] = y0
+        self.win_w[n] = x1 - x0
+        self.win_h[n] = y1 - y0
+        self.win_count = n + 1
+    
+    def reset(self, color):
+        self.fb.fill(self._index(color))
+        self.win_count = 0
+    
+    def _send(self):
+        """每個視窗依列切成不超過暫存區的區塊，轉成 RGB565 後送出"""
+        for i in range(self.win_count):
+            wx = self.win_x[i]
+            wy = self.win_y[i]
+            ww = self.win_w[i]
+            end = wy + self.win_h[i]
+            rows = RENDER_SCRATCH_PIXELS // ww
+            for y in range(wy, end, rows):
+                h = min(rows, end - y)
+                target, view = self._target(ww, h)
+                target.blit(self.fb, -wx, -y, -1, self.palette)
+                self.display.blit_buffer(view, OFFSET_X + wx, OFFSET_Y + y, ww, h)
+                self.windows += 1
+                self.bytes += ww * h * 2
+        self.win_count = 0
+
+
+def make_canvas(display, mode=None):
+    """依 RENDER_MODE 建立遊戲區的繪圖層"""
+    if mode is None:
+        mode = RENDER_MODE
+    if mode == RENDER_BATCH:
+        return BatchCanvas(display)
+    if mode == RENDER_FRAMEBUF:
+        return FrameCanvas(display)
+    return DirectCanvas(display)
+
+
+class SnakeEngine:
+    """貪吃蛇的規則：不繪圖也不讀輸入，每一步由 step() 傳入方向並回傳結果
+    
+    移動後 head() 是新蛇頭、vacated 是空出來的蛇尾格子（吃到食物時為
+    NO_CELL）、food 是目前的食物。食物位置取自 random 模組，先 random.seed()
+    即可重現同一局。
+    """
+    def __init__(self):
+        self.pending_direction = None  # 儲存待處理的方向
+        
+        # 蛇身：以格子編號存放的環形緩衝區，body[head_pos] 是蛇頭
+        self.body = array('H', range(CELL_COUNT))
+        self.head_pos = 0
+        self.length = 0
+        # 佔用表：每格一個位元組，碰撞檢查 O(1)
+        self.occupied = bytearray(CELL_COUNT)
+        # 空格索引：free[:free_count] 是所有空格，free_pos[格子] 是它在 free 中的位置
+        self.free = array('H', range(CELL_COUNT))
+        self.free_pos = array('H', range(CELL_COUNT))
+        self.free_count = 0
+        
+        self.reset()
+    
+    def reset(self):
+        """回到開局：兩節長的蛇在棋盤中央往右"""
+        start_x = GRID_WIDTH // 2
+        start_y = GRID_HEIGHT // 2
+        start = start_y * GRID_WIDTH + start_x
+        self._place_snake((start, start - 1))
+        self.direction = RIGHT
+        self.pending_direction = None  # 重置待處理方向
+        self.vacated = NO_CELL
+        
+        self.generate_food()
+        
+        self.game_over = False
+        self.won = False
+        self.score = 0
+        self.game_speed = 200
+    
+    def _place_snake(self, cells):
+        """清空棋盤並放置蛇身（cells 由蛇頭到蛇尾）"""
+        occupied = self.occupied
+        free = self.free
+        free_pos = self.free_pos
+        for cell in range(CELL_COUNT):
+            occupied[cell] = 0
+            free[cell] = cell
+            free_pos[cell] = cell
+        self.free_count = CELL_COUNT
+        self.head_pos = 0
+        self.length = 0
+        for cell in cells:
+            self.body[self.length] = cell
+            self.length += 1
+            self._occupy(cell)
+    
+    def _occupy(self, cell):
+        """標記格子被蛇佔用，並從空格索引移除（與最後一個空格交換）"""
+        self.occupied[cell] = 1
+        free = self.free
+        free_pos = self.free_pos
+        last = self.free_count - 1
+        pos = free_pos[cell]
+        moved = free[last]
+        free[pos] = moved
+        free_pos[moved] = pos
+        free[last] = cell
+        free_pos[cell] = last
+        self.free_count = last
+    
+    def _release(self, cell):
+        """標記格子為空，並加回空格索引"""
+        self.occupied[cell] = 0
+        free = self.free
+        free_pos = self.free_pos
+        end = self.free_count
+        pos = free_pos[cell]
+        moved = free[end]
+        free[pos] = moved
+        free_pos[moved] = pos
+        free[end] = cell
+        free_pos[cell] = end
+        self.free_count = end + 1
+    
+    def head(self):
+        """蛇頭的格子編號"""
+        return self.body[self.head_pos]
+    
+    def tail(self):
+        """蛇尾的格子編號"""
+        return self.body[(self.head_pos + self.length - 1) % CELL_COUNT]
+    
+    def segments(self):
+        """由蛇頭到蛇尾依序產生每節的格子編號"""
+        body = self.body
+        pos = self.head_pos
+        for _ in range(self.length):
+            yield body[pos]
+            pos += 1
+            if pos == CELL_COUNT:
+                pos = 0
+    
+    def generate_food(self):
+        """從空格索引中隨機選一格放食物；棋盤已滿時回傳 False"""
+        if self.free_count == 0:
+            self.food = NO_CELL
+            return False
+        self.food = self.free[random.randrange(self.free_count)]
+        return True
+    
+    def turn(self, rotation):
+        """依旋轉格數設定下一步的方向：順時針 = 右轉，逆時針 = 左轉"""
+        if self.game_over or rotation == 0:
+            return
+        new_direction = (self.direction + rotation) & 3
+        
+        # 如果新方向不是當前方向的相反方向
+        if new_direction != OPPOSITE[self.direction]:
+            # 儲存為待處理方向，將在下次移動時應用
+            self.pending_direction = new_direction
+            if GAME_DEBUG:
+                print("方向預備改變:", DIRECTION_NAMES[self.direction], "->", DIRECTION_NAMES[new_direction])
+    
+    def step(self, direction=None):
+        """移動一步並回傳 STEP_* 結果；direction 為 None 時使用 turn() 設定的方向
+        
+        反方向的輸入會被忽略。沒吃到食物的一般步驟不配置記憶體。
+        """
+        if self.game_over:
+            return STEP_OVER
+        if direction is not None:
+            self.pending_direction = direction
+        
+        # 在移動前應用待處理的方向改變
+        pending = self.pending_direction
+        if pending is not None:
+            # 再次檢查是否為反向
+            if pending != OPPOSITE[self.direction]:
+                if GAME_DEBUG:
+                    print("方向已改變:", DIRECTION_NAMES[self.direction], "->", DIRECTION_NAMES[pending])
+                self.direction = pending
+            self.pending_direction = None
+        
+        head = self.body[self.head_pos]
+        
+        # 根據方向計算新頭部位置
+        x = head % GRID_WIDTH + STEP_X[self.direction]
+        y = head // GRID_WIDTH + STEP_Y[self.direction]
+        
+        # 檢查碰撞
+        if x < 0 or x >= GRID_WIDTH or y < 0 or y >= GRID_HEIGHT:
+            self.game_over = True
+            return STEP_WALL
+        
+        new_head = y * GRID_WIDTH + x
+        tail = self.tail()
+        eating = new_head == self.food
+        
+        # 蛇尾這一步會移開，所以可以走進去（吃到食物時蛇尾不動）
+        if self.occupied[new_head] and (eating or new_head != tail):
+            self.game_over = True
+            return STEP_SELF
+        
+        # 移動蛇：不吃食物時先放開蛇尾，再佔用新蛇頭
+        if eating:
+            self.vacated = NO_CELL
+        else:
+            self.length -= 1
+            self._release(tail)
+            self.vacated = tail
+        self.head_pos = (self.head_pos - 1) % CELL_COUNT
+        self.body[self.head_pos] = new_head
+        self.length += 1
+        self._occupy(new_head)
+        
+        if not eating:
+            return STEP_MOVED
+        self.score += 10
+        self.game_speed = max(80, self.game_speed - 3)
+        if not self.generate_food():
+            self.won = True
+            self.game_over = True
+            return STEP_WON
+        return STEP_ATE
+
+
+class SnakeGame(SnakeEngine):
+    """在顯示器上玩 SnakeEngine，方向來自旋轉編碼器"""
+    def __init__(self, display, encoder):
+        self.display = display
+        self.encoder = encoder
+        self.canvas = make_canvas(display)
+        self.last_move = time.ticks_ms()
+        
+        # 分數欄位（只在分數改變時重畫）
+        self.score_field = TextField(OFFSET_X, OFFSET_Y - 20, WHITE)
+        self.best = 0  # 結束畫面顯示的最高分（由 App 從手錶的分數紀錄設定）
+        self.new_best = False
+        
+        super().__init__()
+    
+    def reset(self):
+        super().reset()
+        
+        # 增量繪圖狀態：記錄畫面上已經畫好的內容
+        self._vacated = NO_CELL  # 上一步空出來的尾巴格子
+        self._drawn_head = NO_CELL
+        self._drawn_food = NO_CELL
+        self._drawn_score = None
+        self._moves_pending = 0  # 上次繪圖後移動的步數
+        self._full_redraw = True
+        self._game_over_drawn = False
+        self.new_best = False
+        self.canvas.reset_stats()
+        
+        # 清除編碼器的累積值
+        self.encoder.clear_rotation()
+    
+    def reset_game(self):
+        """重置遊戲"""
+        self.reset()
+    
+    def update_direction(self):
+        """讀取旋轉並設定下一步的方向（不配置記憶體）"""
+        if not self.game_over:
+            self.turn(self.encoder.get_rotation())
+    
+    def move_snake(self):
+        """移動蛇一步並記錄需要重畫的差異"""
+        result = self.step()
+        if result == STEP_OVER:
+            return
+        if result == STEP_WALL:
+            print("撞牆！")
+            return
+        if result == STEP_SELF:
+            print("撞到自己！")
+            return
+        self._vacated = self.vacated
+        self._moves_pending += 1
+        if result != STEP_MOVED:
+            print("吃到食物!")
+            if result == STEP_WON:
+                print("蛇填滿整個棋盤！")
+    
+    def draw_boundary(self):
+        """繪製遊戲邊界"""
+        boundary_color = YELLOW
+        
+        game_left = OFFSET_X
+        game_top = OFFSET_Y
+        game_width = GRID_WIDTH * BLOCK_SIZE
+        game_height = GRID_HEIGHT * BLOCK_SIZE
+        
+        self.display.rect(game_left - 2, game_top - 2,
+                         game_width + 4, game_height + 4,
+                         boundary_color)
+        
+        ui.text_renderer.text(self.display, "<< Back", 5, 5, GRAY)
+    
+    def draw_block(self, x, y, color):
+        """繪製一個方塊"""
+        if 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT:
+            px = OFFSET_X + x * BLOCK_SIZE
+            py = OFFSET_Y + y * BLOCK_SIZE
+            if color != BLACK:
+                # 先畫白色外框區域再填內部，兩次傳輸取代 fill_rect + rect 的五次
+                self.canvas.fill_rect(px, py, BLOCK_SIZE, BLOCK_SIZE, WHITE)
+                self.canvas.fill_rect(px + 1, py + 1, BLOCK_SIZE - 2, BLOCK_SIZE - 2, color)
+            else:
+                self.canvas.fill_rect(px, py, BLOCK_SIZE, BLOCK_SIZE, color)
+    
+    def recolor_block(self, x, y, color):
+        """只重畫方塊內部，保留白色外框"""
+        if 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT:
+            px = OFFSET_X + x * BLOCK_SIZE
+            py = OFFSET_Y + y * BLOCK_SIZE
+            self.canvas.fill_rect(px + 1, py + 1, BLOCK_SIZE - 2, BLOCK_SIZE - 2, color)
+    
+    def clear_block(self, x, y):
+        """清除一個方塊"""
+        if 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT:
+            px = OFFSET_X + x * BLOCK_SIZE
+            py = OFFSET_Y + y * BLOCK_SIZE
+            self.canvas.fill_rect(px, py, BLOCK_SIZE, BLOCK_SIZE, BLACK)
+    
+    def redraw(self):
+        """完整重畫遊戲區（畫面被其他內容覆蓋後使用）"""
+        self._draw_playfield(clear=True)
+        self._full_redraw = False
+        self._moves_pending = 0
+        self._vacated = NO_CELL
+        self._drawn_food = NO_CELL
+        self._drawn_score = None
+        self.score_field.invalidate()
+        self.draw()
+    
+    def _draw_playfield(self, clear=False):
+        """重畫整條蛇"""
+        if clear:
+            self.canvas.fill_rect(OFFSET_X, OFFSET_Y, GRID_WIDTH * BLOCK_SIZE,
+                                  GRID_HEIGHT * BLOCK_SIZE, BLACK)
+        color = BLUE
+        for cell in self.segments():
+            self.draw_block(cell % GRID_WIDTH, cell // GRID_WIDTH, color)
+            color = GREEN
+        self._drawn_head = self.head()
+    
+    def _draw_move(self):
+        """只畫出一步的變化：清除空出的尾巴、舊蛇頭改成蛇身、畫新蛇頭"""
+        vacated = self._vacated
+        if vacated != NO_CELL:
+            self.clear_block(vacated % GRID_WIDTH, vacated // GRID_WIDTH)
+        head = self.head()
+        old_head = self._drawn_head
+        if old_head != NO_CELL and old_head != head and old_head != vacated:
+            self.recolor_block(old_head % GRID_WIDTH, old_head // GRID_WIDTH, GREEN)
+        self.draw_block(head % GRID_WIDTH, head // GRID_WIDTH, BLUE)
+        self._drawn_head = head
+    
+    def draw(self):
+        """繪製遊戲畫面（增量更新，每步的繪圖量與蛇長無關）"""
+        if self.game_over:
+            if not self._game_over_drawn:
+                self.display.fill(BLACK)
+                center_x = SCREEN_WIDTH // 2
+                center_y = SCREEN_HEIGHT // 2
+                display = self.display
+                if self.won:
+                    ui.text_renderer.text(display, "YOU WIN!", center_x - 32, center_y - 40, WHITE)
+                else:
+                    ui.text_renderer.text(display, "GAME OVER", center_x - 40, center_y - 40, WHITE)
+                ui.text_renderer.text(display, f"Score: {self.score}", center_x - 35, center_y - 20, WHITE)
+                if self.new_best:
+                    ui.text_renderer.text(display, "NEW BEST!", center_x - 36, center_y, YELLOW)
+                else:
+                    ui.text_renderer.text(display, f"Best: {self.best}", center_x - 35, center_y, GRAY)
+                ui.text_renderer.text(display, "Press button", center_x - 45, center_y + 20, WHITE)
+                ui.text_renderer.text(display, "or << Back", center_x - 40, center_y + 40, WHITE)
+                self._game_over_drawn = True
+        else:
+            if self._full_redraw:
+                # 重置後的第一次繪圖（畫面已由呼叫端清除）
+                self.canvas.reset(BLACK)
+                self._draw_playfield()
+                self._full_redraw = False
+                self._drawn_food = NO_CELL
+                self._drawn_score = None
+                self.score_field.invalidate()
+            elif self._moves_pending > 1:
+                # 兩次繪圖之間移動了不只一步，無法只畫差異
+                self._draw_playfield(clear=True)
+                self._drawn_food = NO_CELL
+            elif self._moves_pending:
+                self._draw_move()
+            self._moves_pending = 0
+            self._vacated = NO_CELL
+            
+            # 繪製食物（只在位置改變時）
+            food = self.food
+            if food != self._drawn_food and food != NO_CELL:
+                self.draw_block(food % GRID_WIDTH, food // GRID_WIDTH, RED)
+                self._drawn_food = food
+            self.canvas.flush()
+            
+            # 更新分數（只在分數改變時）
+            if self.score != self._drawn_score:
+                self.score_field.update(self.display, f"Score:{self.score}")
+                self._drawn_score = self.score
+
+
+class App:
+    """手錶上的貪吃蛇：旋轉改變方向；結束後按按鈕重玩、逆時針返回主畫面"""
+    def __init__(self, watch, game=None):
+        self.watch = watch
+        self._fresh = game is None  # 自己建立的遊戲已經重置過，外部傳入的在 start() 重置
+        self.game = game or SnakeGame(watch.display, watch.encoder)
+    
+    def start(self):
+        """開始（或重新開始）一局"""
+        if self._fresh:
+            self._fresh = False
+        else:
+            self.game.reset_game()
+        if self.watch.input_log is not None:
+            self.watch.input_log.new_game()
+    
+    def input(self, encoder):
+        game = self.game
+        if not game.game_over:
+            # 遊戲進行中 - 只更新方向，移動由 tick() 負責
+            game.update_direction()
+        elif encoder.is_button_pressed():
+            print("重新開始遊戲")
+            self.watch.open_app()
+        elif encoder.get_rotation() < 0:
+            return False
+        return True
+    
+    def tick(self):
+        """依 game_speed 定時移動蛇；遊戲結束後回傳 None"""
+        game = self.game
+        if game.game_over:
+            return None
+        delay = time.ticks_diff(time.ticks_add(game.last_move, game.game_speed), time.ticks_ms())
+        if delay > 0:
+            return delay
+        log = self.watch.input_log
+        if log is not None:
+            # 重播：紀錄中在這一步讀取的輸入還沒處理完，先等它
+            if log.hold(self.watch.encoder):
+                return 1
+        
+        game.move_snake()
+        game.last_move = time.ticks_ms()
+        if log is not None:
+            log.step()
+        if game.game_over:
+            game.canvas.report()
+            # 只附加一筆 20 位元組，在結束的這一幀就能寫完
+            scores = self.watch.scores
+            game.new_best = scores.add(game.score, game.length)
+            game.best = scores.best
+            if log is not None:
+                log.game_over(game.score)
+        self.watch.request_frame()
+        return 0
+    
+    def draw(self, full):
+        game = self.game
+        if full:
+            game.display.fill(BLACK)
+            game.draw_boundary()
+        game.draw()
+    
+    def busy(self):
+        return not self.game.game_over
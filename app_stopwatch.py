@@ -0,0 +1,71 @@
+"""碼錶應用程式：按按鈕開始／暫停，暫停時順時針轉一格歸零，逆時針返回主畫面
+
+main.py 在第一次進入時才匯入這個模組，返回主畫面後卸載（計時不保留）。
+"""
+import time
+
+import ui
+from ui import SCREEN_WIDTH, BLACK, WHITE, GRAY, GREEN, TextField
+
+UPDATE_MS = 100  # 計時中每 0.1 秒更新一次畫面
+
+
+class App:
+    def __init__(self, watch):
+        self.watch = watch
+        self.display = watch.display
+        self.running = False
+        self.elapsed_ms = 0  # 上次暫停前累計的毫秒數
+        self.started = 0  # 這次開始計時的 ticks_ms
+        # "MM:SS.t" 共 7 個字元，置中
+        self.time_field = TextField(SCREEN_WIDTH // 2 - 28, 104, WHITE)
+        self.hint_field = TextField(SCREEN_WIDTH // 2 - 48, 140, GRAY)
+    
+    def start(self):
+        pass
+    
+    def elapsed(self):
+        """目前累計的毫秒數"""
+        if self.running:
+            return self.elapsed_ms + time.ticks_diff(time.ticks_ms(), self.started)
+        return self.elapsed_ms
+    
+    def input(self, encoder):
+        if encoder.is_button_pressed():
+            now = time.ticks_ms()
+            if self.running:
+                self.elapsed_ms += time.ticks_diff(now, self.started)
+            else:
+                self.started = now
+                self.watch.wake_app()
+            self.running = not self.running
+            self.watch.request_frame()
+        rotation = encoder.get_rotation()
+        if rotation < 0:
+            return False
+        if rotation > 0 and not self.running and self.elapsed_ms:
+            self.elapsed_ms = 0
+            self.watch.request_frame()
+        return True
+    
+    def tick(self):
+        """計時中對齊每 0.1 秒要求重畫；暫停時回傳 None"""
+        if not self.running:
+            return None
+        self.watch.request_frame()
+        return UPDATE_MS - self.elapsed() % UPDATE_MS
+    
+    def draw(self, full):
+        display = self.display
+        if full:
+            display.fill(BLACK)
+            ui.text_renderer.text(display, "<< Back", 5, 5, GRAY)
+            ui.text_renderer.text(display, "Timer", SCREEN_WIDTH // 2 - 20, 70, GREEN)
+            self.time_field.invalidate()
+            self.hint_field.invalidate()
+        ms = self.elapsed()
+        self.time_field.update(display, f"{ms // 60000 % 100:02d}:{ms // 1000 % 60:02d}.{ms // 100 % 10}")
+        self.hint_field.update(display, "Press: stop" if self.running else "Press: start")
+    
+    def busy(self):
+        return False
@@ -0,0 +1,10 @@
+"""main.py 的主機端效能量測套件
+
+    python -m bench                 # 執行全部情境
+    python -m bench clock snake     # 只執行指定情境
+    python -m bench --json out.json # 另存結果
+    python -m bench --baseline out.json  # 與先前的結果比較
+"""
+import sim
+
+sim.install()
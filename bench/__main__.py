@@ -0,0 +1,100 @@
+"""python -m bench：執行量測情境並輸出報表"""
+import argparse
+import json
+import sys
+
+from bench import harness
+from bench.scenarios import SCENARIOS
+
+COLUMNS = (
+    ("active", "幀數", "{:.0f}"),
+    ("calls", "呼叫", "{:.1f}"),
+    ("windows", "視窗", "{:.1f}"),
+    ("pixels", "像素", "{:.0f}"),
+    ("bytes", "SPI B", "{:.0f}"),
+    ("spi_us", "SPI us", "{:.0f}"),
+    ("alloc", "配置 B", "{:.0f}"),
+    ("wall_us", "耗時 us", "{:.0f}"),
+    ("wall_p99", "p99 us", "{:.0f}"),
+    ("busy_us_max", "阻塞max us", "{:.0f}"),
+)
+
+# 與基準比較時關注的欄位（數字越小越好）
+COMPARE = ("calls", "windows", "bytes", "alloc", "wall_us", "busy_us_max")
+
+
+def format_row(name, summary):
+    cells = [f"{name:<14}"]
+    for key, title, fmt in COLUMNS:
+        cells.append(fmt.format(summary.get(key, 0)).rjust(max(9, len(title) + 2)))
+    return " ".join(cells)
+
+
+def header():
+    cells = [f"{'情境':<13}"]
+    for key, title, fmt in COLUMNS:
+        cells.append(title.rjust(max(9, len(title) + 2)))
+    return " ".join(cells)
+
+
+def compare(name, summary, baseline):
+    old = baseline.get(name)
+    if not old:
+        return None
+    parts = []
+    for key in COMPARE:
+        before = old["summary"].get(key, 0)
+        after = summary.get(key, 0)
+        if before:
+            parts.append(f"{key} {100 * (after - before) / before:+.0f}%")
+        elif after:
+            parts.append(f"{key} +{after:.0f}")
+    return "  vs 基準: " + ", ".join(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__)
+    parser.add_argument("names", nargs="*", help="要執行的情境（預設全部）")
+    parser.add_argument("--json", help="把結果寫成 JSON 檔")
+    parser.add_argument("--baseline", help="與先前 --json 輸出的結果比較")
+    parser.add_argument("--list", action="store_true", help="列出所有情境")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (fn, options) in SCENARIOS.items():
+            print(f"{name:<14} {fn.__doc__}")
+        return 0
+
+    names = args.names or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知的情境: {', '.join(unknown)}")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = {}
+    print(header())
+    for name in names:
+        fn, options = SCENARIOS[name]
+        summary, extra, _ = harness.run(fn, **options)
+        results[name] = {"summary": summary, "extra": extra}
+        print(format_row(name, summary))
+        if extra:
+            print("  " + ", ".join(f"{k}={v}" for k, v in extra.items()))
+        if baseline:
+            line = compare(name, summary, baseline)
+            if line:
+                print(line)
+        sys.stdout.flush()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
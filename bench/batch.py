@@ -0,0 +1,190 @@
+"""python -m bench.batch：不繪圖、不讀輸入，以 SnakeEngine 批次模擬大量對局
+
+每局以 seed + 局號 random.seed()，可重現。策略是 policy(engine) -> 方向 的
+可呼叫物件，建立時拿到策略自己的亂數產生器：
+- random：每步從三個不回頭的方向隨機選一個（大多撞牆，測試碰撞判定）
+- greedy：避開牆壁與蛇身，選曼哈頓距離最接近食物的方向
+- cycle：沿漢米爾頓迴路前進，一定填滿棋盤（測試後期的食物與空格索引）
+check=True 時每次吃到食物與每局結束都檢查棋盤一致性。
+"""
+import argparse
+import random
+import time
+
+import app_snake
+
+GRID_WIDTH = app_snake.GRID_WIDTH
+GRID_HEIGHT = app_snake.GRID_HEIGHT
+CELL_COUNT = app_snake.CELL_COUNT
+STALL_STEPS = 2 * CELL_COUNT  # 這麼多步沒吃到食物就判定繞圈，結束這一局
+
+# 結束原因
+END_WALL = "wall"
+END_SELF = "self"
+END_WON = "won"
+END_STALL = "stall"
+
+
+def _target(cell, direction):
+    """從 cell 往 direction 走一步的格子；出界時回傳 NO_CELL"""
+    x = cell % GRID_WIDTH + app_snake.STEP_X[direction]
+    y = cell // GRID_WIDTH + app_snake.STEP_Y[direction]
+    if x < 0 or x >= GRID_WIDTH or y < 0 or y >= GRID_HEIGHT:
+        return app_snake.NO_CELL
+    return y * GRID_WIDTH + x
+
+
+def random_policy(rng):
+    def policy(engine):
+        return (engine.direction + rng.choice((-1, 0, 1))) & 3
+    return policy
+
+
+def greedy_policy(rng):
+    def policy(engine):
+        head = engine.head()
+        tail = engine.tail()
+        food = engine.food
+        fx, fy = food % GRID_WIDTH, food // GRID_WIDTH
+        best = None
+        best_distance = 0
+        for delta in (0, 1, 3):
+            direction = (engine.direction + delta) & 3
+            cell = _target(head, direction)
+            if cell == app_snake.NO_CELL or engine.occupied[cell] and (cell != tail or cell == food):
+                continue
+            distance = abs(cell % GRID_WIDTH - fx) + abs(cell // GRID_WIDTH - fy)
+            if best is None or distance < best_distance or distance == best_distance and rng.random() < 0.5:
+                best = direction
+                best_distance = distance
+        return engine.direction if best is None else best
+    return policy
+
+
+def hamiltonian_cycle():
+    """以第 0 行為回程通道的蛇行漢米爾頓迴路，依序列出格子編號（需要偶數列數）"""
+    cells = []
+    for y in range(GRID_HEIGHT):
+        xs = range(1, GRID_WIDTH) if y % 2 == 0 else range(GRID_WIDTH - 1, 0, -1)
+        cells.extend(y * GRID_WIDTH + x for x in xs)
+    cells.extend(y * GRID_WIDTH for y in range(GRID_HEIGHT - 1, -1, -1))
+    return cells
+
+
+def cycle_policy(rng):
+    cycle = hamiltonian_cycle()
+    forward = [0] * CELL_COUNT
+    backward = [0] * CELL_COUNT
+    for i, cell in enumerate(cycle):
+        nxt = cycle[(i + 1) % CELL_COUNT]
+        forward[cell] = nxt
+        backward[nxt] = cell
+
+    def policy(engine):
+        head = engine.head()
+        # 蛇身沿著迴路排列；依蛇頭後一節判斷順著或逆著迴路前進
+        neck = engine.body[(engine.head_pos + 1) % CELL_COUNT]
+        nxt = forward[head] if forward[neck] == head else backward[head]
+        if nxt == head + 1:
+            return app_snake.RIGHT
+        if nxt == head - 1:
+            return app_snake.LEFT
+        return app_snake.DOWN if nxt > head else app_snake.UP
+    return policy
+
+
+POLICIES = {
+    "random": random_policy,
+    "greedy": greedy_policy,
+    "cycle": cycle_policy,
+}
+
+
+def check_board(engine):
+    """檢查佔用表、空格索引與蛇身彼此一致，不一致時回傳 False"""
+    cells = list(engine.segments())
+    if not len(cells) == engine.length == len(set(cells)):
+        return False
+    if sum(engine.occupied) != engine.length or not all(engine.occupied[c] for c in cells):
+        return False
+    if engine.free_count != CELL_COUNT - engine.length:
+        return False
+    free = sorted(engine.free[:engine.free_count])
+    if free != [c for c in range(CELL_COUNT) if not engine.occupied[c]]:
+        return False
+    if not all(engine.free[engine.free_pos[c]] == c for c in range(CELL_COUNT)):
+        return False
+    return engine.food == app_snake.NO_CELL or not engine.occupied[engine.food]
+
+
+def run_batch(policy="random", games=1000, seed=1, check=False):
+    """以 policy 玩 games 局，回傳統計（局數、步數、每秒局數與步數、分數、結束原因）"""
+    rng = random.Random(seed)
+    choose = POLICIES[policy](rng)
+    engine = app_snake.SnakeEngine()
+    step = engine.step
+    ends = {END_WALL: 0, END_SELF: 0, END_WON: 0, END_STALL: 0}
+    steps = 0
+    total_score = 0
+    best_score = 0
+    max_length = 0
+    bad_boards = 0
+    start = time.perf_counter()
+    for game in range(games):
+        random.seed(seed + game)
+        engine.reset()
+        since_food = 0
+        while True:
+            result = step(choose(engine))
+            steps += 1
+            if result == app_snake.STEP_MOVED:
+                since_food += 1
+                if since_food < STALL_STEPS:
+                    continue
+                end = END_STALL
+            elif result == app_snake.STEP_ATE:
+                since_food = 0
+                if check and not check_board(engine):
+                    bad_boards += 1
+                continue
+            else:
+                end = END_WALL if result == app_snake.STEP_WALL else END_SELF if result == app_snake.STEP_SELF else END_WON
+            break
+        ends[end] += 1
+        if check and not check_board(engine):
+            bad_boards += 1
+        total_score += engine.score
+        best_score = max(best_score, engine.score)
+        max_length = max(max_length, engine.length)
+    elapsed = time.perf_counter() - start
+    stats = {
+        "policy": policy,
+        "games": games,
+        "steps": steps,
+        "games_per_s": round(games / elapsed),
+        "steps_per_s": round(steps / elapsed),
+        "mean_score": round(total_score / games, 1),
+        "best_score": best_score,
+        "max_length": max_length,
+    }
+    stats.update(ends)
+    if check:
+        stats["bad_boards"] = bad_boards
+    return stats
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.batch", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--check", action="store_true", help="檢查棋盤一致性（較慢）")
+    args = parser.parse_args(argv)
+    stats = run_batch(args.policy, args.games, args.seed, args.check)
+    print(", ".join(f"{key}={value}" for key, value in stats.items()))
+    return 0 if not stats.get("bad_boards") else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main_cli())
@@ -0,0 +1,82 @@
+"""在模擬硬體上組裝與 main.main() 相同的裝置"""
+import glob
+import os
+
+import main
+import ui
+from sim import flash, gc9a01, machine
+from sim.knob import Knob
+from tools import png2rle
+
+WIFI_SSID = "sim-ap"
+WIFI_PASSWORD = "sim-password"
+CWA_API_KEY = "CWA-SIM-KEY"
+LOCATION_NAME = "臺北市"
+
+ICON_SOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "icons")
+_icons = {}  # 圖示名稱 -> RLE 檔內容，每次執行只轉換一次
+
+
+def configure():
+    """填入 main.py 中留空的 WiFi 與 API 設定，快取與紀錄檔改放到模擬檔案系統"""
+    main.WIFI_SSID = WIFI_SSID
+    main.WIFI_PASSWORD = WIFI_PASSWORD
+    main.CWA_API_KEY = CWA_API_KEY
+    main.LOCATION_NAME = LOCATION_NAME
+    main.WEATHER_CACHE_FILE = flash.path("weather.cache")
+    main.INPUT_LOG_FILE = flash.path("input.log")
+    main.SCORE_LOG_PREFIX = flash.path("scores")
+    main.WEATHER_ICON_DIR = flash.path("icons")
+    install_icons()
+
+
+def install_icons():
+    """把 assets/icons 的 PNG 轉成 RLE 後寫入模擬檔案系統，回傳 {名稱: RLE 內容}"""
+    if not _icons:
+        for path in sorted(glob.glob(os.path.join(ICON_SOURCES, "*.png"))):
+            _icons[os.path.splitext(os.path.basename(path))[0]] = png2rle.convert(path)
+    os.makedirs(flash.path("icons"), exist_ok=True)
+    for name, data in _icons.items():
+        with open(flash.path(f"icons/{name}.rle"), "wb") as f:
+            f.write(data)
+    return _icons
+
+
+def reset_app():
+    """清除 main.py 與 ui.py 中跨情境保留的模組層級狀態"""
+    ui.text_renderer = ui.TextRenderer()
+    ui.icon_renderer = ui.IconRenderer()
+    main.profiler.uninstall()
+    main.profiler = main.Profiler()
+
+
+def make_display():
+    spi = machine.SPI(2, baudrate=40000000, polarity=0, phase=0,
+                      sck=machine.Pin(18), mosi=machine.Pin(23))
+    display = gc9a01.GC9A01(
+        spi,
+        machine.Pin(27, machine.Pin.OUT),
+        machine.Pin(5, machine.Pin.OUT),
+        machine.Pin(26, machine.Pin.OUT),
+        machine.Pin(33, machine.Pin.OUT),
+        0
+    )
+    display.backlight.value(1)
+    return display
+
+
+def make_encoder(use_irq=None):
+    """建立編碼器與驅動它的模擬旋鈕；use_irq 預設依 main.ENCODER_USE_IRQ"""
+    if use_irq is None:
+        use_irq = main.ENCODER_USE_IRQ
+    knob = Knob(clk_pin=14, dt_pin=12, sw_pin=13)
+    encoder = main.RotaryEncoder(clk_pin=14, dt_pin=12, sw_pin=13, use_irq=use_irq)
+    return encoder, knob
+
+
+def make_watch():
+    configure()
+    display = make_display()
+    encoder, knob = make_encoder()
+    watch = main.SmartWatch(display, encoder)
+    return watch, display, encoder, knob
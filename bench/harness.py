@@ -0,0 +1,161 @@
+"""量測工具：以「幀」為單位記錄繪圖呼叫、SPI 傳輸、配置量與耗時
+
+一幀是兩次 mark() 之間的工作。主迴圈每次 sleep 時會自動 mark()，直接
+呼叫函式的情境則自行呼叫 mark()。每個情境跑兩次：第一次量耗時，第二次
+開啟 tracemalloc 量配置量，避免追蹤本身的開銷混入耗時數字。
+"""
+import contextlib
+import os
+import time
+import tracemalloc
+
+import sim
+from bench import device
+from sim import gc, uasyncio
+from sim.clock import clock
+
+# 40 MHz SPI 時每個位元組的傳輸時間（微秒）
+SPI_US_PER_BYTE = 8 / 40
+
+
+class Frame:
+    __slots__ = ("calls", "windows", "pixels", "bytes", "alloc", "wall_us", "busy_us", "tag")
+
+    def __init__(self, calls, windows, pixels, nbytes, alloc, wall_us, busy_us, tag):
+        self.calls = calls
+        self.windows = windows
+        self.pixels = pixels
+        self.bytes = nbytes
+        self.alloc = alloc
+        self.wall_us = wall_us
+        self.busy_us = busy_us
+        self.tag = tag
+
+
+class FrameRecorder:
+    def __init__(self, trace_alloc=False):
+        self.trace_alloc = trace_alloc
+        self.frames = []
+        self.display = None
+        self.tag = None
+        self.extra = {}
+        self.count_idle = False
+        self._last = (0, 0, 0, 0)
+        self._wall = 0
+        self._now = 0
+        self._slept = 0
+
+    def attach(self, display=None):
+        """捨棄目前為止的幀（開機、初始化），開始記錄某個顯示器的統計"""
+        self.display = display
+        self._last = display.stats.snapshot() if display else (0, 0, 0, 0)
+        self.frames = []
+        self._begin()
+
+    def start(self):
+        if self.trace_alloc:
+            tracemalloc.start()
+        clock.sleep_hooks.append(self._on_sleep)
+        self._begin()
+
+    def stop(self):
+        if self._on_sleep in clock.sleep_hooks:
+            clock.sleep_hooks.remove(self._on_sleep)
+        if self.trace_alloc:
+            tracemalloc.stop()
+
+    def _begin(self):
+        # 配置量由模擬的 gc 取樣（同時累計成垃圾，模擬自動回收）
+        gc.sample()
+        self._now = clock.now_us
+        self._slept = clock.slept_us
+        self._wall = time.perf_counter()
+
+    def _on_sleep(self, us):
+        self.mark()
+
+    def mark(self, tag=None):
+        """結束目前這一幀並開始下一幀"""
+        wall_us = (time.perf_counter() - self._wall) * 1e6
+        # 取樣可能模擬一次自動回收並推進虛擬時鐘，算在這一幀
+        alloc = gc.sample()
+        busy_us = (clock.now_us - self._now) - (clock.slept_us - self._slept)
+        snap = self.display.stats.snapshot() if self.display else (0, 0, 0, 0)
+        last = self._last
+        self.frames.append(Frame(snap[0] - last[0], snap[1] - last[1], snap[2] - last[2],
+                                 snap[3] - last[3], alloc, wall_us, busy_us,
+                                 tag if tag is not None else self.tag))
+        self._last = snap
+        self._begin()
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0
+
+
+def _pct(values, p):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def _active(frames, count_idle):
+    if count_idle:
+        return frames
+    return [f for f in frames if f.calls or f.busy_us]
+
+
+def summarize(frames, alloc_frames=None, count_idle=False):
+    """把幀列表整理成報表欄位；預設只統計有實際工作的幀"""
+    active = _active(frames, count_idle)
+    alloc_active = _active(alloc_frames if alloc_frames is not None else frames, count_idle)
+    idle = [f.wall_us for f in frames if not (f.calls or f.busy_us)]
+    result = {
+        "frames": len(frames),
+        "active": len(active),
+        "idle_wall_us": _mean(idle),
+    }
+    for name in ("calls", "windows", "pixels", "bytes", "wall_us", "busy_us"):
+        values = [getattr(f, name) for f in active]
+        result[name] = _mean(values)
+        result[name + "_max"] = max(values) if values else 0
+    allocs = [f.alloc for f in alloc_active]
+    result["alloc"] = _mean(allocs)
+    result["alloc_max"] = max(allocs) if allocs else 0
+    result["wall_p99"] = _pct([f.wall_us for f in active], 0.99)
+    result["spi_us"] = result["bytes"] * SPI_US_PER_BYTE
+    result["spi_us_max"] = result["bytes_max"] * SPI_US_PER_BYTE
+    return result
+
+
+def run(scenario, **options):
+    """執行情境兩次（耗時、配置量），回傳 (summary, extra, frames)"""
+    passes = []
+    for trace in (False, True):
+        sim.reset()
+        device.reset_app()
+        rec = FrameRecorder(trace_alloc=trace)
+        with open(os.devnull, "w") as null, contextlib.redirect_stdout(null):
+            rec.start()
+            try:
+                scenario(rec, **options)
+            finally:
+                rec.stop()
+        passes.append(rec)
+    timing, alloc = passes
+    summary = summarize(timing.frames, alloc.frames, timing.count_idle)
+    return summary, timing.extra, timing.frames
+
+
+def run_loop(fn, duration_ms):
+    """執行一個 while True 主迴圈（或 uasyncio.run）duration_ms 虛擬毫秒後中止"""
+    clock.halt_after_ms(duration_ms)
+    try:
+        fn()
+    except sim.Halt:
+        pass
+    finally:
+        clock.halt_at(None)
+        # 中止後捨棄 uasyncio 中還在排程的工作，下一次 run 從頭開始
+        uasyncio.new_event_loop()
@@ -0,0 +1,1503 @@
+"""效能量測情境
+
+每個情境是 scenario(rec, **options)：建立模擬裝置、rec.attach() 之後
+執行工作負載，並把情境特有的數字放進 rec.extra。
+"""
+import contextlib
+import glob
+import io
+import json
+import os
+import random
+import struct
+import sys
+import time
+import tracemalloc
+import weakref
+from array import array
+
+import app_snake
+import main
+import ui
+from bench import batch, device
+from bench.harness import SPI_US_PER_BYTE, run_loop
+from forecast_parser import (ForecastParser, FIELD_LOCATION_NAME, FIELD_START_TIME, FIELD_END_TIME,
+                             FIELD_PARAMETER_NAME, FIELD_PARAMETER_VALUE)
+import sim
+from sim import cwa, gc, machine, network, uasyncio, urequests, utime
+from sim.clock import TICKS_PERIOD, clock
+from tools import png2rle
+
+
+# ---------- 時鐘畫面 ----------
+
+def clock_face(rec, minutes=10, analog=False):
+    """在主畫面執行 SmartWatch.run，每分鐘重繪一次時鐘（指針時鐘每秒）"""
+    main.CLOCK_ANALOG = analog
+    try:
+        watch, display, _, _ = device.make_watch()
+        rec.attach(display)
+        fills = display.stats.calls.get("fill", 0)
+        # 多跑半秒，讓最後一分鐘的重畫落在量測範圍內
+        run_loop(watch.run, minutes * 60000 + 500)
+        # 局部更新期間不應該清除整個畫面
+        fills = display.stats.calls.get("fill", 0) - fills
+        # 局部更新後的畫面必須與完整重畫的結果相同
+        incremental = display.frame_bytes()
+        watch.draw_clock_face(True)
+        consistent = incremental == display.frame_bytes()
+    finally:
+        main.CLOCK_ANALOG = False
+    rec.extra.update(minutes=minutes, consistent=consistent, full_fills=fills)
+
+
+class CountingRTC(machine.RTC):
+    """計算 RTC 讀取次數"""
+    reads = 0
+
+    def datetime(self, datetimetuple=None):
+        if datetimetuple is None:
+            CountingRTC.reads += 1
+        return super().datetime(datetimetuple)
+
+
+class DriftProbe(main.SmartWatch):
+    """每次重畫時鐘時比較修正後的時間、RTC 與真實時間"""
+
+    def __init__(self, display, encoder):
+        self.max_error_ms = 0
+        self.max_rtc_error_ms = 0
+        self.max_failures = 0
+        super().__init__(display, encoder)
+
+    def draw_clock_face(self, full=False):
+        super().draw_clock_face(full)
+        service = self.time_service
+        self.max_failures = max(self.max_failures, service.failures)
+        # 第一次估計漂移之前的誤差不列入
+        if service.syncs < 2:
+            return
+        true_ms = clock.true_us() // 1000
+        secs, ms = service.now()
+        self.max_error_ms = max(self.max_error_ms, abs(secs * 1000 + ms - true_ms))
+        self.max_rtc_error_ms = max(self.max_rtc_error_ms, abs(clock.rtc_us() // 1000 - true_ms))
+
+
+def _ntp_fail(fail):
+    sim.ntptime.FAIL = fail
+
+
+def time_drift(rec, hours=48, drift_ppm=200, fail_at_h=5.9, fail_hours=2):
+    """本地時鐘快 drift_ppm 時執行 hours 小時，其間 NTP 無法使用 fail_hours 小時
+
+    回報校時次數、估計的漂移、修正後時間與未修正 RTC 的最大誤差、失敗期間
+    的連續重試次數（指數退避），以及 RTC 的讀取次數（只在開機與校時時讀寫）。
+    """
+    clock.drift_ppm = drift_ppm
+    clock.call_later(int(fail_at_h * 3600e6), _ntp_fail, True)
+    clock.call_later(int((fail_at_h + fail_hours) * 3600e6), _ntp_fail, False)
+    rtc_class = main.RTC
+    main.RTC = CountingRTC
+    CountingRTC.reads = 0
+    try:
+        device.configure()
+        display = device.make_display()
+        encoder, _ = device.make_encoder()
+        watch = DriftProbe(display, encoder)
+        rec.attach(display)
+        run_loop(watch.run, hours * 3600000)
+    finally:
+        main.RTC = rtc_class
+    service = watch.time_service
+    rec.extra.update(hours=hours, drift_ppm=drift_ppm, syncs=service.syncs,
+                     estimated_ppm=service.drift_ppm, max_error_ms=watch.max_error_ms,
+                     rtc_max_error_ms=watch.max_rtc_error_ms, fail_retries=watch.max_failures,
+                     rtc_reads=CountingRTC.reads)
+
+
+def text_cache(rec, minutes=60, games=3):
+    """文字點陣快取：先與 display.text 逐像素比對，再回報時鐘與結束畫面的命中率"""
+    samples = ("".join(chr(c) for c in range(0x20, 0x7F)), "多雲時晴 25~33C", "Score:120", "--:--")
+    reference = device.make_display()
+    cached = device.make_display()
+    # display.text 不畫字型沒有的字元，快取則畫成背景色；先把背景塗成相同顏色
+    reference.fill(main.BLUE)
+    cached.fill(main.BLUE)
+    renderer = ui.TextRenderer()
+    for i, text in enumerate(samples):
+        for j in range(0, len(text), 30):
+            y = (i * 4 + j // 30) * ui.font.HEIGHT
+            reference.text(ui.font, text[j:j + 30], 0, y, main.YELLOW, main.BLUE)
+            renderer.text(cached, text[j:j + 30], 0, y, main.YELLOW, main.BLUE)
+    identical = reference.frame_bytes() == cached.frame_bytes()
+
+    watch, display, encoder, _ = device.make_watch()
+    rec.attach(display)
+    for _ in range(games):
+        run_loop(watch.run, minutes * 60000 // games)
+        game = app_snake.SnakeGame(display, encoder)
+        game.game_over = True
+        game.draw()
+        rec.mark("game_over")
+        watch.draw_clock_face(True)
+        rec.mark("clock_face")
+    renderer = ui.text_renderer
+    rec.extra.update(identical=identical, hits=renderer.hits, misses=renderer.misses,
+                     evictions=renderer.evictions, cache_bytes=renderer.size)
+
+
+# ---------- 貪吃蛇 ----------
+
+class CycleBot:
+    """沿漢米爾頓迴路前進的玩家，保證不會撞到自己"""
+
+    STEPS = {(0, -1): app_snake.UP, (1, 0): app_snake.RIGHT, (0, 1): app_snake.DOWN, (-1, 0): app_snake.LEFT}
+
+    def __init__(self, start_tail, start_head):
+        cycle = [cell_xy(cell) for cell in batch.hamiltonian_cycle()]
+        if cycle[(cycle.index(start_tail) + 1) % len(cycle)] != start_head:
+            cycle.reverse()
+        self.cycle = cycle
+        self.succ = {cell: cycle[(i + 1) % len(cycle)] for i, cell in enumerate(cycle)}
+
+    def body(self, head, length):
+        """迴路上以 head 為頭、長度 length 的蛇身（頭在前）"""
+        i = self.cycle.index(head)
+        return [self.cycle[(i - k) % len(self.cycle)] for k in range(length)]
+
+    def direction_of(self, a, b):
+        return self.STEPS[(b[0] - a[0], b[1] - a[1])]
+
+    def rotation(self, head, direction):
+        """下一步需要的旋轉：+1 順時針、-1 逆時針、0 不轉"""
+        wanted = self.direction_of(head, self.succ[head])
+        delta = (wanted - direction) % 4
+        return 1 if delta == 1 else -1 if delta == 3 else 0
+
+
+def cell_xy(cell):
+    return cell % app_snake.GRID_WIDTH, cell // app_snake.GRID_WIDTH
+
+
+def xy_cell(xy):
+    return xy[1] * app_snake.GRID_WIDTH + xy[0]
+
+
+def make_bot(game):
+    return CycleBot(cell_xy(game.tail()), cell_xy(game.head()))
+
+
+def prefill(game, bot, length):
+    """把蛇放到迴路上並拉長到 length 節，模擬遊戲後期"""
+    body = bot.body(cell_xy(game.head()), length)
+    game._place_snake([xy_cell(xy) for xy in body])
+    game.direction = bot.direction_of(body[1], body[0])
+    game.generate_food()
+
+
+def snake(rec, max_ticks=1500, length=0, seed=1, render=app_snake.RENDER_DIRECT):
+    """以 SmartWatch.run 遊戲分支相同的節奏玩一局貪吃蛇；render 選擇遊戲區的繪圖層"""
+    random.seed(seed)
+    display = device.make_display()
+    encoder, knob = device.make_encoder()
+    mode = app_snake.RENDER_MODE
+    app_snake.RENDER_MODE = render
+    try:
+        game = app_snake.SnakeGame(display, encoder)
+    finally:
+        app_snake.RENDER_MODE = mode
+    bot = make_bot(game)
+    if length:
+        prefill(game, bot, length)
+    display.fill(main.BLACK)
+    game.draw_boundary()
+    game.draw()
+    rec.attach(display)
+    ticks = 0
+    while not game.game_over and ticks < max_ticks:
+        now = time.ticks_ms()
+        game.update_direction()
+        if time.ticks_diff(now, game.last_move) >= game.game_speed:
+            game.move_snake()
+            game.last_move = now
+            game.draw()
+            ticks += 1
+            if not game.game_over:
+                turn = bot.rotation(cell_xy(game.head()), game.direction)
+                if turn:
+                    knob.turn(turn)
+        time.sleep_ms(10)
+    consistent = None
+    if not game.game_over:
+        # 增量繪圖的結果必須與完整重畫相同
+        incremental = display.frame_bytes()
+        game.redraw()
+        consistent = incremental == display.frame_bytes()
+    canvas = game.canvas
+    frames = canvas.frames or 1
+    rec.extra.update(ticks=ticks, score=game.score, length=game.length,
+                     game_over=game.game_over, consistent=consistent, render=canvas.name,
+                     spi_per_frame=round(canvas.windows / frames, 2),
+                     bytes_per_frame=canvas.bytes // frames)
+
+
+@contextlib.contextmanager
+def _tracing():
+    """量測期間開啟 tracemalloc（harness 的配置量測那一輪已經開啟時沿用）"""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        yield
+    finally:
+        if started:
+            tracemalloc.stop()
+
+
+class NullDisplay:
+    """不繪圖也不配置記憶體的顯示器，量測遊戲程式本身的配置量用"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def _draw(self, *args):
+        self.calls += 1
+
+    fill = fill_rect = rect = hline = vline = blit_buffer = text = _draw
+
+
+# 手錶韌體的模組：snake-alloc 只計這些檔案裡的配置
+FIRMWARE_FILES = {app_snake.__file__, ui.__file__, main.__file__}
+
+
+def _firmware_bytes():
+    """tracemalloc 追蹤到、在韌體模組裡配置且仍存活的位元組數"""
+    filters = [tracemalloc.Filter(True, f) for f in FIRMWARE_FILES]
+    snapshot = tracemalloc.take_snapshot().filter_traces(filters)
+    return sum(trace.size for trace in snapshot.traces)
+
+
+def _boxed_int_bytes(*objs):
+    """objs 的 int 屬性中，在韌體模組裡配置的堆積 int 的位元組數
+
+    CPython 中 -5..256 以外的 int 是堆積物件，MicroPython 的 small int 則不配置，
+    所以這部分直接量出來，從增量中扣掉。同一個物件只算一次。
+    """
+    total = 0
+    seen = set()
+    for obj in objs:
+        for value in vars(obj).values():
+            if type(value) is not int or -5 <= value <= 256 or id(value) in seen:
+                continue
+            seen.add(id(value))
+            tb = tracemalloc.get_object_traceback(value)
+            if tb is not None and tb[0].filename in FIRMWARE_FILES:
+                total += (sys.getsizeof(value) + 7) & ~7
+    return total
+
+
+def snake_alloc(rec, ticks=600, length=100, seed=1):
+    """穩定狀態下每一步（update_direction、move_snake、draw）在韌體模組裡的配置
+
+    由旋轉事件直接放進編碼器佇列讓蛇沿迴路轉彎，模擬的顯示驅動本身會配置
+    記憶體，量測期間改畫在 NullDisplay 上。每步以 tracemalloc 快照量韌體模組
+    的存活配置增量，再扣掉遊戲物件 int 屬性在 CPython 裝箱的增量；兩者不同的
+    步數（steady_allocating）必須是 0。leaked_b 是整段穩定狀態的同一差值，
+    抓每步都被釋放、但累積起來沒有還回去的配置。吃到食物的那一步（換食物、
+    重畫分數）不算穩定狀態。
+    """
+    random.seed(seed)
+    display = NullDisplay()
+    encoder, _ = device.make_encoder(use_irq=True)
+    game = app_snake.SnakeGame(display, encoder)
+    bot = make_bot(game)
+    prefill(game, bot, length)
+    game.draw()
+    objs = (game, game.canvas, game.score_field, encoder)
+    steady = []
+    eating = []
+    leaked = 0
+    with _tracing():
+        for _ in range(ticks):
+            turn = bot.rotation(cell_xy(game.head()), game.direction)
+            if turn:
+                encoder.inject(main.EVENT_CW if turn > 0 else main.EVENT_CCW)
+            score = game.score
+            boxed = _boxed_int_bytes(*objs)
+            before = _firmware_bytes()
+            game.update_direction()
+            game.move_snake()
+            game.draw()
+            delta = _firmware_bytes() - before
+            boxed = _boxed_int_bytes(*objs) - boxed
+            if game.score != score:
+                eating.append(delta)
+            else:
+                steady.append((delta, boxed, turn != 0))
+                leaked += delta - boxed
+            if game.game_over:
+                break
+    turning = [d for d, _, turned in steady if turned] or [0]
+    straight = [d for d, _, turned in steady if not turned] or [0]
+    steady_allocating = sum(1 for d, boxed, _ in steady if d != boxed)
+    rec.extra.update(ticks=len(steady) + len(eating), straight_max_b=max(straight),
+                     turn_max_b=max(turning),
+                     int_box_max_b=max((boxed for _, boxed, _ in steady), default=0),
+                     steady_allocating=steady_allocating, leaked_b=leaked,
+                     eating_max_b=max(eating) if eating else 0, draw_calls=display.calls,
+                     game_over=game.game_over)
+    assert steady_allocating == 0 and leaked == 0, "穩定狀態的每一步仍在配置記憶體"
+
+
+def snake_fill(rec, seed=1):
+    """沿漢米爾頓迴路直接推進遊戲直到填滿棋盤，每個長度都檢查棋盤一致性
+
+    不經過編碼器與 sleep，每一步為一幀，用來量測各填滿程度下的
+    move_snake + draw 成本。
+    """
+    random.seed(seed)
+    display = device.make_display()
+    encoder, _ = device.make_encoder()
+    game = app_snake.SnakeGame(display, encoder)
+    bot = make_bot(game)
+    display.fill(main.BLACK)
+    game.draw()
+    rec.attach(display)
+    checked = 0
+    length = game.length
+    while not game.game_over:
+        head = cell_xy(game.head())
+        game.pending_direction = bot.direction_of(head, bot.succ[head])
+        game.move_snake()
+        game.draw()
+        rec.mark()
+        if game.length != length:
+            length = game.length
+            assert batch.check_board(game), f"長度 {length} 的棋盤不一致"
+            checked += 1
+    rec.extra.update(ticks=len(rec.frames), length=game.length, won=game.won,
+                     levels_checked=checked)
+
+
+def snake_engine(rec, policy="random", games=2000, seed=1):
+    """不繪圖、不讀輸入，以 SnakeEngine 批次模擬 games 局並檢查棋盤一致性"""
+    rec.extra.update(batch.run_batch(policy, games, seed, check=True))
+
+
+# ---------- 天氣 ----------
+
+def weather(rec, fetches=20, location=device.LOCATION_NAME):
+    """強制重新取得天氣 fetches 次；location 可以是城市列表（一次請求取得）"""
+    device.configure()
+    api = main.WeatherAPI(device.CWA_API_KEY)
+    uasyncio.run(api.connect_wifi(device.WIFI_SSID, device.WIFI_PASSWORD))
+    rec.attach()
+    ok = 0
+    for _ in range(fetches):
+        api.weather_data = None
+        if api.get_weather(location):
+            ok += 1
+        rec.mark()
+    rec.extra.update(ok=ok, payload_bytes=urequests.bytes_served // max(1, fetches),
+                     requests=urequests.requests_made,
+                     cities=sum(1 for n in api.weather_data.slots if n) if api.weather_data else 0,
+                     cache_writes=api.cache.writes)
+
+
+class CityProbe(main.SmartWatch):
+    """記錄主畫面顯示過天氣的城市，以及城市標籤確實畫出字（不只是背景色）的城市"""
+
+    def __init__(self, display, encoder):
+        self.shown = set()
+        self.labeled = set()
+        super().__init__(display, encoder)
+
+    def draw_clock_face(self, full=False):
+        super().draw_clock_face(full)
+        if self.weather_info and self.weather_info.has(self.city):
+            self.shown.add(self.locations[self.city])
+        field = self.city_field
+        label = self.display.region(field.x, field.y, len(field.value) * ui.font.WIDTH, ui.font.HEIGHT)
+        if any(pixel != ui.BLACK for pixel in array("H", label)):
+            self.labeled.add(field.value)
+
+
+def weather_cities(rec, minutes=2, cities=("臺北市", "臺中市", "高雄市"),
+                   labels=("Taipei", "Taichung", "Kaohsiung")):
+    """多個城市以一次請求取得，主畫面輪流顯示各城市且不再連網
+
+    labels 為空時主畫面顯示城市的序號（1/3）。
+    """
+    device.configure()
+    main.LOCATION_NAMES = list(cities)
+    main.LOCATION_LABELS = list(labels)
+    try:
+        display = device.make_display()
+        encoder, _ = device.make_encoder()
+        watch = CityProbe(display, encoder)
+        rec.attach(display)
+        run_loop(watch.run, minutes * 60000)
+    finally:
+        main.LOCATION_NAMES = []
+        main.LOCATION_LABELS = []
+    # 重開機時從快取還原同樣的表格
+    cached, _ = main.WeatherCache(main.WEATHER_CACHE_FILE).load(tuple(cities))
+    rec.extra.update(cities=len(cities), requests=urequests.requests_made,
+                     filled=sum(1 for n in watch.weather_info.slots if n),
+                     shown=len(watch.shown), labeled=len(watch.labeled),
+                     cache_matches=forecast_rows(cached) == forecast_rows(watch.weather_info))
+
+
+def forecast_rows(forecast):
+    """Forecast 每個時段的內容，比較用"""
+    if not forecast:
+        return None
+    return [(forecast.start[i], forecast.end[i], forecast.description(i), forecast.pop[i],
+             forecast.min_t[i], forecast.max_t[i])
+            for city in range(forecast.cities)
+            for i in range(city * main.FORECAST_SLOTS, city * main.FORECAST_SLOTS + forecast.slots[city])]
+
+
+class TimelineProbe(main.SmartWatch):
+    """檢查每次重畫時顯示的時段是否涵蓋當時的時間"""
+
+    def __init__(self, display, encoder):
+        self.shown = set()
+        self.wrong = 0
+        self.expired = 0
+        super().__init__(display, encoder)
+
+    def draw_clock_face(self, full=False):
+        super().draw_clock_face(full)
+        forecast = self.weather_info
+        if not forecast or self.rtc.datetime()[0] < main.MIN_VALID_YEAR:
+            return
+        now = self.time_service.time()
+        slot = forecast.current(self.city, now)
+        if slot < 0:
+            self.expired += 1
+            return
+        self.shown.add(slot)
+        if not forecast.start[slot] <= now < forecast.end[slot] and slot != 0:
+            self.wrong += 1
+        if main.WEATHER_ICONS:
+            if self.icon_field.value != self.wx_icons.get(forecast.wx[slot], ""):
+                self.wrong += 1
+        elif self.weather_field.value != forecast.description(slot)[:8]:
+            self.wrong += 1
+
+
+def _forecast_bytes(forecast):
+    """Forecast 陣列的大小（不含描述字串）"""
+    if not forecast:
+        return 0
+    n = forecast.cities * main.FORECAST_SLOTS
+    return len(forecast.slots) + n * (4 + 4 + 1 + 1 + 1 + 1)
+
+
+def _go_offline():
+    network.REACHABLE = False
+    network.WLAN(network.STA_IF).disconnect()
+
+
+def weather_timeline(rec, hours=24, online_ms=20000):
+    """取得一次 36 小時預報後離線，畫面依本地時間自己移到涵蓋現在的時段"""
+    device.configure()
+    display = device.make_display()
+    encoder, _ = device.make_encoder()
+    watch = TimelineProbe(display, encoder)
+    rec.attach(display)
+    clock.call_later(online_ms * 1000, _go_offline)
+    run_loop(watch.run, hours * 3600000)
+    rec.extra.update(hours=hours, requests=urequests.requests_made, slots_shown=len(watch.shown),
+                     wrong_slot=watch.wrong, expired=watch.expired,
+                     timeline_bytes=_forecast_bytes(watch.weather_info))
+
+
+class BootProbe(main.SmartWatch):
+    """記錄開機後多久第一次畫出天氣資料"""
+
+    def __init__(self, display, encoder):
+        self.boot_us = clock.now_us
+        self.weather_ms = None
+        super().__init__(display, encoder)
+
+    def draw_clock_face(self, full=False):
+        if self.weather_ms is None and self.weather_info:
+            self.weather_ms = (clock.now_us - self.boot_us) // 1000
+        super().draw_clock_face(full)
+
+
+def weather_boot(rec, boot_ms=15000, refreshes=4):
+    """冷開機（flash 無快取）、熱開機與離線開機時，天氣出現在畫面上的時間
+
+    接著讓手錶執行 refreshes 個更新週期，伺服器資料中途改版一次；flash 只在
+    預報內容改變（改版或 12 小時時段推進）時寫入，每次更新不一定寫入。
+    """
+    device.configure()
+    display = device.make_display()
+    encoder, _ = device.make_encoder()
+    rec.attach(display)
+    boots = {}
+    for name, reachable in (("cold", True), ("warm", True), ("offline", False)):
+        network.reset()
+        network.REACHABLE = reachable
+        watch = BootProbe(display, encoder)
+        run_loop(watch.run, boot_ms)
+        boots[name] = watch
+    network.reset()
+    watch = BootProbe(display, encoder)
+    api = watch.weather_api
+    writes = api.cache.writes
+    clock.call_later(refreshes * api.update_interval * 500, setattr, cwa, "revision", 1)
+    run_loop(watch.run, refreshes * api.update_interval + boot_ms)
+    cwa.revision = 0
+    for name, probe in boots.items():
+        rec.extra[name + "_weather_ms"] = probe.weather_ms
+    rec.extra.update(refresh_writes=api.cache.writes - writes,
+                     offline_shows=(forecast_rows(boots["offline"].weather_info)
+                                    == forecast_rows(boots["warm"].weather_info)))
+
+
+def weather_errors(rec, duration_ms=300000, interval_ms=60000, connect_errors=1, close_errors=2):
+    """WiFi 驅動程式與 TLS 關閉時拋出 OSError，確認網路與天氣工作不會就此結束
+
+    開機時前 connect_errors 次 wlan.connect() 失敗，前 close_errors 次天氣連線的
+    wait_closed() 失敗；之後應該照重試間隔連上網路，且每個 interval_ms 都更新天氣。
+    """
+    device.configure()
+    display = device.make_display()
+    encoder, _ = device.make_encoder()
+    network.CONNECT_ERRORS = connect_errors
+    uasyncio.CLOSE_ERRORS = close_errors
+    watch = main.SmartWatch(display, encoder)
+    api = watch.weather_api
+    api.update_interval = interval_ms
+    rec.attach(display)
+    run_loop(watch.run, duration_ms)
+    rec.extra.update(connect_errors_left=network.CONNECT_ERRORS, close_errors_left=uasyncio.CLOSE_ERRORS,
+                     wifi=watch.wifi_connected, requests=urequests.requests_made,
+                     weather_shown=bool(watch.weather_info), fresh=api.is_fresh())
+
+
+def weather_no_tls(rec, duration_ms=180000, interval_ms=60000, seed=1):
+    """韌體的 uasyncio 不支援 TLS：只在主畫面退回阻塞的 get_weather，遊戲中不阻塞
+
+    開機後在主畫面取得天氣，三秒後進入遊戲一直玩；天氣每 interval_ms 過期一次。
+    遊戲中的阻塞更新次數應為 0，過期的天氣留到回主畫面再更新。
+    """
+    random.seed(seed)
+    device.configure()
+    display = device.make_display()
+    encoder, knob = device.make_encoder()
+    uasyncio.SSL_SUPPORTED = False
+    watch = GameWatch(display, encoder, knob)
+    api = watch.weather_api
+    api.update_interval = interval_ms
+    blocking = {0: 0, 1: 0}
+    get_weather = api.get_weather
+
+    def counted(locations):
+        blocking[watch.current_screen] += 1
+        return get_weather(locations)
+
+    api.get_weather = counted
+    knob.turn(1, delay_us=3000000)  # 開機後進入遊戲
+    rec.attach(display)
+    run_loop(watch.run, duration_ms)
+    late = sorted(watch.game.late_us)
+    rec.extra.update(blocking_on_clock=blocking[0], blocking_in_app=blocking[1],
+                     requests=urequests.requests_made, weather_shown=bool(watch.weather_info),
+                     fresh=api.is_fresh(), tick_late_max_us=late[-1])
+    assert blocking[1] == 0, "遊戲中退回阻塞的天氣更新"
+
+
+PAYLOAD_DIR = os.path.join(os.path.dirname(__file__), "payloads")
+
+
+def legacy_parse(body):
+    """改版前 get_weather 的解析方式：response.json() 後取 time[0]"""
+    data = json.loads(body)
+    weather_info = {}
+    for element in data['records']['location'][0]['weatherElement']:
+        key = main.WEATHER_FIELDS.get(element['elementName'])
+        if key:
+            weather_info[key] = element['time'][0]['parameter']['parameterName']
+    return weather_info
+
+
+def stream_parse(body):
+    """改版後的方式：以 ForecastParser 分段解析"""
+    weather_info = {}
+
+    def collect(location, element, slot, field, value):
+        if location == 0 and slot == 0 and field == 3:
+            key = main.WEATHER_FIELDS.get(element)
+            if key:
+                weather_info[key] = value
+
+    response = urequests.Response(200, body)
+    ForecastParser(collect).parse_stream(response.raw)
+    return weather_info
+
+
+def json_table(body):
+    """json.loads 後整理成 {(城市, 因子, 時段, 欄位): 值}，與 stream_table 比對"""
+    table = {}
+    for i, location in enumerate(json.loads(body)["records"]["location"]):
+        table[(i, None, -1, FIELD_LOCATION_NAME)] = location["locationName"]
+        for element in location["weatherElement"]:
+            name = element["elementName"]
+            for slot, entry in enumerate(element["time"]):
+                parameter = entry["parameter"]
+                table[(i, name, slot, FIELD_START_TIME)] = entry["startTime"]
+                table[(i, name, slot, FIELD_END_TIME)] = entry["endTime"]
+                table[(i, name, slot, FIELD_PARAMETER_NAME)] = parameter["parameterName"]
+                if "parameterValue" in parameter:
+                    table[(i, name, slot, FIELD_PARAMETER_VALUE)] = parameter["parameterValue"]
+    return table
+
+
+def stream_table(body):
+    """ForecastParser 回呼的所有欄位，格式同 json_table"""
+    table = {}
+
+    def collect(location, element, slot, field, value):
+        table[(location, element, slot, field)] = value
+
+    ForecastParser(collect).parse_stream(urequests.Response(200, body).raw)
+    return table
+
+
+def _measure(fn, body, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(body)
+    elapsed = (time.perf_counter() - start) / repeat * 1e6
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    fn(body)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    if not tracing:
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def weather_parse(rec, repeat=5):
+    """比較 json.loads 與串流解析的峰值記憶體與解析時間
+
+    負載包含本機替身產生的單一城市與全部縣市回應，以及 bench/payloads/
+    底下正式格式的 *.json 檔。每個負載都以 json.loads 的結果檢查串流解析出的
+    所有城市、因子與時段（full），不同時中止。
+    """
+    payloads = [
+        ("one", json.dumps(cwa.build_payload([device.LOCATION_NAME]),
+                           ensure_ascii=False).encode()),
+        ("all", json.dumps(cwa.build_payload(), ensure_ascii=False).encode()),
+    ]
+    for path in sorted(glob.glob(os.path.join(PAYLOAD_DIR, "*.json"))):
+        with open(path, "rb") as f:
+            payloads.append((os.path.splitext(os.path.basename(path))[0], f.read()))
+    rec.attach()
+    for name, body in payloads:
+        expected, json_us, json_peak = _measure(legacy_parse, body, repeat)
+        rec.mark()
+        result, stream_us, stream_peak = _measure(stream_parse, body, repeat)
+        rec.mark()
+        expected_table = json_table(body)
+        full = stream_table(body) == expected_table
+        rec.extra[name] = (f"{len(body)}B json {json_peak}B/{json_us:.0f}us "
+                           f"stream {stream_peak}B/{stream_us:.0f}us "
+                           f"same={result == expected} full={full}/{len(expected_table)}")
+        assert result == expected and full, f"{name}: 串流解析與 json.loads 不同"
+
+
+# ---------- 天氣圖示 ----------
+
+def _peak(fn):
+    """執行 fn() 期間 tracemalloc 峰值的增量"""
+    with _tracing():
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fn()
+        return tracemalloc.get_traced_memory()[1] - base
+
+
+def weather_icons(rec, repeat=50, seed=1):
+    """主畫面換成每種天氣現象代碼，再從模擬 flash 逐一串流繪製圖示
+
+    主畫面部分確認局部更新與完整重畫相同。每個圖示回報 RLE 與未壓縮的大小、
+    解碼時間（畫在 NullDisplay 上）、估計的 SPI 時間、第一次與之後繪製的峰值記憶體、
+    blit 次數，並與 PNG 轉出的像素逐一比對。另外加上一個隨機像素的 noise 圖示，
+    它幾乎都是原樣複製的封包，檔案比讀取緩衝區大，檢查跨緩衝區的串流。
+    模擬的顯示驅動與 CPython 的開檔
+    （8 KB 讀取緩衝區，MicroPython 沒有）會配置記憶體，峰值在 NullDisplay 上
+    量測並扣除只開檔讀取的峰值。
+    """
+    watch, display, _, _ = device.make_watch()
+    run_loop(watch.run, 5000)  # 取得天氣
+    rec.attach(display)
+    forecast = watch.weather_info
+    slot = forecast.current(watch.city, watch.time_service.time())
+    consistent = True
+    shown = []
+    for code in sorted(watch.wx_icons) + [0]:
+        forecast.wx[slot] = code
+        watch.draw_clock_face()
+        rec.mark()
+        shown.append(watch.icon_field.value)
+        incremental = display.frame_bytes()
+        watch.draw_clock_face(True)
+        consistent = consistent and incremental == display.frame_bytes()
+        rec.mark()
+    rec.extra.update(codes=len(shown) - 1, icons=len(set(shown) - {""}), consistent=consistent)
+
+    cases = []
+    for name, data in device.install_icons().items():
+        _, _, pixels = png2rle.read_png(f"{device.ICON_SOURCES}/{name}.png")
+        cases.append((name, data, png2rle.to_rgb565(pixels)))
+    rng = random.Random(seed)
+    noise = [[rng.getrandbits(16) for _ in range(64)] for _ in range(64)]
+    cases.append(("noise", png2rle.encode(noise), noise))
+
+    null = NullDisplay()
+    scratch = bytearray(ui.ICON_READ_BYTES)
+    x, y = main.WEATHER_ICON_X, main.WEATHER_ICON_Y
+    for name, data, rows in cases:
+        path = f"{main.WEATHER_ICON_DIR}/{name}.rle"
+        with open(path, "wb") as f:
+            f.write(data)
+
+        def open_only():
+            with open(path, "rb") as f:
+                f.readinto(scratch)
+
+        opened = _peak(open_only)
+        renderer = ui.IconRenderer()
+        cold = max(0, _peak(lambda: renderer.draw(null, path, x, y)) - opened)
+        warm = max(0, _peak(lambda: renderer.draw(null, path, x, y)) - opened)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            renderer.draw(null, path, x, y)
+        decode_us = (time.perf_counter() - start) / repeat * 1e6
+        rec.mark()
+
+        blits = display.stats.calls.get("blit_buffer", 0)
+        renderer.draw(display, path, x, y)
+        rec.mark(name)
+        blits = display.stats.calls.get("blit_buffer", 0) - blits
+        width, height = len(rows[0]), len(rows)
+        expected = b"".join(array("H", row).tobytes() for row in rows)
+        same = display.region(x, y, width, height) == expected
+        raw = width * height * 2
+        rec.extra[name] = (f"{len(data)}B/{raw}B decode {decode_us:.0f}us spi {raw * SPI_US_PER_BYTE:.0f}us "
+                           f"peak {cold}/{warm}B blits {blits} same={same}")
+
+
+# ---------- 執行時期 ----------
+
+class BootWatch(main.SmartWatch):
+    """記錄 main() 建立的手錶與第一個畫面的繪圖量"""
+    last = None
+
+    def __init__(self, display, encoder, boot=None):
+        BootWatch.last = self
+        self.first_frame_bytes = None
+        super().__init__(display, encoder, boot)
+        self.first_frame_bytes = display.stats.bytes
+
+
+def boot(rec, duration_ms=15000, warm=False, reachable=True, hold_button=False):
+    """執行 main.main()，回報各開機階段完成的時間（虛擬毫秒）
+
+    warm=True 時先冷開機一次，讓 flash 上有天氣快取、RTC 已校時再重新開機；
+    hold_button=True 時按住按鈕開機進入編碼器診斷模式。
+    """
+    device.configure()
+    smart_watch = main.SmartWatch
+    main.SmartWatch = BootWatch
+    try:
+        if warm:
+            run_loop(main.main, duration_ms)
+            network.reset()
+        network.REACHABLE = reachable
+        if hold_button:
+            machine.drive(13, 0)
+            clock.call_later(500000, machine.drive, 13, 1)
+        rec.attach()
+        run_loop(main.main, duration_ms)
+    finally:
+        main.SmartWatch = smart_watch
+    watch = BootWatch.last
+    for phase, (ms, ok) in watch.boot.phases.items():
+        rec.extra[phase] = ms if ok else f"{ms}(失敗)"
+    rec.extra.update(
+        first_frame_spi_ms=round(watch.first_frame_bytes * SPI_US_PER_BYTE / 1000, 1),
+        weather_shown=bool(watch.weather_info),
+        time_shown=watch.time_field.value != "--:--")
+
+
+class TickProbe(app_snake.SnakeGame):
+    """記錄每一步實際的間隔，並讓 CycleBot 透過旋鈕操作"""
+
+    def __init__(self, display, encoder, knob):
+        self.knob = knob
+        self.bot = None
+        self.last_tick_us = None
+        self.late_us = []
+        super().__init__(display, encoder)
+
+    def reset_game(self):
+        super().reset_game()
+        self.bot = make_bot(self)
+        self.last_tick_us = None
+
+    def move_snake(self):
+        now = clock.now_us
+        if self.last_tick_us is not None:
+            self.late_us.append(now - self.last_tick_us - self.game_speed * 1000)
+        self.last_tick_us = now
+        super().move_snake()
+        if not self.game_over:
+            turn = self.bot.rotation(cell_xy(self.head()), self.direction)
+            if turn:
+                self.knob.turn(turn)
+
+
+class GameWatch(main.SmartWatch):
+    def __init__(self, display, encoder, knob):
+        self.knob = knob
+        super().__init__(display, encoder)
+
+    def load_app(self, index):
+        self.game = TickProbe(self.display, self.encoder, self.knob)
+        return app_snake.App(self, self.game)
+
+
+def runtime_game(rec, duration_ms=120000, weather_interval_ms=20000, seed=1):
+    """在完整的 SmartWatch.run 中玩貪吃蛇，同時每 weather_interval_ms 更新天氣
+
+    回報遊戲節拍比 game_speed 晚了多少（抖動）；阻塞 max 是單一幀的最長執行時間。
+    """
+    random.seed(seed)
+    device.configure()
+    display = device.make_display()
+    encoder, knob = device.make_encoder()
+    watch = GameWatch(display, encoder, knob)
+    watch.weather_api.update_interval = weather_interval_ms
+    knob.turn(1, delay_us=3000000)  # 開機後進入遊戲
+    rec.attach(display)
+    run_loop(watch.run, duration_ms)
+    game = watch.game
+    late = sorted(game.late_us)
+    rec.extra.update(ticks=len(late) + 1, score=game.score, game_over=game.game_over,
+                     requests=urequests.requests_made,
+                     tick_late_p99_us=late[len(late) * 99 // 100], tick_late_max_us=late[-1])
+
+
+def gc_pauses(rec, managed=True, boot_ms=5000, clock_ms=30000, duration_ms=180000,
+              weather_interval_ms=20000, seed=1):
+    """主畫面 clock_ms 後進入貪吃蛇，期間每 weather_interval_ms 更新天氣，比較回收的時機
+
+    sim 的 gc 把每幀的配置累計成垃圾，超過 gc.threshold 或堆積空間時在那一幀中
+    自動回收（落在繪圖、節拍或下載中途的暫停），依開機（boot_ms 之前）、主畫面與
+    遊戲中（載入後一秒起）分別計數。managed=False 時不設門檻也不在空檔回收，
+    與改版前相同。主機上沒有碎片化，最大區塊只是確認搜尋可以執行。
+    """
+    random.seed(seed)
+    main.GC_MANAGED = managed
+    marks = {}
+
+    def snapshot(name):
+        marks[name] = gc.auto_collections
+
+    try:
+        with _tracing():
+            device.configure()
+            display = device.make_display()
+            encoder, knob = device.make_encoder()
+            watch = GameWatch(display, encoder, knob)
+            watch.weather_api.update_interval = weather_interval_ms
+            knob.turn(1, delay_us=clock_ms * 1000)
+            clock.call_later(boot_ms * 1000, snapshot, "boot")
+            clock.call_later(clock_ms * 1000, snapshot, "clock")
+            clock.call_later((clock_ms + 1000) * 1000, snapshot, "load")
+            rec.attach(display)
+            run_loop(watch.run, duration_ms)
+            memory = watch.memory
+            auto = gc.auto_collections
+            memory.report()
+    finally:
+        main.GC_MANAGED = True
+    game = watch.game
+    late = sorted(game.late_us)
+    rec.extra.update(auto_boot=marks["boot"], auto_clock=marks["clock"] - marks["boot"],
+                     auto_game=auto - marks["load"],
+                     detected_auto=memory.auto_collections, collections=memory.collections,
+                     idle=memory.idle_collections, pause_avg_ms=round(memory.pause_us / max(1, memory.collections) / 1000, 1),
+                     pause_max_ms=round(memory.pause_max_us / 1000, 1), requests=urequests.requests_made,
+                     ticks=len(late) + 1, tick_late_max_us=late[-1], largest_free=memory.largest,
+                     fragmentation_pct=memory.fragmentation)
+
+
+# ---------- 輸入紀錄與重播 ----------
+
+class RecordProbe(TickProbe):
+    """CycleBot 操作 steer_moves 步後放手讓蛇撞牆，結束後按按鈕再玩一局"""
+
+    def __init__(self, display, encoder, knob, steer_moves):
+        self.steer_moves = steer_moves
+        self.moves = 0
+        self.foods = []
+        super().__init__(display, encoder, knob)
+
+    def reset_game(self):
+        self.moves = 0
+        super().reset_game()
+
+    def generate_food(self):
+        placed = super().generate_food()
+        self.foods.append(self.food)
+        return placed
+
+    def move_snake(self):
+        self.moves += 1
+        if self.moves <= self.steer_moves:
+            super().move_snake()
+        else:
+            app_snake.SnakeGame.move_snake(self)
+        if self.game_over:
+            self.knob.press(delay_us=500000)
+
+
+class ReplayProbe(app_snake.SnakeGame):
+    """只記錄食物位置，輸入全部來自重播"""
+
+    def __init__(self, display, encoder):
+        self.foods = []
+        super().__init__(display, encoder)
+
+    def generate_food(self):
+        placed = super().generate_food()
+        self.foods.append(self.food)
+        return placed
+
+
+class JitterProbe(ReplayProbe):
+    """重播時每一步另外阻塞 0～jitter_ms 毫秒（回收或 flash），之後每一步的時間都往後移"""
+
+    def __init__(self, display, encoder, jitter_ms, rng):
+        self.jitter_us = jitter_ms * 1000
+        self.rng = rng
+        super().__init__(display, encoder)
+
+    def move_snake(self):
+        clock.advance_us(self.rng.randrange(self.jitter_us))
+        super().move_snake()
+
+
+class ProbeWatch(main.SmartWatch):
+    def __init__(self, display, encoder, make_game):
+        self.make_game = make_game
+        super().__init__(display, encoder)
+
+    def load_app(self, index):
+        self.game = self.make_game(self.display, self.encoder)
+        return app_snake.App(self, self.game)
+
+
+def replay(rec, duration_ms=90000, steer_moves=150, seed=1, jitter_ms=0):
+    """記錄一段遊戲的輸入，重設模擬環境後重播，比較兩次的遊戲與繪圖是否完全相同
+
+    記錄的那一段由 CycleBot 以旋鈕操作，放手撞牆後按按鈕重玩；幀統計為重播那一段。
+    jitter_ms > 0 時重播的每一步另外阻塞一段隨機時間，遊戲的節奏與記錄時不同，
+    只比較食物（重播多跑 jitter_ms * 250 毫秒，取前面相同數量）與分數。
+    """
+    random.seed(seed)
+    main.INPUT_RECORD = True
+    try:
+        device.configure()
+        display = device.make_display()
+        encoder, knob = device.make_encoder()
+        knob.turn(1, delay_us=3000000)
+        watch = ProbeWatch(display, encoder, lambda d, e: RecordProbe(d, e, knob, steer_moves))
+        run_loop(watch.run, duration_ms)
+        recorded_log = watch.input_log
+        recorded_log.flush()
+        recorded = _game_result(watch.game, display)
+        with open(main.INPUT_LOG_FILE, "rb") as f:
+            log_bytes = f.read()
+    finally:
+        main.INPUT_RECORD = False
+
+    # 重播前把模擬環境（時鐘、腳位、flash）還原到開機狀態，只留下輸入紀錄
+    sim.reset()
+    device.reset_app()
+    rec.start()
+    random.seed(seed + 1)  # 重播必須只靠紀錄中的種子
+    main.INPUT_REPLAY = True
+    try:
+        device.configure()
+        with open(main.INPUT_LOG_FILE, "wb") as f:
+            f.write(log_bytes)
+        display = device.make_display()
+        encoder, _ = device.make_encoder()
+        if jitter_ms:
+            rng = random.Random(seed)
+            watch = ProbeWatch(display, encoder, lambda d, e: JitterProbe(d, e, jitter_ms, rng))
+        else:
+            watch = ProbeWatch(display, encoder, ReplayProbe)
+        rec.attach(display)
+        run_loop(watch.run, duration_ms + jitter_ms * 250)
+        replayed_log = watch.input_log
+        replayed = _game_result(watch.game, display)
+    finally:
+        main.INPUT_REPLAY = False
+    rec.extra.update(log_bytes=len(log_bytes), events=recorded_log.events,
+                     games=recorded_log.games, score_matches=replayed_log.matches,
+                     score_mismatches=replayed_log.mismatches, foods=len(replayed[0]))
+    if jitter_ms:
+        rec.extra.update(same_foods=recorded[0] == replayed[0][:len(recorded[0])])
+    else:
+        rec.extra.update(same_foods=recorded[0] == replayed[0], same_stats=recorded[1] == replayed[1],
+                         same_screen=recorded[2] == replayed[2])
+
+
+def _game_result(game, display):
+    return game.foods, display.stats.snapshot(), display.frame_bytes()
+
+
+# ---------- 分數紀錄 ----------
+
+def _score_state(log):
+    return log.seq, log.games, log.best, log.longest
+
+
+def _reload_scores():
+    """模擬重新開機：從 flash 載入新的 ScoreLog"""
+    log = main.ScoreLog(main.SCORE_LOG_PREFIX)
+    log.load()
+    return log
+
+
+def score_log(rec, duration_ms=120000, steer_moves=40, games=300, seed=1):
+    """在手錶上連續玩幾局，再直接寫入 games 局讓檔案輪替，檢查重新開機後的統計與斷電
+
+    手錶那一段由 CycleBot 操作 steer_moves 步後撞牆、按按鈕重玩；幀統計為這一段。
+    斷電以三種方式模擬：最後一筆只寫出一半、換檔時新檔案只寫出一半、最後一筆的
+    CRC 不符。重新載入後應該回到前一局的統計，之後的紀錄也要能正確寫入。
+    寫入時間是電腦上每局 add() 的最長時間。
+    """
+    random.seed(seed)
+    device.configure()
+    display = device.make_display()
+    encoder, knob = device.make_encoder()
+    knob.turn(1, delay_us=3000000)
+    watch = ProbeWatch(display, encoder, lambda d, e: RecordProbe(d, e, knob, steer_moves))
+    rec.attach(display)
+    run_loop(watch.run, duration_ms)
+    scores = watch.scores
+    watch_state = _score_state(scores)
+    rebooted_same = _score_state(_reload_scores()) == watch_state
+
+    # 直接寫入 games 局，超過 SCORE_LOG_FILES * SCORE_LOG_RECORDS 筆會輪替到最舊的檔案
+    log = _reload_scores()
+    history = [_score_state(log)]
+    best = log.best
+    add_max_us = 0
+    for _ in range(games):
+        score = random.randrange(0, 400, 10)
+        best = max(best, score)
+        start = time.perf_counter()
+        log.add(score, 3 + score // 10)
+        add_max_us = max(add_max_us, (time.perf_counter() - start) * 1e6)
+        history.append(_score_state(log))
+    reloaded = _reload_scores()
+    consistent = _score_state(reloaded) == history[-1] and reloaded.best == best
+    files = [path for path in log.paths if os.path.exists(path)]
+    flash_bytes = sum(os.path.getsize(path) for path in files)
+    bytes_per_game = log.bytes_written / games
+
+    # 斷電一：最後一筆只寫出一半
+    with open(log.paths[reloaded.file], "ab") as f:
+        f.write(bytes(main.SCORE_ENTRY_SIZE // 2))
+    torn = _reload_scores()
+    torn_append_ok = _score_state(torn) == history[-1] and torn.dropped == 1
+    torn.add(100, 13)
+    history.append(_score_state(torn))
+    after = _reload_scores()
+    torn_append_ok = torn_append_ok and _score_state(after) == history[-1] and not after.dropped
+
+    # 斷電二：目前的檔案寫滿，換檔時新檔案的第一筆只寫出一半
+    while after.count < main.SCORE_LOG_RECORDS:
+        after.add(random.randrange(0, 400, 10), 5)
+        history.append(_score_state(after))
+    with open(after.paths[(after.file + 1) % main.SCORE_LOG_FILES], "wb") as f:
+        f.write(struct.pack(main.SCORE_HEADER, main.SCORE_MAGIC, main.SCORE_VERSION, after.generation + 1))
+        f.write(bytes(main.SCORE_ENTRY_SIZE - 1))
+    torn = _reload_scores()
+    torn_rotate_ok = _score_state(torn) == history[-1]
+    torn.add(50, 8)
+    history.append(_score_state(torn))
+    torn_rotate_ok = torn_rotate_ok and _score_state(_reload_scores()) == history[-1]
+
+    # 斷電三：最後一筆的內容與 CRC 不符，應該回到前一筆
+    path = torn.paths[torn.file]
+    with open(path, "r+b") as f:
+        f.seek(os.path.getsize(path) - main.SCORE_ENTRY_SIZE)
+        f.write(b"\xff")
+    bad_crc_ok = _score_state(_reload_scores()) == history[-2]
+
+    rec.extra.update(watch_games=watch_state[1], watch_best=watch_state[2], watch_longest=watch_state[3],
+                     game_over_best=watch.game.best, rebooted_same=rebooted_same, games=reloaded.games,
+                     consistent=consistent, files=len(files), flash_bytes=flash_bytes,
+                     bytes_per_game=round(bytes_per_game, 1), add_max_us=round(add_max_us),
+                     torn_append_ok=torn_append_ok, torn_rotate_ok=torn_rotate_ok, bad_crc_ok=bad_crc_ok)
+
+
+# ---------- 效能分析 ----------
+
+def _real_ticks_us():
+    return int(time.perf_counter() * 1e6) % TICKS_PERIOD
+
+
+def _call_ns(fn, arg, calls=20000):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn(arg)
+    return (time.perf_counter() - start) * 1e9 / calls
+
+
+def profile(rec, duration_ms=60000, seed=1):
+    """開啟 PROFILE 玩一分鐘貪吃蛇，回報各熱點的樣本數與 p50/p99
+
+    各熱點欄位為「樣本數/p50/p99」（微秒）。模擬中程式不花虛擬時間，所以量測
+    期間 ticks_us 改用電腦的真實時間。另外回報連續記錄一萬個樣本的峰值配置
+    （只有 CPython 的暫存 int，不隨樣本數增加）、序列埠 prof 指令的輸出行數、
+    畫面上的效能資訊，以及安裝前後每次呼叫 RotaryEncoder.update 的成本（CPython 奈秒）。
+    最後以關鍵字參數呼叫一次包裝後的 draw_clock_face，參數不符時會中止。
+    """
+    random.seed(seed)
+    device.configure()
+    display = device.make_display()
+    encoder, knob = device.make_encoder()
+    update = main.RotaryEncoder.update
+    bare_ns = _call_ns(update, encoder)
+    main.PROFILE = True
+    utime.ticks_us = _real_ticks_us
+    try:
+        main.profiler.install()
+        hooked_ns = _call_ns(main.RotaryEncoder.update, encoder)
+        main.profiler.reset()
+        watch = GameWatch(display, encoder, knob)
+        overlay = {}  # 效能資訊輪流顯示的兩種內容，各保留最後一次
+        field_update = watch.overlay_field.update
+
+        def shown(display, value, color=None):
+            overlay["heap" if value.endswith("free") else "perf"] = value
+            return field_update(display, value, color)
+
+        watch.overlay_field.update = shown
+        knob.turn(1, delay_us=3000000)
+        rec.attach(display)
+        run_loop(watch.run, duration_ms)
+        # 包裝後的方法仍接受關鍵字參數
+        watch.draw_clock_face(full=True)
+    finally:
+        main.PROFILE = False
+        utime.ticks_us = _ticks_us
+    profiler = main.profiler
+    # 效能資訊那一行在遊戲邊界（含外框）之下，不會與分數或棋盤互相覆蓋
+    overlay_clear = ui.OVERLAY_Y >= app_snake.OFFSET_Y + app_snake.GRID_HEIGHT * app_snake.BLOCK_SIZE + 2
+    record_alloc = _measure_record_alloc(main.Profiler())
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        profiler.command("prof\n")
+    profiler.uninstall()
+    rec.extra.update({
+        name: f"{profiler.count(i)}/{profiler.percentile(i, 50)}/{profiler.percentile(i, 99)}"
+        for i, name in enumerate(main.PROF_NAMES)
+    })
+    rec.extra.update(record_peak_b=record_alloc, dump_lines=len(out.getvalue().splitlines()),
+                     overlay=f"{overlay.get('perf')} | {overlay.get('heap')}", overlay_clear=overlay_clear,
+                     update_ns=round(bare_ns), hooked_update_ns=round(hooked_ns),
+                     restored=main.RotaryEncoder.update is update)
+
+
+_ticks_us = utime.ticks_us
+
+
+def _measure_record_alloc(profiler, samples=10000):
+    with _tracing():
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for _ in range(samples):
+            profiler.record(main.PROF_ENCODER, 200)
+        return tracemalloc.get_traced_memory()[1] - before
+
+
+# ---------- 應用程式 ----------
+
+def _heap_bytes():
+    """gc.collect() 之後 tracemalloc 追蹤到的常駐記憶體"""
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+class AppsProbe(main.SmartWatch):
+    """記錄進入與離開應用程式後的常駐記憶體，以及載入過的 App 類別（弱參照）"""
+
+    def __init__(self, display, encoder):
+        self.opened = []
+        self.in_app = []
+        self.on_clock = []
+        self.app_classes = []
+        self.text_cache_after_close = []
+        super().__init__(display, encoder)
+
+    def load_app(self, index):
+        app = super().load_app(index)
+        self.app_classes.append(weakref.ref(type(app)))
+        return app
+
+    def open_app(self):
+        super().open_app()
+        self.opened.append(main.APPS[self.app_index][0])
+        self.in_app.append(_heap_bytes())
+
+    def close_app(self):
+        super().close_app()
+        self.text_cache_after_close.append(ui.text_renderer.size)
+        self.on_clock.append(_heap_bytes())
+
+
+def apps(rec, preload=False, visits=2, profile=False):
+    """以旋鈕輪流進入每個應用程式再返回主畫面 visits 輪，比較延遲載入與開機時全部載入
+
+    每輪：進入貪吃蛇（撞牆）後逆時針返回、按按鈕切到碼錶、進入並計時三秒後返回、
+    再按按鈕切回貪吃蛇。回報開機（建立 SmartWatch）的電腦耗時、開機後、應用程式中
+    與返回主畫面後的常駐記憶體（CPython 的 tracemalloc，只能相對比較）、匯入次數，
+    以及結束時仍未回收的 App 類別數（沒有 APP_PRELOAD 時應為 0）。profile=True 時
+    先安裝 Profiler，確認卸載的模組不會被它留住。
+    """
+    names = [module_name for _, module_name in main.APPS]
+    saved = {name: sys.modules.pop(name) for name in names if name in sys.modules}
+    main.APP_PRELOAD = preload
+    if profile:
+        main.profiler.install()
+    try:
+        with _tracing():
+            device.configure()
+            display = device.make_display()
+            encoder, knob = device.make_encoder()
+            heap_start = _heap_bytes()
+            start = time.perf_counter()
+            watch = AppsProbe(display, encoder)
+            boot_ms = (time.perf_counter() - start) * 1000
+            heap_boot = _heap_bytes() - heap_start
+            rec.attach(display)
+            second = 1000000
+            for visit in range(visits):
+                base = 3 * second + visit * 20 * second
+                knob.turn(1, delay_us=base)
+                knob.turn(-1, delay_us=base + 5 * second)
+                knob.press(delay_us=base + 7 * second)
+                knob.turn(1, delay_us=base + 9 * second)
+                knob.press(delay_us=base + 10 * second)
+                knob.turn(-1, delay_us=base + 13 * second)
+                knob.press(delay_us=base + 16 * second)
+            run_loop(watch.run, (3 + visits * 20) * 1000)
+            in_app = max(watch.in_app) - heap_start
+            on_clock = watch.on_clock[-1] - heap_start
+        gc.collect()
+        alive = sum(1 for ref in watch.app_classes if ref() is not None)
+    finally:
+        main.APP_PRELOAD = False
+        main.profiler.uninstall()
+        for name in names:
+            sys.modules.pop(name, None)
+        sys.modules.update(saved)
+    rec.extra.update(apps=len(names), preload=preload, boot_ms=round(boot_ms, 1),
+                     heap_boot=heap_boot, heap_in_app_max=in_app, heap_back_on_clock=on_clock,
+                     loads=watch.app_loads, apps_alive=alive,
+                     text_cache_after_close=max(watch.text_cache_after_close), visits=" ".join(watch.opened),
+                     screen=watch.current_screen, selected=watch.nav_label_field.value)
+
+
+# ---------- 閒置耗電 ----------
+
+# 耗電模型：每次喚醒的固定成本（離開 light sleep、排程器、讀 RTC 等），
+# CPU 時間以喚醒成本加上 SPI 傳輸估計（模擬中 Python 程式本身不花虛擬時間）
+WAKE_COST_US = 500
+
+
+class IdleWatch(main.SmartWatch):
+    """記錄旋鈕轉動後多久進入遊戲"""
+
+    def open_app(self):
+        self.game_started_us = clock.now_us
+        super().open_app()
+
+
+def idle(rec, minutes=10, irq=True, light_sleep=False):
+    """在主畫面閒置 minutes 分鐘，最後轉一格進入遊戲
+
+    回報每分鐘喚醒（排程器睡眠）次數、估計的 CPU 使用率、light sleep 比例，
+    以及最後一格從轉完到進入遊戲的延遲（確認閒置時仍能被編碼器喚醒）。
+    """
+    main.ENCODER_USE_IRQ = irq
+    main.LIGHT_SLEEP = light_sleep
+    try:
+        device.configure()
+        display = device.make_display()
+        encoder, knob = device.make_encoder()
+        watch = IdleWatch(display, encoder)
+        watch.game_started_us = None
+        rec.attach(display)
+        rec.count_idle = True
+        start_us = clock.now_us
+        turned_us = knob.turn(1, delay_us=minutes * 60000000)
+        run_loop(watch.run, minutes * 60000 + 1000)
+    finally:
+        main.ENCODER_USE_IRQ = True
+        main.LIGHT_SLEEP = False
+    elapsed_us = clock.now_us - start_us
+    spi_us = sum(f.bytes for f in rec.frames) * SPI_US_PER_BYTE
+    wakeups = len(rec.frames)
+    latency = None
+    if watch.game_started_us is not None:
+        latency = max(0, watch.game_started_us - turned_us) / 1000
+    rec.extra.update(
+        wakeups_per_min=round(wakeups * 60e6 / elapsed_us, 1),
+        watch_wakeups_per_min=round(watch.wakeups * 60e6 / elapsed_us, 1),
+        duty_pct=round((wakeups * WAKE_COST_US + spi_us) * 100 / elapsed_us, 3),
+        light_sleep_pct=round(machine.lightsleep_us * 100 / elapsed_us, 1),
+        entered_game=watch.current_screen == 1, input_latency_ms=latency)
+
+
+# ---------- 編碼器 ----------
+
+def encoder_poll(rec, detents=200, edge_us=15000, irq=False, bounce=0, gap_us=150000,
+                 block_us=0, hard=True):
+    """以固定轉速每次轉 10 格、方向交替，主迴圈每 10 ms 呼叫 get_rotation
+
+    accuracy 是讀到的格數比例，net 是讀到的淨格數與實際位置的誤差。block_us > 0 時
+    主迴圈每次另外阻塞 block_us（回收、flash 或同步網路），hard=False 改用 soft IRQ：
+    阻塞期間的中斷排入排程器，結束後才讀腳位，佇列滿了會丟掉（scheduler_dropped）。
+    sim 的 soft IRQ 只在阻塞時延後，沒有阻塞時與 hard IRQ 相同。
+    """
+    main.ENCODER_IRQ_HARD = hard
+    try:
+        encoder, knob = device.make_encoder(use_irq=irq)
+    finally:
+        main.ENCODER_IRQ_HARD = True
+    rec.attach()
+    rec.count_idle = True
+    done = 0
+    for i in range(detents // 10):
+        start = done + gap_us - clock.now_us if done else 0
+        done = knob.turn(10 if i % 2 == 0 else -10, edge_us=edge_us, bounce=bounce,
+                         delay_us=start)
+    detected = 0
+    net = 0
+    while clock.now_us <= done + 20000 or encoder.peek_rotation():
+        # 中斷模式每次取出一格，阻塞時會累積好幾格，全部讀完
+        rotation = encoder.get_rotation()
+        while rotation:
+            detected += abs(rotation)
+            net += rotation
+            rotation = encoder.get_rotation() if irq else 0
+        if block_us:
+            clock.advance_us(block_us)
+        time.sleep_ms(10)
+    rec.extra.update(turned=knob.turns, detected=detected, net=net - knob.detents,
+                     accuracy=round(detected / max(1, knob.turns), 3))
+    if irq:
+        rec.extra.update(scheduler_dropped=machine.scheduler_dropped)
+
+
+def encoder_events(rec, edge_us=500):
+    """餵入一段旋轉與按鈕序列，檢查中斷模式的事件順序與時間戳"""
+    encoder, knob = device.make_encoder(use_irq=True)
+    rec.attach()
+    rec.count_idle = True
+    knob.turn(3, edge_us=edge_us, bounce=2)
+    knob.press(hold_us=1000000, delay_us=5000)
+    knob.turn(-2, edge_us=edge_us, bounce=2, delay_us=5000)
+    knob.press(hold_us=100000, delay_us=5000)
+    expected = [main.EVENT_CW] * 3 + [main.EVENT_PRESS, main.EVENT_LONG_PRESS,
+                                      main.EVENT_RELEASE] + [main.EVENT_CCW] * 2 + [
+                                          main.EVENT_PRESS, main.EVENT_RELEASE]
+    events = []
+    last = None
+    ordered = True
+    for _ in range(300):
+        while True:
+            event = encoder.read_event()
+            if not event:
+                break
+            if last is not None and time.ticks_diff(encoder.event_time, last) < 0:
+                ordered = False
+            last = encoder.event_time
+            events.append(event)
+        time.sleep_ms(10)
+    rec.extra.update(events=len(events), sequence_ok=events == expected,
+                     timestamps_ordered=ordered, dropped=encoder.dropped_events)
+
+
+SCENARIOS = {
+    "clock": (clock_face, {}),
+    "clock-hour": (clock_face, {"minutes": 61}),
+    "clock-analog": (clock_face, {"analog": True}),
+    "time-drift": (time_drift, {}),
+    "text-cache": (text_cache, {}),
+    "snake": (snake, {}),
+    "snake-late": (snake, {"length": 200, "max_ticks": 400}),
+    "snake-batch": (snake, {"render": app_snake.RENDER_BATCH}),
+    "snake-late-batch": (snake, {"length": 200, "max_ticks": 400, "render": app_snake.RENDER_BATCH}),
+    "snake-framebuf": (snake, {"render": app_snake.RENDER_FRAMEBUF}),
+    "snake-late-framebuf": (snake, {"length": 200, "max_ticks": 400,
+                                    "render": app_snake.RENDER_FRAMEBUF}),
+    "snake-fill": (snake_fill, {}),
+    "snake-alloc": (snake_alloc, {}),
+    "engine-random": (snake_engine, {}),
+    "engine-greedy": (snake_engine, {"policy": "greedy", "games": 200}),
+    "engine-cycle": (snake_engine, {"policy": "cycle", "games": 5}),
+    "weather": (weather, {}),
+    "weather-all": (weather, {"location": cwa.LOCATIONS, "fetches": 5}),
+    "weather-cities": (weather_cities, {}),
+    "weather-cities-index": (weather_cities, {"labels": ()}),
+    "weather-timeline": (weather_timeline, {}),
+    "weather-parse": (weather_parse, {}),
+    "weather-boot": (weather_boot, {}),
+    "weather-errors": (weather_errors, {}),
+    "weather-no-tls": (weather_no_tls, {}),
+    "weather-icons": (weather_icons, {}),
+    "runtime-game": (runtime_game, {}),
+    "gc": (gc_pauses, {}),
+    "gc-default": (gc_pauses, {"managed": False}),
+    "boot": (boot, {}),
+    "boot-warm": (boot, {"warm": True}),
+    "boot-offline": (boot, {"warm": True, "reachable": False}),
+    "boot-self-test": (boot, {"hold_button": True}),
+    "replay": (replay, {}),
+    "replay-jitter": (replay, {"jitter_ms": 40}),
+    "scores": (score_log, {}),
+    "apps": (apps, {}),
+    "apps-preload": (apps, {"preload": True}),
+    "apps-profile": (apps, {"profile": True}),
+    "profile": (profile, {}),
+    "idle-poll": (idle, {"irq": False}),
+    "idle-tickless": (idle, {}),
+    "idle-lightsleep": (idle, {"light_sleep": True}),
+    "encoder-slow": (encoder_poll, {}),
+    "encoder-fast": (encoder_poll, {"edge_us": 2000}),
+    "encoder-irq-fast": (encoder_poll, {"edge_us": 2000, "irq": True}),
+    "encoder-irq-bounce": (encoder_poll, {"edge_us": 300, "irq": True, "bounce": 3}),
+    "encoder-irq-blocking": (encoder_poll, {"edge_us": 2000, "irq": True, "block_us": 20000}),
+    "encoder-irq-soft": (encoder_poll, {"edge_us": 2000, "irq": True, "block_us": 20000, "hard": False}),
+    "encoder-events": (encoder_events, {}),
+}
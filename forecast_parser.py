@@ -0,0 +1,330 @@
+"""中央氣象署 F-C0032-001 的串流解析器
+
+不把整份 JSON 讀進記憶體，而是以固定大小的緩衝區分段讀取，只擷取
+records.location[].weatherElement[].time[] 底下需要的欄位。記憶體用量
+與回應大小無關，只有讀取緩衝區、鍵名緩衝區與數值緩衝區。
+
+每擷取到一個欄位就呼叫 handler(location, element, slot, field, value)：
+- location: 第幾個城市（從 0 開始）
+- element: 天氣因子名稱，例如 'Wx'、'PoP'；城市名稱時為 None
+- slot: 第幾個時段（從 0 開始）；城市名稱與因子名稱時為 -1
+- field: FIELD_* 常數
+- value: 字串
+
+假設 elementName 出現在 time 之前（氣象署的回應都是如此）。
+"""
+
+CHUNK_SIZE = 128
+KEY_SIZE = 16
+VALUE_SIZE = 48
+MAX_DEPTH = 16
+
+# 回呼的欄位種類
+FIELD_LOCATION_NAME = 0
+FIELD_START_TIME = 1
+FIELD_END_TIME = 2
+FIELD_PARAMETER_NAME = 3
+FIELD_PARAMETER_VALUE = 4
+
+# 目前所在的容器（依鍵名路徑判斷）
+_CTX_OTHER = 0
+_CTX_ROOT = 1
+_CTX_RECORDS = 2
+_CTX_LOCATIONS = 3
+_CTX_LOCATION = 4
+_CTX_ELEMENTS = 5
+_CTX_ELEMENT = 6
+_CTX_TIMES = 7
+_CTX_SLOT = 8
+_CTX_PARAMETER = 9
+
+# 鍵名編號
+_KEY_OTHER = 0
+_KEY_RECORDS = 1
+_KEY_LOCATION = 2
+_KEY_LOCATION_NAME = 3
+_KEY_WEATHER_ELEMENT = 4
+_KEY_ELEMENT_NAME = 5
+_KEY_TIME = 6
+_KEY_START_TIME = 7
+_KEY_END_TIME = 8
+_KEY_PARAMETER = 9
+_KEY_PARAMETER_NAME = 10
+_KEY_PARAMETER_VALUE = 11
+
+_KEYS = (
+    (b"records", _KEY_RECORDS),
+    (b"location", _KEY_LOCATION),
+    (b"locationName", _KEY_LOCATION_NAME),
+    (b"weatherElement", _KEY_WEATHER_ELEMENT),
+    (b"elementName", _KEY_ELEMENT_NAME),
+    (b"time", _KEY_TIME),
+    (b"startTime", _KEY_START_TIME),
+    (b"endTime", _KEY_END_TIME),
+    (b"parameter", _KEY_PARAMETER),
+    (b"parameterName", _KEY_PARAMETER_NAME),
+    (b"parameterValue", _KEY_PARAMETER_VALUE),
+)
+
+# 所在容器 << 4 | 鍵名 -> 子容器
+_CHILD_CONTEXT = {
+    _CTX_ROOT << 4 | _KEY_RECORDS: _CTX_RECORDS,
+    _CTX_RECORDS << 4 | _KEY_LOCATION: _CTX_LOCATIONS,
+    _CTX_LOCATION << 4 | _KEY_WEATHER_ELEMENT: _CTX_ELEMENTS,
+    _CTX_ELEMENT << 4 | _KEY_TIME: _CTX_TIMES,
+    _CTX_SLOT << 4 | _KEY_PARAMETER: _CTX_PARAMETER,
+}
+
+# 陣列容器 -> 元素容器
+_ITEM_CONTEXT = {
+    _CTX_LOCATIONS: _CTX_LOCATION,
+    _CTX_ELEMENTS: _CTX_ELEMENT,
+    _CTX_TIMES: _CTX_SLOT,
+}
+
+# 所在容器 << 4 | 鍵名 -> 要擷取的欄位（-1 為天氣因子名稱）
+_CAPTURE = {
+    _CTX_LOCATION << 4 | _KEY_LOCATION_NAME: FIELD_LOCATION_NAME,
+    _CTX_ELEMENT << 4 | _KEY_ELEMENT_NAME: -1,
+    _CTX_SLOT << 4 | _KEY_START_TIME: FIELD_START_TIME,
+    _CTX_SLOT << 4 | _KEY_END_TIME: FIELD_END_TIME,
+    _CTX_PARAMETER << 4 | _KEY_PARAMETER_NAME: FIELD_PARAMETER_NAME,
+    _CTX_PARAMETER << 4 | _KEY_PARAMETER_VALUE: FIELD_PARAMETER_VALUE,
+}
+
+# 字元碼
+_QUOTE = 0x22
+_BACKSLASH = 0x5C
+_LBRACE = 0x7B
+_RBRACE = 0x7D
+_LBRACKET = 0x5B
+_RBRACKET = 0x5D
+_COLON = 0x3A
+_COMMA = 0x2C
+
+# 語彙狀態
+_S_VALUE = 0  # 等待值或結構符號
+_S_KEY = 1  # 讀取鍵名字串
+_S_STRING = 2  # 讀取值字串
+_S_ESCAPE = 3  # 字串中的反斜線之後
+_S_UNICODE = 4  # \uXXXX 的四個十六進位字元
+_S_LITERAL = 5  # 數字、true、false、null
+
+
+class ForecastParser:
+    def __init__(self, handler):
+        self.handler = handler
+        self.buf = bytearray(CHUNK_SIZE)
+        self._key = bytearray(KEY_SIZE)
+        self._value = bytearray(VALUE_SIZE)
+        self._ctx = bytearray(MAX_DEPTH)
+        self.reset()
+
+    def reset(self):
+        self._depth = 0
+        self._state = _S_VALUE
+        self._in_object = False
+        self._expect_key = False
+        self._key_len = 0
+        self._key_id = _KEY_OTHER
+        self._value_len = 0
+        self._capture = None
+        self._escape_from = _S_STRING
+        self._unicode = 0
+        self._unicode_digits = 0
+        self.location = -1
+        self.element = None
+        self.slot = -1
+        self.bytes_read = 0
+        self.done = False
+
+    def parse_stream(self, stream):
+        """從具有 readinto 的串流（例如 response.raw）讀到結束為止"""
+        buf = self.buf
+        view = memoryview(buf)
+        while not self.done:
+            n = stream.readinto(view)
+            if not n:
+                break
+            self.feed(buf, n)
+        return self.done
+
+    def feed(self, data, length=None):
+        """解析一段資料（bytes 或 bytearray 的前 length 個位元組）"""
+        if length is None:
+            length = len(data)
+        self.bytes_read += length
+        i = 0
+        while i < length:
+            b = data[i]
+            i += 1
+            state = self._state
+            if state == _S_STRING or state == _S_KEY:
+                if b == _QUOTE:
+                    if state == _S_KEY:
+                        self._end_key()
+                    else:
+                        self._end_string()
+                elif b == _BACKSLASH:
+                    self._escape_from = state
+                    self._state = _S_ESCAPE
+                else:
+                    self._append(b)
+            elif state == _S_VALUE:
+                if b <= 0x20 or b == _COLON:
+                    continue
+                if b == _QUOTE:
+                    if self._expect_key:
+                        self._key_len = 0
+                        self._state = _S_KEY
+                    else:
+                        self._value_len = 0
+                        ctx = self._ctx[self._depth - 1] & 0x7F
+                        self._capture = _CAPTURE.get(ctx << 4 | self._key_id)
+                        self._state = _S_STRING
+                elif b == _LBRACE:
+                    self._push(True)
+                elif b == _LBRACKET:
+                    self._push(False)
+                elif b == _RBRACE or b == _RBRACKET:
+                    self._pop()
+                elif b == _COMMA:
+                    self._expect_key = self._in_object
+                else:
+                    self._state = _S_LITERAL
+            elif state == _S_LITERAL:
+                if b == _COMMA or b == _RBRACE or b == _RBRACKET or b <= 0x20:
+                    self._state = _S_VALUE
+                    i -= 1  # 交給 _S_VALUE 處理這個字元
+            elif state == _S_ESCAPE:
+                self._state = self._escape_from
+                if b == 0x75:  # u
+                    self._unicode = 0
+                    self._unicode_digits = 0
+                    self._state = _S_UNICODE
+                elif b == 0x6E:  # n
+                    self._append(0x0A)
+                elif b == 0x74:  # t
+                    self._append(0x09)
+                else:
+                    self._append(b)
+            else:  # _S_UNICODE
+                self._unicode = (self._unicode << 4) | _hex(b)
+                self._unicode_digits += 1
+                if self._unicode_digits == 4:
+                    self._state = self._escape_from
+                    self._append_codepoint(self._unicode)
+
+    # --- 結構 ---
+
+    def _push(self, is_object):
+        depth = self._depth
+        if depth >= MAX_DEPTH:
+            raise ValueError("JSON 巢狀層數過深")
+        if depth == 0:
+            ctx = _CTX_ROOT if is_object else _CTX_OTHER
+        else:
+            parent = self._ctx[depth - 1] & 0x7F
+            if self._in_object:
+                ctx = _CHILD_CONTEXT.get(parent << 4 | self._key_id, _CTX_OTHER)
+            else:
+                ctx = _ITEM_CONTEXT.get(parent, _CTX_OTHER)
+            if ctx == _CTX_LOCATION:
+                self.location += 1
+                self.element = None
+            elif ctx == _CTX_ELEMENT:
+                self.element = None
+                self.slot = -1
+            elif ctx == _CTX_SLOT:
+                self.slot += 1
+        # 最高位元記錄這一層是物件還是陣列
+        self._ctx[depth] = ctx | 0x80 if is_object else ctx
+        self._depth = depth + 1
+        self._in_object = is_object
+        self._expect_key = is_object
+        self._key_id = _KEY_OTHER
+
+    def _pop(self):
+        depth = self._depth - 1
+        self._depth = depth
+        self._expect_key = False
+        if depth <= 0:
+            self._depth = 0
+            self.done = True
+            return
+        self._in_object = bool(self._ctx[depth - 1] & 0x80)
+
+    # --- 字串 ---
+
+    def _append(self, b):
+        if self._state == _S_KEY:
+            if self._key_len < KEY_SIZE:
+                self._key[self._key_len] = b
+            self._key_len += 1
+        elif self._capture is not None and self._value_len < VALUE_SIZE:
+            self._value[self._value_len] = b
+            self._value_len += 1
+
+    def _append_codepoint(self, cp):
+        # 只需處理 BMP 範圍內的字元（中文字）
+        if cp < 0x80:
+            self._append(cp)
+        elif cp < 0x800:
+            self._append(0xC0 | cp >> 6)
+            self._append(0x80 | cp & 0x3F)
+        else:
+            self._append(0xE0 | cp >> 12)
+            self._append(0x80 | (cp >> 6) & 0x3F)
+            self._append(0x80 | cp & 0x3F)
+
+    def _end_key(self):
+        self._state = _S_VALUE
+        self._expect_key = False
+        self._key_id = _KEY_OTHER
+        n = self._key_len
+        if n > KEY_SIZE:
+            return
+        key = self._key
+        for name, key_id in _KEYS:
+            if len(name) != n:
+                continue
+            for j in range(n):
+                if key[j] != name[j]:
+                    break
+            else:
+                self._key_id = key_id
+                return
+
+    def _end_string(self):
+        self._state = _S_VALUE
+        field = self._capture
+        if field is None:
+            return
+        self._capture = None
+        value = self._text()
+        if field == -1:
+            self.element = value
+        elif field == FIELD_LOCATION_NAME:
+            self.handler(self.location, None, -1, field, value)
+        elif self.element is not None:
+            self.handler(self.location, self.element, self.slot, field, value)
+
+    def _text(self):
+        """把數值緩衝區轉成字串；截斷時去掉最後一個不完整的 UTF-8 字元"""
+        n = self._value_len
+        value = self._value
+        i = n - 1
+        while i >= 0 and value[i] & 0xC0 == 0x80:
+            i -= 1
+        if i >= 0:
+            lead = value[i]
+            need = 1 if lead < 0x80 else 2 if lead < 0xE0 else 3 if lead < 0xF0 else 4
+            if n - i < need:
+                n = i
+        return str(value[:n], "utf-8")
+
+
+def _hex(b):
+    if b <= 0x39:
+        return b - 0x30
+    return (b | 0x20) - 0x57
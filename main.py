@@ -1,39 +1,80 @@
 import machine
+import micropython
 import gc9a01
-import vga1_8x16 as font
 import time
 import random
+import os
+import sys
+import gc
+import select
+import binascii
+import struct
 import network
+from array import array
 import urequests
+import ui
+import uasyncio as asyncio
 import ntptime
+import esp32
 from machine import Pin, SPI, RTC
+from ui import (SCREEN_WIDTH, SCREEN_HEIGHT, OVERLAY_X, OVERLAY_Y, BLACK, WHITE, RED, GREEN, BLUE, YELLOW, GRAY, ORANGE,
+                TextField, IconField)
+from forecast_parser import (ForecastParser, FIELD_LOCATION_NAME, FIELD_START_TIME, FIELD_END_TIME,
+                             FIELD_PARAMETER_NAME, FIELD_PARAMETER_VALUE)
 
-# 螢幕設定
-SCREEN_WIDTH = 240
-SCREEN_HEIGHT = 240
-BLOCK_SIZE = 10
-
-# 顏色定義
-BLACK = gc9a01.BLACK
-WHITE = gc9a01.WHITE
-RED = gc9a01.RED
-GREEN = gc9a01.GREEN
-BLUE = gc9a01.BLUE
-YELLOW = gc9a01.color565(255, 255, 0)
-GRAY = gc9a01.color565(128, 128, 128)
-ORANGE = gc9a01.color565(255, 165, 0)
-
-# 遊戲設定
-GRID_WIDTH = 18
-GRID_HEIGHT = 18
-OFFSET_X = (SCREEN_WIDTH - (GRID_WIDTH * BLOCK_SIZE)) // 2
-OFFSET_Y = (SCREEN_HEIGHT - (GRID_HEIGHT * BLOCK_SIZE)) // 2
-
-# 方向定義
-UP = 0
-RIGHT = 1
-DOWN = 2
-LEFT = 3
+# 星期名稱
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+# 指針時鐘
+CLOCK_ANALOG = False  # True: 主畫面顯示指針時鐘，每秒更新秒針（每秒喚醒一次）
+CLOCK_CX = SCREEN_WIDTH // 2
+CLOCK_CY = SCREEN_HEIGHT // 2
+HAND_LENGTHS = (50, 78, 88)  # 時針、分針、秒針；不碰到刻度（半徑 104 以外）
+HAND_COLORS = (WHITE, WHITE, RED)
+# sin(i * 6°) * 1024，i = 0..15；其他角度由對稱性取得，執行時不做浮點運算
+SIN_Q10 = (0, 107, 213, 316, 416, 512, 602, 685, 761, 828, 887, 935, 974, 1002, 1018, 1024)
+
+# 編碼器設定
+ENCODER_USE_IRQ = True  # True: 中斷解碼；False: 舊的輪詢模式
+# True: hard IRQ，在中斷當下讀取腳位；False: soft IRQ 排入排程器，SPI、flash 或回收
+# 阻塞期間會延後執行（讀到的已經是之後的電位），排程佇列滿了還會丟掉（比較用）
+ENCODER_IRQ_HARD = True
+ENCODER_SELF_TEST = False  # True: 開機時執行編碼器測試（按住按鈕開機也會執行）
+LONG_PRESS_MS = 800  # 長按判定時間
+BUTTON_DEBOUNCE_MS = 20
+
+# 編碼器事件
+EVENT_NONE = 0
+EVENT_CW = 1  # 順時針一格
+EVENT_CCW = 2  # 逆時針一格
+EVENT_PRESS = 3
+EVENT_RELEASE = 4
+EVENT_LONG_PRESS = 5
+
+EVENT_QUEUE_SIZE = 32  # 必須是 2 的次方
+EVENT_QUEUE_MASK = EVENT_QUEUE_SIZE - 1
+
+# 全步進格雷碼狀態機，索引 = 狀態 * 4 + (CLK << 1 | DT)
+# 靜止時 CLK、DT 皆為 1；順時針 11 -> 01 -> 00 -> 10 -> 11，逆時針相反。
+# 只有走完整個週期才會輸出一格，彈跳與跳號的轉換會回到起點。
+_R_START = 0
+_R_CW_FINAL = 1
+_R_CW_BEGIN = 2
+_R_CW_NEXT = 3
+_R_CCW_BEGIN = 4
+_R_CCW_FINAL = 5
+_R_CCW_NEXT = 6
+_DIR_CW = 0x10
+_DIR_CCW = 0x20
+_ENCODER_TABLE = bytes((
+    _R_START, _R_CW_BEGIN, _R_CCW_BEGIN, _R_START,  # R_START
+    _R_CW_NEXT, _R_START, _R_CW_FINAL, _R_START | _DIR_CW,  # R_CW_FINAL
+    _R_CW_NEXT, _R_CW_BEGIN, _R_START, _R_START,  # R_CW_BEGIN
+    _R_CW_NEXT, _R_CW_BEGIN, _R_CW_FINAL, _R_START,  # R_CW_NEXT
+    _R_CCW_NEXT, _R_START, _R_CCW_BEGIN, _R_START,  # R_CCW_BEGIN
+    _R_CCW_NEXT, _R_CCW_FINAL, _R_START, _R_START | _DIR_CCW,  # R_CCW_FINAL
+    _R_CCW_NEXT, _R_CCW_FINAL, _R_CCW_BEGIN, _R_START,  # R_CCW_NEXT
+))
 
 # WiFi 設定
 WIFI_SSID = ""  # 請替換成你的 WiFi SSID
@@ -42,21 +83,547 @@ WIFI_PASSWORD = ""  # 請替換成你的 WiFi 密碼
 # 中央氣象局 API 設定
 CWA_API_KEY = ""  # 請替換成你的 API Key
 LOCATION_NAME = ""  # 可以改成你的城市
+LOCATION_NAMES = []  # 多個城市時填入，例如 ["臺北市", "高雄市"]，一次請求取得全部；空的時候只用 LOCATION_NAME
+LOCATION_LABELS = []  # 主畫面顯示的城市名稱（字型只有 ASCII），例如 ["Taipei", "Kaohsiung"]；沒填的顯示 1/2
+CITY_ROTATE_MS = 10000  # 主畫面輪流顯示各城市的間隔
+
+# 擷取的天氣因子 -> 欄位名稱
+WEATHER_FIELDS = {
+    'Wx': 'description',  # 天氣現象
+    'PoP': 'rain_prob',  # 降雨機率
+    'MinT': 'min_temp',  # 最低溫度
+    'MaxT': 'max_temp',  # 最高溫度
+}
+
+# 36 小時預報（F-C0032-001）：每個城市三個 12 小時時段
+FORECAST_SLOTS = 3
+CWA_UTC_OFFSET = 8 * 3600  # 氣象署的時間是臺灣時間（UTC+8），RTC 是 UTC
+POP_UNKNOWN = 255
+TEMP_UNKNOWN = -128
+WEATHER_REFRESH_MS = 6 * 3600 * 1000  # 預報涵蓋 36 小時，氣象署每 6 小時發布一次
+
+# RTC 早於這一年表示尚未校時（斷電後 RTC 從 2000 年開始）
+MIN_VALID_YEAR = 2024
+
+# 執行時期設定
+INPUT_POLL_MS = 10  # 輸入工作的輪詢間隔
+WIFI_TIMEOUT_MS = 10000
+WIFI_RETRY_MS = 60000  # WiFi 連線失敗後的重試間隔
+WEATHER_RETRY_MS = 60000  # 天氣更新失敗後的重試間隔
+TIME_SYNC_INTERVAL_MS = 6 * 3600 * 1000  # 每 6 小時重新校時
+TIME_SYNC_RETRY_MS = 60000  # 校時失敗後第一次重試的間隔，之後每次加倍
+TIME_SYNC_BACKOFF_MAX_MS = 3600 * 1000
+DRIFT_MIN_INTERVAL_MS = 1800 * 1000  # NTP 只有秒的解析度，間隔太短不估計漂移
+DRIFT_MAX_PPM = 50000  # RC 振盪器最差約 5%
+TIME_REBASE_MS = 3600 * 1000  # 每小時把推算的基準往前移，避免 ticks 回繞與大整數
+
+# 省電設定
+LIGHT_SLEEP = False  # True: 所有工作都在等待時進入 light sleep（WiFi 會斷線，更新前重新連線）
+LIGHT_SLEEP_MIN_MS = 50  # 距離下一個期限太近時不值得進入 light sleep
+POWER_REPORT_MS = 3600 * 1000  # 每小時印出喚醒次數與 CPU 使用率
+
+# 記憶體設定：回收排在工作之間的空檔，不讓自動回收落在繪圖或遊戲節拍中途
+GC_MANAGED = True  # False: 只在堆積不足時由 MicroPython 自動回收（比較用）
+GC_THRESHOLD = 32 * 1024  # 自上次回收配置超過這個量時 MicroPython 自動回收（保險）
+GC_IDLE_BYTES = 16 * 1024  # 空檔時累積配置超過這個量就先回收
+GC_IDLE_MIN_MS = 20  # 距離下一個期限至少這麼久才在空檔回收（一次回收約 5~10 ms）
+GC_PROBE_STEP = 256  # 搜尋最大可用區塊的精確度（位元組）
+
+# 會登記醒來期限的工作
+TASK_INPUT = 0
+TASK_APP = 1
+TASK_CLOCK = 2
+TASK_NETWORK = 3
+TASK_WEATHER = 4
+TASK_PROFILE = 5
+TASK_REPLAY = 6
+TASK_CITY = 7
+TASK_COUNT = 8
+
+# 效能分析設定（除錯用）
+PROFILE = False  # True: 記錄熱點耗時、畫面上顯示效能資訊，序列埠輸入 prof 印出直方圖
+PROFILE_BUCKETS = 24  # 第 i 桶為 2**(i-1) ~ 2**i - 1 微秒，最後一桶約 4 秒以上
+PROF_ENCODER = 0
+PROF_MOVE = 1
+PROF_SNAKE_DRAW = 2
+PROF_CLOCK_FACE = 3
+PROF_WEATHER = 4  # weather_task 每次更新天氣的時間（含等待網路）
+PROF_FRAME = 5  # 繪圖工作每次重畫的時間
+PROF_GC = 6  # MemoryManager 每次回收的暫停
+PROF_NAMES = ("encoder.update", "snake.move", "snake.draw", "clock_face", "weather", "frame", "gc")
+# 應用程式模組中的熱點：(模組, 類別, 方法, 區段)，模組載入時才取代
+PROF_APP_METHODS = (
+    ("app_snake", "SnakeGame", "move_snake", PROF_MOVE),
+    ("app_snake", "SnakeGame", "draw", PROF_SNAKE_DRAW),
+)
+
+# 輸入紀錄設定（重現效能問題用，只支援中斷模式）
+INPUT_RECORD = False  # True: 把編碼器事件與亂數種子記錄到 INPUT_LOG_FILE
+INPUT_REPLAY = False  # True: 重播 INPUT_LOG_FILE，重現同一局遊戲
+INPUT_LOG_FILE = "input.log"
+INPUT_LOG_BUFFER = 160  # 累積 32 筆再寫入 flash
+LOG_MAGIC = b"GWIL"
+LOG_VERSION = 1
+LOG_HEADER = "<4sBI"  # 標頭：識別字、版本、亂數種子
+LOG_HEADER_SIZE = 9
+LOG_RECORD = "<BHH"  # 每筆：種類、距離上一筆的遊戲步數、毫秒數
+LOG_RECORD_SIZE = 5
+LOG_WAIT = 0x40  # 只推進步數與時間（超過 65535 時）
+LOG_SCORE = 0x41  # 一局結束，毫秒數的欄位放分數
+LOG_GAME = 0x42  # 開始新的一局，步數從 0 算起
+
+# 分數紀錄設定：固定大小的紀錄附加在 flash 上，輪流寫入幾個檔案
+SCORE_LOG_PREFIX = "scores"  # 檔名為 scores0.log、scores1.log …
+SCORE_LOG_FILES = 4  # 輪流寫入的檔案數，寫入分散在不同的檔案
+SCORE_LOG_RECORDS = 64  # 每個檔案的紀錄數，寫滿就換到最舊的檔案重寫
+SCORE_MAGIC = b"GWSC"
+SCORE_VERSION = 1
+SCORE_HEADER = "<4sBI"  # 檔案標頭：識別字、版本、世代（每換一次檔案加一）
+SCORE_HEADER_SIZE = 9
+SCORE_RECORD = "<IHHIHH"  # 序號、分數、蛇長、累計局數、最高分、最長的蛇
+SCORE_RECORD_SIZE = 16
+SCORE_ENTRY_SIZE = SCORE_RECORD_SIZE + 4  # 加上 CRC32
+
+# 天氣快取設定
+WEATHER_CACHE_FILE = "weather.cache"
+WEATHER_CACHE_VERSION = "1"
+
+# 天氣圖示：tools/png2rle.py 轉換的 RLE 檔，從 flash 串流繪製
+WEATHER_ICONS = True  # True: 以圖示顯示天氣現象；False: 顯示文字描述（字型不能顯示中文）
+WEATHER_ICON_DIR = "icons"
+WEATHER_ICON_X = 64  # 40x40 的圖示畫在溫度與降雨機率左邊
+WEATHER_ICON_Y = 158
+# 圖示名稱 -> 天氣現象代碼（Wx 的 parameterValue），依氣象署的分類；沒列出的代碼不顯示圖示
+WX_ICON_CODES = (
+    ("sunny", (1,)),
+    ("partly", (2, 3)),
+    ("cloudy", (4, 5, 6, 7)),
+    ("rain", (8, 9, 10, 11, 12, 13, 14, 19, 20, 29, 30, 31, 32, 38, 39)),
+    ("thunder", (15, 16, 17, 18, 21, 22, 33, 34, 35, 36, 41)),
+    ("fog", (24, 25, 26, 27, 28)),
+    ("snow", (23, 37, 42)),
+)
+
+# 應用程式：(主畫面上的名稱, 模組)。主畫面按按鈕切換、順時針轉一格進入。
+# 模組在第一次進入時才匯入，返回主畫面後卸載並回收記憶體。模組提供 App(watch)：
+#   start()         每次進入時呼叫
+#   input(encoder)  處理輸入，回傳 False 表示返回主畫面
+#   tick()          距離下次呼叫的毫秒數（0 立即再呼叫），None 表示等 watch.wake_app()
+#   draw(full)      重畫；full=True 時畫面需要完整重畫
+#   busy()          是否不能被阻塞（延後校時、不進入 light sleep）
+APPS = (
+    ("Game", "app_snake"),
+    ("Timer", "app_stopwatch"),
+)
+APP_PRELOAD = False  # True: 開機時匯入所有應用程式並一直保留（比較用）
+
+class BootTimer:
+    """記錄開機各階段完成的時間（從 main() 開始算起的毫秒數）
+
+    每個階段各自成功或失敗；失敗的階段之後重試成功時會更新紀錄。
+    """
+    def __init__(self):
+        self.start = time.ticks_ms()
+        self.phases = {}  # 階段名稱 -> (毫秒, 是否成功)
+    
+    def mark(self, phase, ok=True):
+        """記錄階段完成；已經成功過的階段不再記錄"""
+        previous = self.phases.get(phase)
+        if previous and previous[1]:
+            return
+        elapsed = time.ticks_diff(time.ticks_ms(), self.start)
+        self.phases[phase] = (elapsed, ok)
+        print(f"[開機] {phase}: {elapsed} ms" + ("" if ok else "（失敗）"))
+
+class Profiler:
+    """熱點耗時統計：每個區段一個固定大小的對數直方圖
+    
+    記錄時只累加預先配置的 array，不配置記憶體。install() 以計時的包裝函式
+    取代要量測的方法，沒有安裝時原方法完全不受影響。
+    """
+    def __init__(self):
+        size = len(PROF_NAMES)
+        self.counts = array('I', bytes(4 * size * PROFILE_BUCKETS))
+        self.maxima = array('I', bytes(4 * size))
+        self._originals = []  # (類別, 方法名稱, 原方法, 應用程式模組名稱或 None)
+        self.installed = False
+        self._poll = None
+    
+    def record(self, section, us):
+        """記錄一次耗時（微秒）"""
+        bucket = 0
+        value = us
+        while value and bucket < PROFILE_BUCKETS - 1:
+            value >>= 1
+            bucket += 1
+        self.counts[section * PROFILE_BUCKETS + bucket] += 1
+        if us > self.maxima[section]:
+            self.maxima[section] = us
+    
+    def count(self, section):
+        base = section * PROFILE_BUCKETS
+        total = 0
+        for i in range(PROFILE_BUCKETS):
+            total += self.counts[base + i]
+        return total
+    
+    def percentile(self, section, p):
+        """第 p 百分位數的上界（該桶的上限，不超過最大值），沒有資料時回傳 0"""
+        total = self.count(section)
+        if not total:
+            return 0
+        target = (total * p + 99) // 100
+        base = section * PROFILE_BUCKETS
+        seen = 0
+        for bucket in range(PROFILE_BUCKETS):
+            seen += self.counts[base + bucket]
+            if seen >= target:
+                return min((1 << bucket) - 1, self.maxima[section])
+        return self.maxima[section]
+    
+    def reset(self):
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        for i in range(len(self.maxima)):
+            self.maxima[i] = 0
+    
+    def install(self):
+        """以計時版本取代熱點方法（包括已經載入的應用程式模組）"""
+        if self.installed:
+            return
+        self.installed = True
+        for cls, name, section in (
+            (RotaryEncoder, "update", PROF_ENCODER),
+            (SmartWatch, "draw_clock_face", PROF_CLOCK_FACE),
+        ):
+            self._replace(cls, name, section)
+        for _, module_name in APPS:
+            if module_name in sys.modules:
+                self.install_module(sys.modules[module_name])
+    
+    def install_module(self, module):
+        """取代剛載入的應用程式模組中的熱點方法；沒有 install() 時不做事"""
+        if not self.installed:
+            return
+        for module_name, cls_name, name, section in PROF_APP_METHODS:
+            if module.__name__ == module_name:
+                self._replace(getattr(module, cls_name), name, section, module_name)
+    
+    def uninstall_module(self, module_name):
+        """應用程式模組卸載前呼叫：放掉它的類別與原方法，模組才能被回收
+        
+        類別會隨模組一起丟掉，不必還原；下次載入時 install_module() 會重新取代。
+        """
+        self._originals = [entry for entry in self._originals if entry[3] != module_name]
+    
+    def _replace(self, cls, name, section, module_name=None):
+        method = getattr(cls, name)
+        self._originals.append((cls, name, method, module_name))
+        setattr(cls, name, self._timed(method, section))
+    
+    def uninstall(self):
+        """還原 install() 取代的方法"""
+        for cls, name, method, _ in reversed(self._originals):
+            setattr(cls, name, method)
+        self._originals = []
+        self.installed = False
+    
+    def _timed(self, method, section):
+        # 參數原樣轉交，關鍵字參數與明確傳入的 None 都和原方法相同；
+        # 每次呼叫會配置參數元組，只在安裝後（PROFILE）才有
+        record = self.record
+        def timed(*args, **kwargs):
+            start = time.ticks_us()
+            result = method(*args, **kwargs)
+            record(section, time.ticks_diff(time.ticks_us(), start))
+            return result
+        return timed
+    
+    def dump(self):
+        """從序列埠印出每個區段的統計與非空的直方圖桶"""
+        for section, name in enumerate(PROF_NAMES):
+            total = self.count(section)
+            if not total:
+                continue
+            print(f"[效能] {name}: n={total} p50<={self.percentile(section, 50)}us "
+                  f"p99<={self.percentile(section, 99)}us max={self.maxima[section]}us")
+            base = section * PROFILE_BUCKETS
+            buckets = []
+            for bucket in range(PROFILE_BUCKETS):
+                n = self.counts[base + bucket]
+                if n:
+                    buckets.append(f"<{1 << bucket}:{n}")
+            print("  " + " ".join(buckets))
+    
+    def command(self, line):
+        """處理序列埠指令：prof 印出直方圖，prof reset 清除"""
+        words = line.split()
+        if not words or words[0] != "prof":
+            return False
+        if len(words) > 1 and words[1] == "reset":
+            self.reset()
+            print("[效能] 已清除")
+        else:
+            self.dump()
+        return True
+    
+    def poll_serial(self):
+        """不阻塞地檢查序列埠（REPL 的 stdin）是否有指令"""
+        if self._poll is None:
+            self._poll = select.poll()
+            self._poll.register(sys.stdin, select.POLLIN)
+        if self._poll.poll(0):
+            self.command(sys.stdin.readline())
+
+profiler = Profiler()
+
+class MemoryManager:
+    """垃圾回收的時機：在所有工作都在等待的空檔回收，大量配置之前也先回收
+    
+    MicroPython 在配置時才回收（堆積不足或超過 gc.threshold），暫停會落在當時
+    正在執行的繪圖或遊戲節拍中。門檻設為 GC_THRESHOLD 當作保險，平常由 idle()
+    在累積配置超過 GC_IDLE_BYTES 時先回收。mem_alloc() 比上次看到的少、卻不是
+    自己回收的，就算一次自動回收（可能漏算，是下限）。
+    """
+    def __init__(self):
+        self.collections = 0  # 自己執行的回收次數（含空檔與配置前）
+        self.idle_collections = 0
+        self.auto_collections = 0  # 偵測到的自動回收
+        self.pause_us = 0  # 自己執行的回收累計暫停
+        self.pause_max_us = 0
+        self.base = 0  # 上次回收後的 mem_alloc()
+        self.last = 0  # 上次看到的 mem_alloc()
+        self.free = 0  # 上次報告時的可用記憶體、最大區塊與碎片化百分比
+        self.largest = 0
+        self.fragmentation = 0
+        if GC_MANAGED:
+            gc.threshold(GC_THRESHOLD)
+        self.collect()
+    
+    def allocated(self):
+        """上次回收之後配置的位元組，並偵測期間有沒有自動回收"""
+        alloc = gc.mem_alloc()
+        if alloc < self.last:
+            self.auto_collections += 1
+            self.base = alloc
+        self.last = alloc
+        return alloc - self.base
+    
+    def collect(self):
+        """立即回收並記錄暫停時間"""
+        self.allocated()
+        start = time.ticks_us()
+        gc.collect()
+        pause = time.ticks_diff(time.ticks_us(), start)
+        self.collections += 1
+        self.pause_us += pause
+        if pause > self.pause_max_us:
+            self.pause_max_us = pause
+        if PROFILE:
+            profiler.record(PROF_GC, pause)
+        self.base = self.last = gc.mem_alloc()
+    
+    def idle(self, slack_ms):
+        """所有工作都在等待時呼叫；slack_ms 為距離下一個期限的毫秒數，None 表示沒有期限"""
+        if not GC_MANAGED or slack_ms is not None and slack_ms < GC_IDLE_MIN_MS:
+            return False
+        if self.allocated() < GC_IDLE_BYTES:
+            return False
+        self.idle_collections += 1
+        self.collect()
+        return True
+    
+    def prepare(self, slack_ms=None):
+        """大量配置（下載天氣、匯入模組）之前呼叫：先回收，接下來的配置不會觸發自動回收
+        
+        slack_ms 為距離下一個期限的毫秒數；太近時不回收，避免延誤（例如遊戲的下一步）。
+        """
+        if not GC_MANAGED or slack_ms is not None and slack_ms < GC_IDLE_MIN_MS:
+            return
+        if self.allocated():
+            self.collect()
+    
+    def largest_free(self):
+        """以二分搜尋能配置的最大 bytearray，每次嘗試後回收；很慢，只在報告時使用"""
+        low = 0
+        high = gc.mem_free()
+        while high - low > GC_PROBE_STEP:
+            mid = (low + high) // 2
+            try:
+                bytearray(mid)  # 配置成功即可，下面的回收會釋放
+                low = mid
+            except MemoryError:
+                high = mid
+            gc.collect()
+        self.base = self.last = gc.mem_alloc()
+        return low
+    
+    def report(self, probe=True):
+        """印出回收次數與暫停；probe=True 時搜尋最大可用區塊估計碎片化"""
+        n = self.collections
+        line = (f"[記憶體] 回收 {n} 次（空檔 {self.idle_collections}）, "
+                f"平均 {self.pause_us / max(1, n) / 1000:.1f} ms, 最長 {self.pause_max_us / 1000:.1f} ms, "
+                f"自動回收 {self.auto_collections} 次")
+        if probe:
+            self.collect()
+            self.free = gc.mem_free()
+            self.largest = self.largest_free()
+            self.fragmentation = 100 - self.largest * 100 // self.free if self.free else 0
+            line += f", 可用 {self.free}, 最大區塊 {self.largest}, 碎片 {self.fragmentation}%"
+        print(line)
 
 class RotaryEncoder:
-    """滾輪編碼器類別 - 修正版本"""
-    def __init__(self, clk_pin, dt_pin, sw_pin=None):
+    """滾輪編碼器類別
+    
+    use_irq=False 時沿用輪詢模式：每次 update() 取樣 CLK/DT。
+    use_irq=True 時由腳位中斷驅動格雷碼狀態機，旋轉與按鈕事件連同時間戳
+    寫入預先配置的環形佇列，主迴圈以 read_event() 或 update() 取出。
+    """
+    def __init__(self, clk_pin, dt_pin, sw_pin=None, use_irq=False):
         self.clk = Pin(clk_pin, Pin.IN, Pin.PULL_UP)
         self.dt = Pin(dt_pin, Pin.IN, Pin.PULL_UP)
         self.sw = Pin(sw_pin, Pin.IN, Pin.PULL_UP) if sw_pin else None
         
         self.clk_last = self.clk.value()
         self.dt_last = self.dt.value()
-        self.pending_rotation = 0  # 使用單一變數而非緩衝區
+        self.pending_rotation = 0  # 輪詢模式: 最後一次旋轉；中斷模式: 尚未讀取的淨格數
         self.button_pressed = False
+        self.long_pressed = False
         self.last_rotation_time = 0
         self.debounce_time = 50  # 縮短防抖時間
         self.last_button_time = 0
+        
+        self.recorder = None  # 記錄模式時的 InputLog
+        
+        self.use_irq = use_irq
+        if use_irq:
+            # 事件佇列（中斷寫入 head，主迴圈讀取 tail），全部預先配置
+            self.event_types = bytearray(EVENT_QUEUE_SIZE)
+            self.event_times = array('I', range(EVENT_QUEUE_SIZE))
+            self.event_head = 0
+            self.event_tail = 0
+            self.event_time = 0  # 最近一次 read_event() 取出事件的時間
+            self.dropped_events = 0
+            
+            self._state = _R_START
+            self._sw_level = self.sw.value() if self.sw else 1
+            self._sw_time = time.ticks_ms()
+            self._long_sent = False
+            self.wake_flag = asyncio.ThreadSafeFlag()  # 有新事件時喚醒輸入工作
+            
+            # 處理函式不配置記憶體，可以在 hard IRQ 中執行
+            trigger = Pin.IRQ_FALLING | Pin.IRQ_RISING
+            self.clk.irq(handler=self._on_rotate, trigger=trigger, hard=ENCODER_IRQ_HARD)
+            self.dt.irq(handler=self._on_rotate, trigger=trigger, hard=ENCODER_IRQ_HARD)
+            if self.sw:
+                self.sw.irq(handler=self._on_button, trigger=trigger, hard=ENCODER_IRQ_HARD)
+    
+    def _push_event(self, event, timestamp):
+        """寫入一筆事件；佇列已滿時丟棄（中斷中不可配置記憶體）"""
+        head = self.event_head
+        next_head = (head + 1) & EVENT_QUEUE_MASK
+        if next_head == self.event_tail:
+            self.dropped_events += 1
+            return
+        self.event_types[head] = event
+        self.event_times[head] = timestamp
+        self.event_head = next_head
+        self.wake_flag.set()
+    
+    def _on_rotate(self, pin):
+        """CLK/DT 中斷：推進狀態機，走完一整格時記錄事件"""
+        state = _ENCODER_TABLE[((self._state & 0x0F) << 2) | (self.clk.value() << 1) | self.dt.value()]
+        self._state = state
+        if state & _DIR_CW:
+            self._push_event(EVENT_CW, time.ticks_ms())
+        elif state & _DIR_CCW:
+            self._push_event(EVENT_CCW, time.ticks_ms())
+    
+    def _on_button(self, pin):
+        """按鈕中斷：防抖後記錄按下/放開"""
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self._sw_time) < BUTTON_DEBOUNCE_MS:
+            return
+        level = self.sw.value()
+        if level == self._sw_level:
+            return
+        self._sw_level = level
+        self._sw_time = now
+        self._push_event(EVENT_PRESS if level == 0 else EVENT_RELEASE, now)
+    
+    def _check_button(self):
+        """在主迴圈中補上防抖期間漏掉的放開，並判定長按"""
+        if not self.sw:
+            return
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self._sw_time) < BUTTON_DEBOUNCE_MS:
+            return
+        irq_state = machine.disable_irq()
+        level = self.sw.value()
+        if level != self._sw_level:
+            self._sw_level = level
+            self._sw_time = now
+            self._push_event(EVENT_PRESS if level == 0 else EVENT_RELEASE, now)
+        if level == 0:
+            if not self._long_sent and time.ticks_diff(now, self._sw_time) >= LONG_PRESS_MS:
+                self._long_sent = True
+                self._push_event(EVENT_LONG_PRESS, now)
+        else:
+            self._long_sent = False
+        machine.enable_irq(irq_state)
+    
+    def needs_polling(self):
+        """是否需要定時輪詢：輪詢模式、還有未處理的輸入、按鈕按住或仍在防抖期間
+        
+        否則輸入工作可以等 wake_flag，直到下一次中斷才醒來。
+        """
+        if not self.use_irq or self.pending_rotation or self.event_head != self.event_tail:
+            return True
+        if not self.sw:
+            return False
+        return (self._sw_level == 0 or self.sw.value() == 0
+                or time.ticks_diff(time.ticks_ms(), self._sw_time) < BUTTON_DEBOUNCE_MS)
+    
+    def configure_wake(self):
+        """設定 light sleep 的喚醒腳位：CLK 或按鈕變成低電位"""
+        esp32.wake_on_ext0(self.clk, esp32.WAKEUP_ALL_LOW)
+        if self.sw:
+            esp32.wake_on_ext1((self.sw,), esp32.WAKEUP_ALL_LOW)
+    
+    def resync(self):
+        """light sleep 醒來後補處理睡眠期間沒有觸發中斷的腳位變化
+        
+        喚醒前的邊緣無法還原，逆時針的第一格可能遺失。
+        """
+        if not self.use_irq:
+            return
+        irq_state = machine.disable_irq()
+        self._on_rotate(self.clk)
+        if self.sw:
+            self._on_button(self.sw)
+        machine.enable_irq(irq_state)
+    
+    def read_event(self):
+        """取出下一個事件（EVENT_*），沒有事件時回傳 EVENT_NONE
+        
+        事件發生的 ticks_ms 存在 self.event_time。
+        """
+        self._check_button()
+        tail = self.event_tail
+        if tail == self.event_head:
+            return EVENT_NONE
+        event = self.event_types[tail]
+        self.event_time = self.event_times[tail]
+        self.event_tail = (tail + 1) & EVENT_QUEUE_MASK
+        if self.recorder is not None:
+            self.recorder.add(event, self.event_time)
+        return event
+    
+    def inject(self, event):
+        """如同中斷處理函式寫入一筆事件（重播輸入紀錄用）"""
+        irq_state = machine.disable_irq()
+        self._push_event(event, time.ticks_ms())
+        machine.enable_irq(irq_state)
     
     def get_raw_states(self):
         """獲取原始腳位狀態進行調試"""
@@ -64,6 +631,10 @@ class RotaryEncoder:
     
     def update(self):
         """改進的編碼器檢測"""
+        if self.use_irq:
+            self._drain_events()
+            return
+        
         current_time = time.ticks_ms()
         
         # 讀取當前狀態
@@ -95,11 +666,30 @@ class RotaryEncoder:
                 self.last_button_time = current_time
                 print("按鈕按下")
     
+    def _drain_events(self):
+        """中斷模式：把佇列中的事件累加到旋轉計數與按鈕旗標"""
+        while True:
+            event = self.read_event()
+            if event == EVENT_NONE:
+                return
+            if event == EVENT_CW:
+                self.pending_rotation += 1
+            elif event == EVENT_CCW:
+                self.pending_rotation -= 1
+            elif event == EVENT_PRESS:
+                self.button_pressed = True
+            elif event == EVENT_LONG_PRESS:
+                self.long_pressed = True
+    
     def get_rotation(self):
-        """獲取並清除旋轉值"""
+        """獲取並清除旋轉值（中斷模式下每次取出一格，其餘保留）"""
         self.update()
         
         if self.pending_rotation != 0:
+            if self.use_irq:
+                rotation = 1 if self.pending_rotation > 0 else -1
+                self.pending_rotation -= rotation
+                return rotation
             rotation = self.pending_rotation
             self.pending_rotation = 0  # 清除已讀取的值
             return rotation
@@ -108,10 +698,14 @@ class RotaryEncoder:
     def peek_rotation(self):
         """查看但不清除旋轉值"""
         self.update()
+        if self.use_irq and self.pending_rotation != 0:
+            return 1 if self.pending_rotation > 0 else -1
         return self.pending_rotation
     
     def clear_rotation(self):
         """清除累積的旋轉值"""
+        if self.use_irq:
+            self._drain_events()
         self.pending_rotation = 0
     
     def is_button_pressed(self):
@@ -121,29 +715,630 @@ class RotaryEncoder:
             self.button_pressed = False
             return True
         return False
+    
+    def is_long_pressed(self):
+        """檢查長按（中斷模式）"""
+        self.update()
+        if self.long_pressed:
+            self.long_pressed = False
+            return True
+        return False
+
+class InputLog:
+    """編碼器輸入紀錄：記錄或重播事件與遊戲使用的亂數種子
+    
+    檔案格式（little endian）：9 位元組標頭（LOG_HEADER），之後每筆 5 位元組。
+    輸入事件（EVENT_*）記錄被讀取時遊戲走到第幾步（距離上一筆事件的步數，
+    LOG_GAME 開始新的一局時歸零），以及距離上一筆事件或上一步的毫秒數。
+    重播時等遊戲走到同一步才送出事件，毫秒數只用來保持原本的節奏；遊戲在
+    這一步的事件讀完之前不會走下一步（hold()），排程延遲不會讓轉向落到別的步。
+    LOG_WAIT 只推進步數與時間，LOG_SCORE 記錄一局結束的分數，重播時用來確認結果相同。
+    遊戲透過 new_game() 與 step() 回報進度。
+    """
+    def __init__(self, path):
+        self.path = path
+        self.buf = bytearray(INPUT_LOG_BUFFER)
+        self.used = 0
+        self.seed = 0
+        self.recording = False
+        self.replaying = False
+        self.events = 0
+        self.games = 0
+        self.matches = 0
+        self.mismatches = 0
+        self.scores = []  # 重播時：紀錄中尚未比對的分數
+        self.game = 0  # 目前是第幾局（開始記錄或重播時為 0）
+        self.steps = 0  # 這一局走了幾步
+        self.mark = 0  # 上一筆事件或上一步的 ticks_ms
+        self.progress = asyncio.Event()  # 重播時：遊戲開新局或走了一步
+        self.target_game = 0  # 重播時：下一筆事件在第幾局
+        self.target_steps = 0  # 重播時：下一筆事件在這一局的第幾步
+        self.due = False  # 重播時：下一筆事件已讀出但還沒送出
+        self._logged_steps = 0  # 記錄時：上一筆事件在這一局的第幾步
+        self._file = None
+    
+    def start_recording(self, encoder):
+        """選一個亂數種子寫入標頭，之後 encoder 取出的事件都會記錄"""
+        self.seed = random.getrandbits(30)
+        random.seed(self.seed)
+        with open(self.path, "wb") as f:
+            f.write(struct.pack(LOG_HEADER, LOG_MAGIC, LOG_VERSION, self.seed))
+        self.mark = time.ticks_ms()
+        self.recording = True
+        encoder.recorder = self
+        print(f"[紀錄] 開始記錄輸入，種子 {self.seed}")
+    
+    def add(self, event, timestamp):
+        """記錄一筆事件（由 RotaryEncoder.read_event 呼叫）"""
+        steps = self.steps - self._logged_steps
+        delay = time.ticks_diff(timestamp, self.mark)
+        if delay < 0:
+            delay = 0
+        else:
+            self.mark = timestamp
+        while steps > 0xFFFF or delay > 0xFFFF:
+            wait_steps = min(steps, 0xFFFF)
+            wait_ms = min(delay, 0xFFFF)
+            self._put(LOG_WAIT, wait_steps, wait_ms)
+            steps -= wait_steps
+            delay -= wait_ms
+        self._put(event, steps, delay)
+        self._logged_steps = self.steps
+        self.events += 1
+    
+    def _put(self, kind, steps, arg):
+        if self.used + LOG_RECORD_SIZE > len(self.buf):
+            self.flush()
+        struct.pack_into(LOG_RECORD, self.buf, self.used, kind, steps, arg)
+        self.used += LOG_RECORD_SIZE
+    
+    def flush(self):
+        """把緩衝區寫入檔案"""
+        if self.used:
+            with open(self.path, "ab") as f:
+                f.write(memoryview(self.buf)[:self.used])
+            self.used = 0
+    
+    def start_replay(self):
+        """讀取標頭並以紀錄中的種子設定亂數；檔案不存在或格式不符時回傳 False"""
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            print("[重播] 找不到輸入紀錄")
+            return False
+        header = f.read(LOG_HEADER_SIZE)
+        if len(header) != LOG_HEADER_SIZE or header[:4] != LOG_MAGIC or header[4] != LOG_VERSION:
+            f.close()
+            print("[重播] 輸入紀錄格式不符")
+            return False
+        self.seed = struct.unpack(LOG_HEADER, header)[2]
+        random.seed(self.seed)
+        self._file = f
+        self.mark = time.ticks_ms()
+        self.replaying = True
+        print(f"[重播] 開始重播輸入，種子 {self.seed}")
+        return True
+    
+    def next_event(self):
+        """讀取下一筆要重播的事件，回傳 (事件, 距離 mark 的毫秒數)
+        
+        事件所在的局與步數放在 target_game、target_steps，等 reached() 之後再送出。
+        紀錄結束時回傳 (EVENT_NONE, 0)。
+        """
+        record = self.buf
+        delay = 0
+        while self._file.readinto(memoryview(record)[:LOG_RECORD_SIZE]) == LOG_RECORD_SIZE:
+            kind, steps, arg = struct.unpack_from(LOG_RECORD, record)
+            if kind == LOG_SCORE:
+                self.scores.append(arg)
+                continue
+            if kind == LOG_GAME:
+                self.target_game += 1
+                self.target_steps = 0
+                delay = 0
+                continue
+            self.target_steps += steps
+            delay += arg
+            if kind == LOG_WAIT:
+                continue
+            self.events += 1
+            self.due = True
+            return kind, delay
+        self._file.close()
+        self.due = False
+        return EVENT_NONE, 0
+    
+    def reached(self):
+        """重播時：遊戲是否已經走到下一筆事件的那一步"""
+        if self.game != self.target_game:
+            return self.game > self.target_game
+        return self.steps >= self.target_steps
+    
+    def delivered(self):
+        """重播時：下一筆事件已送進編碼器的佇列"""
+        self.due = False
+        self.mark = time.ticks_ms()
+    
+    def hold(self, encoder):
+        """重播時：遊戲是否要等一下再走下一步
+        
+        紀錄中在這一步讀取的事件還沒送出，或送出了但還在編碼器裡沒讀完。
+        """
+        if not self.replaying:
+            return False
+        if self.due and self.game == self.target_game and self.steps == self.target_steps:
+            return True
+        return encoder.pending_rotation != 0 or encoder.event_head != encoder.event_tail
+    
+    def new_game(self):
+        """遊戲開始新的一局（重置之後呼叫）"""
+        self.game += 1
+        self.steps = 0
+        self.mark = time.ticks_ms()
+        if self.recording:
+            self._put(LOG_GAME, 0, 0)
+            self._logged_steps = 0
+        self.progress.set()
+    
+    def step(self):
+        """遊戲走了一步"""
+        self.steps += 1
+        self.mark = time.ticks_ms()
+        if self.replaying:
+            self.progress.set()
+    
+    def game_over(self, score):
+        """一局結束：記錄時寫入分數，重播時與紀錄比對"""
+        self.games += 1
+        if self.recording:
+            self._put(LOG_SCORE, 0, min(score, 0xFFFF))
+            self.flush()
+        elif self.replaying and self.scores:
+            expected = self.scores.pop(0)
+            if expected == min(score, 0xFFFF):
+                self.matches += 1
+                print(f"[重播] 第 {self.games} 局分數相同: {score}")
+            else:
+                self.mismatches += 1
+                print(f"[重播] 第 {self.games} 局分數不同: 紀錄 {expected}，重播 {score}")
+
+class ScoreLog:
+    """最高分與遊戲統計，以附加寫入的紀錄存在 flash 上
+    
+    每個檔案開頭是 9 位元組標頭（SCORE_HEADER），之後每局一筆 20 位元組的紀錄
+    （SCORE_RECORD 加上 CRC32）。每筆都帶累計的局數、最高分與最長的蛇，最新的
+    一筆就是全部統計，所以寫滿 SCORE_LOG_RECORDS 筆後可以直接換到最舊的檔案
+    重寫，不需要搬移資料。開機時只讀各檔案的標頭與最新的檔案；寫到一半斷電
+    的紀錄 CRC 不符，載入時忽略，下一筆改寫到新的檔案。
+    """
+    def __init__(self, prefix):
+        self.paths = tuple(f"{prefix}{i}.log" for i in range(SCORE_LOG_FILES))
+        self.buf = bytearray(SCORE_ENTRY_SIZE)
+        self.seq = 0
+        self.games = 0
+        self.best = 0
+        self.longest = 0
+        self.file = SCORE_LOG_FILES - 1  # 目前寫入的檔案（第一筆會換到 0 號）
+        self.generation = 0
+        self.count = SCORE_LOG_RECORDS  # 目前檔案的紀錄數，滿了（或損壞）時下一筆換檔
+        self.writes = 0
+        self.bytes_written = 0
+        self.dropped = 0  # 載入時忽略的損壞紀錄
+    
+    def load(self):
+        """開機時呼叫：從最新的檔案找出最後一筆完整的紀錄，回傳是否有紀錄"""
+        headers = []
+        for index in range(SCORE_LOG_FILES):
+            generation = self._read_header(index)
+            if generation is not None:
+                headers.append((generation, index))
+        if not headers:
+            return False
+        headers.sort(reverse=True)
+        self.generation, self.file = headers[0]
+        for _, index in headers:
+            count, clean = self._scan(index)
+            if index == self.file:
+                self.count = count if clean else SCORE_LOG_RECORDS
+            if count:
+                # 最新的檔案沒有完整的紀錄時（換檔時斷電）才往前找
+                print(f"[分數] 最高分 {self.best}，最長 {self.longest}，共 {self.games} 局")
+                return True
+        return False
+    
+    def _read_header(self, index):
+        """回傳檔案的世代；檔案不存在或標頭不符時回傳 None"""
+        try:
+            with open(self.paths[index], "rb") as f:
+                header = f.read(SCORE_HEADER_SIZE)
+        except OSError:
+            return None
+        if len(header) != SCORE_HEADER_SIZE:
+            return None
+        magic, version, generation = struct.unpack(SCORE_HEADER, header)
+        if magic != SCORE_MAGIC or version != SCORE_VERSION:
+            return None
+        return generation
+    
+    def _scan(self, index):
+        """依序讀取檔案的紀錄，套用每一筆完整的紀錄，回傳 (筆數, 是否沒有損壞)"""
+        buf = self.buf
+        count = 0
+        try:
+            with open(self.paths[index], "rb") as f:
+                f.seek(SCORE_HEADER_SIZE)
+                while True:
+                    n = f.readinto(buf)
+                    if not n:
+                        return count, True
+                    if n != SCORE_ENTRY_SIZE or not self._valid(buf):
+                        self.dropped += 1
+                        return count, False
+                    self.seq, _, _, self.games, self.best, self.longest = struct.unpack_from(SCORE_RECORD, buf)
+                    count += 1
+        except OSError:
+            return count, False
+    
+    def _valid(self, buf):
+        crc = binascii.crc32(memoryview(buf)[:SCORE_RECORD_SIZE])
+        return struct.unpack_from("<I", buf, SCORE_RECORD_SIZE)[0] == crc
+    
+    def add(self, score, length):
+        """一局結束時呼叫：更新統計並附加一筆紀錄，回傳是否破了最高分
+        
+        只寫一筆 20 位元組（換檔時加上標頭），不讀取也不改寫舊的內容。
+        """
+        new_best = score > self.best
+        self.seq += 1
+        self.games += 1
+        if new_best:
+            self.best = score
+        if length > self.longest:
+            self.longest = length
+        buf = self.buf
+        struct.pack_into(SCORE_RECORD, buf, 0, self.seq, min(score, 0xFFFF), length,
+                         self.games, min(self.best, 0xFFFF), self.longest)
+        struct.pack_into("<I", buf, SCORE_RECORD_SIZE, binascii.crc32(memoryview(buf)[:SCORE_RECORD_SIZE]))
+        try:
+            if self.count < SCORE_LOG_RECORDS:
+                with open(self.paths[self.file], "ab") as f:
+                    f.write(buf)
+                self.bytes_written += SCORE_ENTRY_SIZE
+            else:
+                # 換到最舊的檔案，標頭與第一筆一起寫；斷電時前一個檔案仍有完整的統計
+                index = (self.file + 1) % SCORE_LOG_FILES
+                with open(self.paths[index], "wb") as f:
+                    f.write(struct.pack(SCORE_HEADER, SCORE_MAGIC, SCORE_VERSION, self.generation + 1))
+                    f.write(buf)
+                self.file = index
+                self.generation += 1
+                self.count = 0
+                self.bytes_written += SCORE_HEADER_SIZE + SCORE_ENTRY_SIZE
+            self.count += 1
+            self.writes += 1
+        except OSError as e:
+            print(f"寫入分數紀錄失敗: {e}")
+        return new_best
+
+class TimeService:
+    """時間服務：定期 NTP 校時、估計本地時鐘的漂移並在兩次校時之間修正
+    
+    RTC 只在開機時讀一次，之後以 ticks_ms 加上漂移修正推算現在時間。畫面
+    使用 fields()（同一秒內回傳快取）與 deadline()（下一個整分或整秒的
+    ticks_ms），不需要一直讀 RTC。
+    """
+    def __init__(self, rtc):
+        self.rtc = rtc
+        self.synced = False
+        self.syncs = 0
+        self.failures = 0  # 連續校時失敗次數
+        self.drift_ppm = 0  # 本地時鐘每百萬單位快了多少（負數為慢）
+        self.last_error_ms = 0  # 上次校時時推算時間的誤差（真實 - 推算）
+        self._sync_ticks = 0
+        self._fields = None
+        self._fields_secs = -1
+        year, month, day, _, hour, minute, second, subsecond = rtc.datetime()
+        self._rebase(time.mktime((year, month, day, hour, minute, second, 0, 0)), subsecond // 1000)
+    
+    def _rebase(self, secs, ms):
+        """以 (secs, ms) 作為目前 ticks_ms 對應的時間"""
+        self._base_secs = secs
+        self._base_ms = ms
+        self._base_ticks = time.ticks_ms()
+    
+    def now(self):
+        """修正漂移後的現在時間，回傳 (time.time() 秒數, 毫秒)"""
+        elapsed = time.ticks_diff(time.ticks_ms(), self._base_ticks)
+        # 先除以 1000 再乘 ppm，維持在 small int 範圍內
+        ms = self._base_ms + elapsed - (elapsed // 1000) * self.drift_ppm // 1000
+        secs = self._base_secs + ms // 1000
+        ms %= 1000
+        if elapsed >= TIME_REBASE_MS:
+            self._rebase(secs, ms)
+        return secs, ms
+    
+    def time(self):
+        return self.now()[0]
+    
+    def fields(self):
+        """與 RTC.datetime() 相同順序的時間欄位（subsecond 為 0），同一秒內不重新計算"""
+        secs = self.now()[0]
+        if secs != self._fields_secs:
+            year, month, day, hour, minute, second, weekday, _ = time.localtime(secs)
+            self._fields = (year, month, day, weekday, hour, minute, second, 0)
+            self._fields_secs = secs
+        return self._fields
+    
+    def deadline(self, period_s=60):
+        """下一個整 period_s 秒（預設整分鐘）的 ticks_ms，已換算成本地時鐘"""
+        secs, ms = self.now()
+        remaining = (period_s - secs % period_s) * 1000 - ms
+        local = remaining + (remaining // 1000) * self.drift_ppm // 1000
+        return time.ticks_add(time.ticks_ms(), local)
+    
+    def sync(self):
+        """向 NTP 校時並更新漂移估計，成功時同時設定 RTC"""
+        try:
+            true_secs = ntptime.time()
+        except Exception as e:
+            self.failures += 1
+            print(f"時間同步失敗（第 {self.failures} 次）: {e}")
+            return False
+        now_ticks = time.ticks_ms()
+        # NTP 秒數無條件捨去，真實時間取該秒的中間
+        secs, ms = self.now()
+        error_ms = (true_secs - secs) * 1000 + 500 - ms
+        if self.synced:
+            interval = time.ticks_diff(now_ticks, self._sync_ticks)
+            if interval >= DRIFT_MIN_INTERVAL_MS:
+                # 推算時間落後（error > 0）表示本地時鐘偏慢
+                self.drift_ppm -= error_ms * 1000 // (interval // 1000)
+                self.drift_ppm = max(-DRIFT_MAX_PPM, min(DRIFT_MAX_PPM, self.drift_ppm))
+            self.last_error_ms = error_ms
+        year, month, day, hour, minute, second, weekday, _ = time.localtime(true_secs)
+        self.rtc.datetime((year, month, day, weekday, hour, minute, second, 500000))
+        self._rebase(true_secs, 500)
+        self._fields_secs = -1
+        self._sync_ticks = now_ticks
+        self.synced = True
+        self.syncs += 1
+        self.failures = 0
+        print(f"時間同步成功，誤差 {error_ms} ms，漂移 {self.drift_ppm} ppm")
+        return True
+    
+    def next_sync_ms(self):
+        """距離下次校時的毫秒數：成功後 TIME_SYNC_INTERVAL_MS，失敗後指數退避"""
+        if not self.failures:
+            return TIME_SYNC_INTERVAL_MS
+        return min(TIME_SYNC_RETRY_MS << min(self.failures - 1, 16), TIME_SYNC_BACKOFF_MAX_MS)
+
+
+def weather_locations():
+    """設定的城市列表；沒有設定 LOCATION_NAMES 時只有 LOCATION_NAME"""
+    return tuple(LOCATION_NAMES) if LOCATION_NAMES else (LOCATION_NAME,)
+
+
+def weather_labels(count):
+    """主畫面顯示的城市標籤：LOCATION_LABELS 沒有填的城市顯示第幾個（1/3）"""
+    return tuple(LOCATION_LABELS[i] if i < len(LOCATION_LABELS) else f"{i + 1}/{count}"
+                 for i in range(count))
+
+
+def _location_names(locations):
+    """單一城市名稱轉成只有一個城市的 tuple"""
+    return (locations,) if isinstance(locations, str) else tuple(locations)
+
+
+_URL_SAFE = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_.~"
+
+
+def _url_quote(text):
+    """查詢參數的值以 UTF-8 百分比編碼（MicroPython 沒有 urllib.parse）"""
+    return "".join(chr(b) if b in _URL_SAFE else f"%{b:02X}" for b in text.encode())
+
+
+def _location_query(names):
+    """locationName 參數：各城市名稱編碼後以逗號分隔"""
+    return ",".join(_url_quote(name) for name in names)
+
+
+def _cwa_time(text):
+    """氣象署的時間字串（"2024-01-15 18:00:00"，臺灣時間）轉成 time.time() 秒數"""
+    return time.mktime((int(text[0:4]), int(text[5:7]), int(text[8:10]), int(text[11:13]),
+                        int(text[14:16]), int(text[17:19]), 0, 0)) - CWA_UTC_OFFSET
+
+
+def _small_int(text, default):
+    try:
+        return int(text)
+    except ValueError:
+        return default
+
+
+class Forecast:
+    """各城市的 36 小時預報時間軸
+    
+    以陣列存放，第 city * FORECAST_SLOTS + slot 格為一個時段：起訖時間為
+    time.time() 秒數，天氣現象存代碼（描述字串依代碼共用），降雨機率與
+    溫度為小整數。畫面依 RTC 時間自動選擇涵蓋現在的時段。
+    """
+    def __init__(self, cities):
+        n = cities * FORECAST_SLOTS
+        self.cities = cities
+        self.slots = bytearray(cities)  # 每個城市有幾個時段
+        self.start = array('i', [0] * n)
+        self.end = array('i', [0] * n)
+        self.wx = bytearray(n)  # 天氣現象代碼，0 為未知
+        self.pop = bytearray([POP_UNKNOWN] * n)  # 降雨機率（%）
+        self.min_t = array('b', [TEMP_UNKNOWN] * n)
+        self.max_t = array('b', [TEMP_UNKNOWN] * n)
+        self.wx_names = {}  # 天氣現象代碼 -> 描述
+        self._wx_text = None
+    
+    def __bool__(self):
+        return any(self.slots)
+    
+    def has(self, city):
+        return self.slots[city] > 0
+    
+    def current(self, city, now):
+        """涵蓋 now 的時段（now 在第一個時段之前時為第一個）；全部過期時回傳 -1"""
+        base = city * FORECAST_SLOTS
+        for i in range(base, base + self.slots[city]):
+            if now < self.end[i]:
+                return i
+        return -1
+    
+    def description(self, i):
+        return self.wx_names.get(self.wx[i], "N/A")
+    
+    def store(self, city, slot, element, field, value):
+        """存入串流解析器擷取的一個欄位"""
+        if slot >= FORECAST_SLOTS:
+            return
+        i = city * FORECAST_SLOTS + slot
+        if slot >= self.slots[city]:
+            self.slots[city] = slot + 1
+        if field == FIELD_START_TIME:
+            self.start[i] = _cwa_time(value)
+        elif field == FIELD_END_TIME:
+            self.end[i] = _cwa_time(value)
+        elif element == 'Wx':
+            # parameterName（描述）在 parameterValue（代碼）之前
+            if field == FIELD_PARAMETER_NAME:
+                self._wx_text = value
+            elif field == FIELD_PARAMETER_VALUE:
+                code = _small_int(value, 0) & 0xFF
+                self.wx[i] = code
+                if code and code not in self.wx_names and self._wx_text:
+                    self.wx_names[code] = self._wx_text
+        elif field == FIELD_PARAMETER_NAME:
+            if element == 'PoP':
+                self.pop[i] = min(_small_int(value, POP_UNKNOWN), POP_UNKNOWN)
+            elif element == 'MinT':
+                self.min_t[i] = max(-127, min(127, _small_int(value, TEMP_UNKNOWN)))
+            elif element == 'MaxT':
+                self.max_t[i] = max(-127, min(127, _small_int(value, TEMP_UNKNOWN)))
+
+
+class WeatherCache:
+    """存在 flash 上的最後一份天氣資料
+
+    每行一個值：格式版本、取得時間（time.time() 秒數），接著每個城市依序為
+    城市名稱、時段數與每個時段一行（起、訖、天氣代碼、降雨機率、最低溫、
+    最高溫、天氣描述，以逗號分隔）。只有內容改變時才寫入，減少 flash 磨損。
+    """
+    def __init__(self, path):
+        self.path = path
+        self.writes = 0
+        self._stored = None  # flash 上的內容（取得時間之後的各行），用來判斷是否需要寫入
+    
+    def load(self, locations):
+        """讀取快取，回傳 (Forecast, fetched_at)；城市列表不同或沒有快取時回傳 (None, 0)"""
+        try:
+            with open(self.path) as f:
+                lines = f.read().split("\n")
+        except OSError:
+            return None, 0
+        if len(lines) < 2 or lines[0] != WEATHER_CACHE_VERSION:
+            return None, 0
+        forecast = Forecast(len(locations))
+        try:
+            fetched_at = int(lines[1])
+            pos = 2
+            for city, location in enumerate(locations):
+                count = int(lines[pos + 1])
+                if lines[pos] != location or count > FORECAST_SLOTS:
+                    return None, 0
+                pos += 2
+                for slot in range(count):
+                    start, end, wx, pop, min_t, max_t, text = lines[pos].split(",", 6)
+                    i = city * FORECAST_SLOTS + slot
+                    forecast.start[i] = int(start)
+                    forecast.end[i] = int(end)
+                    forecast.wx[i] = int(wx)
+                    forecast.pop[i] = int(pop)
+                    forecast.min_t[i] = int(min_t)
+                    forecast.max_t[i] = int(max_t)
+                    if text:
+                        forecast.wx_names[int(wx)] = text
+                    pos += 1
+                forecast.slots[city] = count
+        except (ValueError, IndexError):
+            return None, 0
+        if pos != len(lines) or not forecast:
+            return None, 0
+        self._stored = lines[2:]
+        return forecast, fetched_at
+    
+    def save(self, locations, forecast, fetched_at):
+        """內容與 flash 上的不同時才寫入，回傳是否有寫入
+        
+        先寫暫存檔再改名，斷電時不會留下寫到一半的檔案。
+        """
+        content = []
+        for city, location in enumerate(locations):
+            count = forecast.slots[city]
+            content.append(location)
+            content.append(str(count))
+            for i in range(city * FORECAST_SLOTS, city * FORECAST_SLOTS + count):
+                text = forecast.wx_names.get(forecast.wx[i], "").replace("\n", " ")
+                content.append(f"{forecast.start[i]},{forecast.end[i]},{forecast.wx[i]},"
+                               f"{forecast.pop[i]},{forecast.min_t[i]},{forecast.max_t[i]},{text}")
+        if content == self._stored:
+            return False
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(WEATHER_CACHE_VERSION + "\n" + str(fetched_at) + "\n")
+                f.write("\n".join(content))
+            os.rename(tmp_path, self.path)
+            self._stored = content
+            self.writes += 1
+            return True
+        except OSError as e:
+            print(f"寫入天氣快取失敗: {e}")
+            return False
 
 class WeatherAPI:
-    """中央氣象局 API 處理類別"""
-    def __init__(self, api_key):
+    """中央氣象局 API 處理類別
+    
+    多個城市以一次請求取得（locationName 以逗號分隔），省下每個城市各一次的
+    TLS 握手。weather_data 是各城市完整 36 小時預報的 Forecast，畫面會自己
+    移到涵蓋現在的時段，所以只需要在氣象署發布新預報時更新。
+    """
+    def __init__(self, api_key, cache_path=None):
         self.api_key = api_key
-        self.base_url = "https://opendata.cwa.gov.tw/api/v1/rest/datastore/F-C0032-001"
+        self.host = "opendata.cwa.gov.tw"
+        self.path = "/api/v1/rest/datastore/F-C0032-001"
+        self.base_url = "https://" + self.host + self.path
         self.weather_data = None
-        self.last_update = 0
-        self.update_interval = 1800000  # 30分鐘更新一次
+        self.fetched_at = 0  # 取得 weather_data 的時間（time.time() 秒數）
+        self.update_interval = WEATHER_REFRESH_MS
+        self.cache = WeatherCache(cache_path or WEATHER_CACHE_FILE)
+        # 串流解析器：緩衝區只配置一次，解析時不保留整份回應
+        self.parser = ForecastParser(self._on_forecast_field)
+        self._names = ()  # 這次請求的城市
+        self._parsed = None  # 解析中的 Forecast
+        self._city = -1  # 目前解析中的城市（不在請求中時為 -1）
     
-    def connect_wifi(self, ssid, password):
-        """連接 WiFi"""
+    async def connect_wifi(self, ssid, password):
+        """連接 WiFi，等待期間讓其他工作繼續執行"""
         wlan = network.WLAN(network.STA_IF)
         wlan.active(True)
         
         if not wlan.isconnected():
             print('連接 WiFi...')
-            wlan.connect(ssid, password)
+            try:
+                wlan.connect(ssid, password)
+            except OSError as e:
+                print(f'WiFi 連接失敗: {e}')
+                return False
             
-            timeout = 10
-            while not wlan.isconnected() and timeout > 0:
-                time.sleep(1)
-                timeout -= 1
+            waited = 0
+            while not wlan.isconnected() and waited < WIFI_TIMEOUT_MS:
+                await asyncio.sleep_ms(100)
+                waited += 100
             
             if wlan.isconnected():
                 print('WiFi 連接成功')
@@ -154,427 +1349,726 @@ class WeatherAPI:
                 return False
         return True
     
-    def sync_time(self):
-        """同步網路時間"""
-        try:
-            ntptime.settime()
-            print("時間同步成功")
-            return True
-        except:
-            print("時間同步失敗")
+    def load_cache(self, locations):
+        """開機時載入 flash 上的天氣快取（可能已過期），不需要網路"""
+        forecast, fetched_at = self.cache.load(_location_names(locations))
+        if forecast:
+            self.weather_data = forecast
+            self.fetched_at = fetched_at
+        return forecast
+    
+    def is_fresh(self):
+        """天氣資料是否還在有效期限內；RTC 尚未校時造成時間倒退時視為過期"""
+        if not self.weather_data:
             return False
+        age = time.time() - self.fetched_at
+        return 0 <= age < self.update_interval // 1000
     
-    def get_weather(self, location):
-        """獲取天氣資料"""
-        current_time = time.ticks_ms()
+    def expires_in_ms(self):
+        """距離資料過期還有多少毫秒（已過期為 0）"""
+        if not self.is_fresh():
+            return 0
+        return self.update_interval - (time.time() - self.fetched_at) * 1000
+    
+    def get_weather(self, locations):
+        """獲取天氣資料（locations 為城市名稱或城市列表）
         
+        資料仍有效時直接回傳；失敗時回傳 None，呼叫端繼續顯示舊資料。
+        """
         # 檢查是否需要更新
-        if self.weather_data and time.ticks_diff(current_time, self.last_update) < self.update_interval:
+        if self.is_fresh():
             return self.weather_data
         
+        names = _location_names(locations)
+        response = None
         try:
-            url = f"{self.base_url}?Authorization={self.api_key}&locationName={location}"
+            url = f"{self.base_url}?Authorization={self.api_key}&locationName={_location_query(names)}"
             response = urequests.get(url)
             
             if response.status_code == 200:
-                data = response.json()
-                weather_element = data['records']['location'][0]['weatherElement']
-                
-                # 解析天氣資料
-                weather_info = {}
-                for element in weather_element:
-                    param_name = element['elementName']
-                    if param_name == 'Wx':  # 天氣現象
-                        weather_info['description'] = element['time'][0]['parameter']['parameterName']
-                    elif param_name == 'PoP':  # 降雨機率
-                        weather_info['rain_prob'] = element['time'][0]['parameter']['parameterName']
-                    elif param_name == 'MinT':  # 最低溫度
-                        weather_info['min_temp'] = element['time'][0]['parameter']['parameterName']
-                    elif param_name == 'MaxT':  # 最高溫度
-                        weather_info['max_temp'] = element['time'][0]['parameter']['parameterName']
-                
-                self.weather_data = weather_info
-                self.last_update = current_time
-                response.close()
-                return weather_info
+                # 分段讀取，擷取各城市每個時段的四個天氣因子
+                self._begin(names)
+                complete = self.parser.parse_stream(response.raw)
+                return self._accept(complete)
             else:
-                response.close()
                 return None
         except Exception as e:
             print(f"獲取天氣資料失敗: {e}")
             return None
-
-class SnakeGame:
-    def __init__(self, display, encoder):
-        self.display = display
-        self.encoder = encoder
-        self.last_move = time.ticks_ms()
-        
-        # 方向變化限制
-        self.last_direction_change = 0
-        self.direction_change_cooldown = 100  # 縮短冷卻時間
-        self.pending_direction = None  # 儲存待處理的方向
-        
-        self.reset_game()
-        
-    def reset_game(self):
-        """重置遊戲"""
-        start_x = GRID_WIDTH // 2
-        start_y = GRID_HEIGHT // 2
-        self.snake = [(start_x, start_y), (start_x - 1, start_y)]
-        self.direction = RIGHT
-        self.pending_direction = None  # 重置待處理方向
-        
-        self.generate_food()
-        
-        self.game_over = False
-        self.score = 0
-        self.game_speed = 200
-        
-        self.old_snake = []
-        self.old_food = None
-        self._game_over_drawn = False
-        
-        # 清除編碼器的累積值
-        self.encoder.clear_rotation()
-        
-    def generate_food(self):
-        """生成食物位置"""
-        while True:
-            self.food = (random.randint(0, GRID_WIDTH - 1),
-                        random.randint(0, GRID_HEIGHT - 1))
-            if self.food not in self.snake:
-                break
+        finally:
+            if response is not None:
+                response.close()
     
-    def update_direction(self):
-        """改進的方向更新邏輯"""
-        if self.game_over:
-            return
-            
-        current_time = time.ticks_ms()
+    async def fetch_weather(self, locations, blocking=True):
+        """以非阻塞的 asyncio 串流獲取天氣資料
         
-        # 獲取旋轉值
-        rotation = self.encoder.get_rotation()
-        
-        if rotation != 0:
-            # 計算新方向
-            if rotation > 0:
-                # 順時針 = 右轉
-                new_direction = (self.direction + 1) % 4
-            else:
-                # 逆時針 = 左轉
-                new_direction = (self.direction - 1) % 4
-            
-            # 檢查是否可以改變方向
-            opposite_directions = {UP: DOWN, DOWN: UP, LEFT: RIGHT, RIGHT: LEFT}
-            
-            # 如果新方向不是當前方向的相反方向
-            if new_direction != opposite_directions[self.direction]:
-                # 儲存為待處理方向，將在下次移動時應用
-                self.pending_direction = new_direction
-                direction_names = {UP: "上", RIGHT: "右", DOWN: "下", LEFT: "左"}
-                print(f"方向預備改變: {direction_names[self.direction]} -> {direction_names[new_direction]}")
-    
-    def move_snake(self):
-        """移動蛇 - 修正版本"""
-        if self.game_over:
-            return
-        
-        # 在移動前應用待處理的方向改變
-        if self.pending_direction is not None:
-            # 再次檢查是否為反向
-            opposite_directions = {UP: DOWN, DOWN: UP, LEFT: RIGHT, RIGHT: LEFT}
-            if self.pending_direction != opposite_directions[self.direction]:
-                old_dir = self.direction
-                self.direction = self.pending_direction
-                direction_names = {UP: "上", RIGHT: "右", DOWN: "下", LEFT: "左"}
-                print(f"方向已改變: {direction_names[old_dir]} -> {direction_names[self.direction]}")
-            self.pending_direction = None
-        
-        head = self.snake[0]
-        
-        # 根據方向計算新頭部位置
-        if self.direction == UP:
-            new_head = (head[0], head[1] - 1)
-        elif self.direction == DOWN:
-            new_head = (head[0], head[1] + 1)
-        elif self.direction == LEFT:
-            new_head = (head[0] - 1, head[1])
-        elif self.direction == RIGHT:
-            new_head = (head[0] + 1, head[1])
-        
-        # 檢查碰撞
-        if (new_head[0] < 0 or new_head[0] >= GRID_WIDTH or
-            new_head[1] < 0 or new_head[1] >= GRID_HEIGHT):
-            print("撞牆！")
-            self.game_over = True
-            return
-        
-        if new_head in self.snake[:-1]:
-            print("撞到自己！")
-            self.game_over = True
-            return
+        等待連線與回應時其他工作照常執行；每讀一段就讓出一次執行權。
+        uasyncio 不支援 TLS 的舊版韌體退回阻塞的 get_weather；blocking=False
+        （應用程式執行中）時不退回，回傳 None 等下次重試。
+        """
+        if self.is_fresh():
+            return self.weather_data
         
-        # 移動蛇
-        self.snake.insert(0, new_head)
+        try:
+            reader, writer = await asyncio.open_connection(self.host, 443, ssl=True)
+        except TypeError:
+            if not blocking:
+                print("韌體不支援非阻塞的 TLS，回到主畫面再更新天氣")
+                return None
+            return self.get_weather(locations)
+        except Exception as e:
+            print(f"獲取天氣資料失敗: {e}")
+            return None
         
-        # 檢查是否吃到食物
-        if new_head == self.food:
-            print("吃到食物!")
-            self.score += 10
-            self.generate_food()
-            self.game_speed = max(80, self.game_speed - 3)
-        else:
-            self.snake.pop()
-    
-    def draw_boundary(self):
-        """繪製遊戲邊界"""
-        boundary_color = YELLOW
-        
-        game_left = OFFSET_X
-        game_top = OFFSET_Y
-        game_width = GRID_WIDTH * BLOCK_SIZE
-        game_height = GRID_HEIGHT * BLOCK_SIZE
-        
-        self.display.rect(game_left - 2, game_top - 2,
-                         game_width + 4, game_height + 4,
-                         boundary_color)
-        
-        self.display.text(font, "<< Back", 5, 5, GRAY)
-    
-    def draw_block(self, x, y, color):
-        """繪製一個方塊"""
-        if 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT:
-            px = OFFSET_X + x * BLOCK_SIZE
-            py = OFFSET_Y + y * BLOCK_SIZE
-            self.display.fill_rect(px, py, BLOCK_SIZE, BLOCK_SIZE, color)
-            if color != BLACK:
-                self.display.rect(px, py, BLOCK_SIZE, BLOCK_SIZE, WHITE)
-    
-    def clear_block(self, x, y):
-        """清除一個方塊"""
-        if 0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT:
-            px = OFFSET_X + x * BLOCK_SIZE
-            py = OFFSET_Y + y * BLOCK_SIZE
-            self.display.fill_rect(px, py, BLOCK_SIZE, BLOCK_SIZE, BLACK)
-    
-    def draw(self):
-        """繪製遊戲畫面"""
-        if self.game_over:
-            if not self._game_over_drawn:
-                self.display.fill(BLACK)
-                center_x = SCREEN_WIDTH // 2
-                center_y = SCREEN_HEIGHT // 2
-                self.display.text(font, "GAME OVER", center_x - 40, center_y - 30, WHITE)
-                self.display.text(font, f"Score: {self.score}", center_x - 35, center_y - 10, WHITE)
-                self.display.text(font, "Press button", center_x - 45, center_y + 10, WHITE)
-                self.display.text(font, "or << Back", center_x - 40, center_y + 30, WHITE)
-                self._game_over_drawn = True
-        else:
-            # 清除舊的蛇身
-            for segment in self.old_snake:
-                if segment not in self.snake:
-                    self.clear_block(segment[0], segment[1])
-            
-            # 清除舊的食物
-            if self.old_food and self.old_food != self.food:
-                self.clear_block(self.old_food[0], self.old_food[1])
-            
-            # 繪製蛇
-            for i, segment in enumerate(self.snake):
-                if i == 0:
-                    self.draw_block(segment[0], segment[1], BLUE)
-                else:
-                    self.draw_block(segment[0], segment[1], GREEN)
-            
-            # 繪製食物
-            self.draw_block(self.food[0], self.food[1], RED)
+        names = _location_names(locations)
+        try:
+            request = (f"GET {self.path}?Authorization={self.api_key}&locationName={_location_query(names)}"
+                       f" HTTP/1.0\r\nHost: {self.host}\r\n\r\n")
+            writer.write(request.encode())
+            await writer.drain()
             
-            # 更新分數
-            score_text = f"Score:{self.score}"
-            score_x = OFFSET_X
-            score_y = OFFSET_Y - 20
-            self.display.fill_rect(score_x, score_y, 100, 16, BLACK)
-            self.display.text(font, score_text, score_x, score_y, WHITE)
+            status = (await reader.readline()).split()
+            if len(status) < 2 or status[1] != b"200":
+                return None
+            # 略過標頭
+            while True:
+                line = await reader.readline()
+                if not line or line == b"\r\n":
+                    break
             
-            # 儲存當前狀態
-            self.old_snake = self.snake.copy()
-            self.old_food = self.food
+            self._begin(names)
+            parser = self.parser
+            buf = parser.buf
+            view = memoryview(buf)
+            while not parser.done:
+                n = await reader.readinto(view)
+                if not n:
+                    break
+                parser.feed(buf, n)
+            return self._accept(parser.done)
+        except Exception as e:
+            print(f"獲取天氣資料失敗: {e}")
+            return None
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError as e:
+                # TLS 或連線異常後關閉也可能失敗，不影響已經讀到的資料
+                print(f"關閉天氣連線失敗: {e}")
+    
+    def _begin(self, names):
+        """開始解析一次回應"""
+        self._names = names
+        self._parsed = Forecast(len(names))
+        self._city = -1
+        self.parser.reset()
+    
+    def _accept(self, complete):
+        """檢查解析結果，完整時更新資料與快取"""
+        forecast = self._parsed
+        self._parsed = None
+        if not complete or not forecast:
+            print("天氣資料不完整")
+            return None
+        self.weather_data = forecast
+        self.fetched_at = time.time()
+        self.cache.save(self._names, forecast, self.fetched_at)
+        return forecast
+    
+    def _on_forecast_field(self, location, element, slot, field, value):
+        """串流解析器的回呼；回應中的城市順序不一定與請求相同，依名稱對應"""
+        if field == FIELD_LOCATION_NAME:
+            names = self._names
+            self._city = names.index(value) if value in names else -1
+        elif self._city >= 0 and element in WEATHER_FIELDS:
+            self._parsed.store(self._city, slot, element, field, value)
+
+def _sin60(i):
+    """sin(i * 6°) * 1024，i 為 0~59 的刻度"""
+    i %= 60
+    if i <= 15:
+        return SIN_Q10[i]
+    if i <= 30:
+        return SIN_Q10[30 - i]
+    if i <= 45:
+        return -SIN_Q10[i - 30]
+    return -SIN_Q10[60 - i]
+
+
+def _dial_table(radius):
+    """錶盤上 60 個刻度在半徑 radius 處的座標"""
+    xs = array('h')
+    ys = array('h')
+    for i in range(60):
+        xs.append(CLOCK_CX + ((radius * _sin60(i) + 512) >> 10))
+        ys.append(CLOCK_CY - ((radius * _sin60(i + 15) + 512) >> 10))
+    return xs, ys
+
+
+# 指針末端與刻度兩端的座標，開機時以整數運算算好
+HAND_TABLES = tuple(_dial_table(length) for length in HAND_LENGTHS)
+TICK_OUTER = _dial_table(116)
+TICK_HOUR = _dial_table(104)
+TICK_MINUTE = _dial_table(112)
+
+
+def wx_icon_paths():
+    """天氣現象代碼 -> 圖示檔路徑；字串在開機時建立，重畫時只查表"""
+    paths = {}
+    for name, codes in WX_ICON_CODES:
+        path = f"{WEATHER_ICON_DIR}/{name}.rle"
+        for code in codes:
+            paths[code] = path
+    return paths
+
 
 class SmartWatch:
     """智慧型手錶主類別"""
-    def __init__(self, display, encoder):
+    def __init__(self, display, encoder, boot=None):
         self.display = display
         self.encoder = encoder
-        self.current_screen = 0  # 0: 主畫面, 1: 遊戲
+        self.boot = boot or BootTimer()
+        self.memory = MemoryManager()
+        self.current_screen = 0  # 0: 主畫面, 1: 應用程式
         self.weather_api = WeatherAPI(CWA_API_KEY)
         self.rtc = RTC()
-        self.weather_info = None
+        self.time_service = TimeService(self.rtc)
+        self.locations = weather_locations()
+        self.city_labels = weather_labels(len(self.locations))
+        self.city = 0  # 主畫面顯示第幾個城市
+        self.weather_info = None  # 各城市的預報（WeatherAPI.weather_data）
         self.wifi_connected = False
+        self.app_index = 0  # 主畫面選擇的應用程式（APPS 的索引）
+        self.apps = [None] * len(APPS)  # 已建立的 App（沒有 APP_PRELOAD 時只有目前這個）
+        self.app = None  # 目前畫面上的 App
+        self.app_loads = 0  # 匯入應用程式模組的次數
+        self.input_log = None
+        self.scores = ScoreLog(SCORE_LOG_PREFIX)
+        self.scores.load()
         
-        # 初始化網路和時間
-        self.init_network()
-    
-    def init_network(self):
-        """初始化網路連接"""
-        self.wifi_connected = self.weather_api.connect_wifi(WIFI_SSID, WIFI_PASSWORD)
-        if self.wifi_connected:
-            self.weather_api.sync_time()
-            self.weather_info = self.weather_api.get_weather(LOCATION_NAME)
+        # 工作之間的通知
+        self.frame_event = asyncio.Event()  # 有內容需要重畫
+        self.app_event = asyncio.Event()  # 應用程式需要執行 tick()
+        self.network_ready = asyncio.Event()  # 已連線並嘗試校時
+        self.idle_event = asyncio.Event()  # 所有工作都在等待
+        self._screen_changed = False
+        
+        # 閒置排程：各工作下次醒來的 ticks_ms（None 表示只等事件）
+        self.deadlines = [None] * TASK_COUNT
+        self._active = 0  # 正在執行（沒有在等待）的工作數
+        self._resumes = 0
+        self._wake_us = 0
+        self.wakeups = 0  # 從全部閒置到有工作執行的次數
+        self.active_us = 0  # 有工作執行的累計時間（含等待網路）
+        self.slept_ms = 0  # light sleep 的累計時間
+        self._power_start = time.ticks_ms()
+        
+        # 主畫面的文字欄位
+        self.time_field = TextField(80, 80, WHITE)
+        self.date_field = TextField(65, 110, GRAY)
+        self.weekday_field = TextField(100, 130, GRAY)
+        self.weather_field = TextField(70, 160, YELLOW)
+        if WEATHER_ICONS:
+            self.temp_field = TextField(112, 162, ORANGE)
+            self.rain_field = TextField(112, 182, BLUE)
+        else:
+            self.temp_field = TextField(70, 180, ORANGE)
+            self.rain_field = TextField(70, 200, BLUE)
+        self.icon_field = IconField(WEATHER_ICON_X, WEATHER_ICON_Y)
+        self.wx_icons = wx_icon_paths()
+        self.nav_field = TextField(210, 110, WHITE)
+        self.nav_label_field = TextField(195, 130, GRAY)
+        self.city_field = TextField(88, 56, GRAY)
+        self.clock_fields = (
+            self.time_field, self.date_field, self.weekday_field,
+            self.weather_field, self.temp_field, self.rain_field, self.icon_field,
+            self.nav_field, self.nav_label_field, self.city_field,
+        )
+        self.drawn_hands = array('b', (-1, -1, -1))  # 畫面上時針、分針、秒針的刻度
+        
+        # 效能資訊（PROFILE）：畫在保留給它的最下方一行，每秒輪流顯示
+        # 迴圈頻率與幀時間 p50/p99（毫秒），以及剩餘堆積
+        self.overlay_field = TextField(OVERLAY_X, OVERLAY_Y, GREEN)
+        
+        if APP_PRELOAD:
+            for _, module_name in APPS:
+                __import__(module_name)
+            self.app_loads = len(APPS)
+        
+        # 先以 flash 上的快取畫出主畫面，連線與更新期間維持顯示舊資料
+        self.weather_info = self.weather_api.load_cache(self.locations)
+        self.draw_clock_face(True)
+        self.boot.mark("first_frame")
     
-    def draw_clock_face(self):
-        """繪製時鐘主畫面"""
-        self.display.fill(BLACK)
+    def draw_clock_face(self, full=False):
+        """繪製時鐘主畫面
+        
+        只重畫內容有變動的欄位；full=True 時先清除整個畫面（開機或從遊戲返回）。
+        """
+        display = self.display
+        if full:
+            display.fill(BLACK)
+            for field in self.clock_fields:
+                field.invalidate()
+            if CLOCK_ANALOG:
+                self._draw_dial(display)
         
         # 獲取當前時間
-        year, month, day, weekday, hour, minute, second, _ = self.rtc.datetime()
-        
-        # 繪製時間 - 大字體
-        time_str = f"{hour:02d}:{minute:02d}"
-        self.display.text(font, time_str, 80, 80, WHITE)
-        
-        # 繪製日期
-        date_str = f"{year}/{month:02d}/{day:02d}"
-        self.display.text(font, date_str, 65, 110, GRAY)
-        
-        # 繪製星期
-        weekdays = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-        weekday_str = weekdays[weekday]
-        self.display.text(font, weekday_str, 100, 130, GRAY)
-        
-        # 繪製天氣資訊
-        if self.weather_info:
-            # 天氣描述
-            weather_desc = self.weather_info.get('description', 'N/A')
-            # 簡化天氣描述以適應螢幕
-            if len(weather_desc) > 8:
-                weather_desc = weather_desc[:8]
-            self.display.text(font, weather_desc, 70, 160, YELLOW)
+        year, month, day, weekday, hour, minute, second, _ = self.time_service.fields()
+        
+        # 時間、日期、星期（尚未校時則顯示橫線；指針時鐘不顯示數字時間）
+        if year >= MIN_VALID_YEAR:
+            if not CLOCK_ANALOG:
+                self.time_field.update(display, f"{hour:02d}:{minute:02d}")
+            self.date_field.update(display, f"{year}/{month:02d}/{day:02d}")
+            self.weekday_field.update(display, WEEKDAYS[weekday])
+        else:
+            if not CLOCK_ANALOG:
+                self.time_field.update(display, "--:--", GRAY)
+            self.date_field.update(display, "----/--/--")
+            self.weekday_field.update(display, "---")
+        
+        # 多個城市時顯示目前輪到的城市
+        if len(self.locations) > 1:
+            self.city_field.update(display, self.city_labels[self.city])
+        
+        # 繪製天氣資訊：涵蓋現在的時段（尚未校時則顯示第一個時段）
+        forecast = self.weather_info
+        slot = -1
+        if forecast:
+            slot = forecast.current(self.city, self.time_service.time() if year >= MIN_VALID_YEAR else 0)
+        if slot >= 0:
+            if WEATHER_ICONS:
+                # 先清掉 "No Weather"，圖示與溫度畫在它的位置
+                self.weather_field.update(display, "")
+                self.icon_field.update(display, self.wx_icons.get(forecast.wx[slot], ""))
+            else:
+                # 天氣描述
+                weather_desc = forecast.description(slot)
+                # 簡化天氣描述以適應螢幕
+                if len(weather_desc) > 8:
+                    weather_desc = weather_desc[:8]
+                self.weather_field.update(display, weather_desc)
             
             # 溫度範圍
-            min_temp = self.weather_info.get('min_temp', 'N/A')
-            max_temp = self.weather_info.get('max_temp', 'N/A')
-            temp_str = f"{min_temp}~{max_temp}C"
-            self.display.text(font, temp_str, 70, 180, ORANGE)
+            min_temp = forecast.min_t[slot]
+            max_temp = forecast.max_t[slot]
+            self.temp_field.update(display, f"{'N/A' if min_temp == TEMP_UNKNOWN else min_temp}~"
+                                            f"{'N/A' if max_temp == TEMP_UNKNOWN else max_temp}C")
             
             # 降雨機率
-            rain_prob = self.weather_info.get('rain_prob', 'N/A')
-            rain_str = f"Rain:{rain_prob}%"
-            self.display.text(font, rain_str, 70, 200, BLUE)
+            rain_prob = forecast.pop[slot]
+            self.rain_field.update(display, f"Rain:{'N/A' if rain_prob == POP_UNKNOWN else rain_prob}%")
         else:
-            self.display.text(font, "No Weather", 70, 160, GRAY)
+            self.icon_field.update(display, "")
+            self.temp_field.update(display, "")
+            self.rain_field.update(display, "")
+            self.weather_field.update(display, "No Weather", GRAY)
         
         # 繪製導航提示
-        self.display.text(font, ">>", 210, 110, WHITE)
-        self.display.text(font, "Game", 195, 130, GRAY)
+        self.nav_field.update(display, ">>")
+        self.nav_label_field.update(display, APPS[self.app_index][0])
+        
+        # 指針畫在文字上面，尚未校時不顯示
+        if CLOCK_ANALOG:
+            if year >= MIN_VALID_YEAR:
+                self._draw_hands(display, (hour % 12) * 5 + minute // 12, minute, second)
+            else:
+                self._draw_hands(display, -1, -1, -1)
     
-    def update_weather(self):
-        """更新天氣資料"""
-        if self.wifi_connected:
-            new_weather = self.weather_api.get_weather(LOCATION_NAME)
-            if new_weather:
-                self.weather_info = new_weather
+    def _draw_dial(self, display):
+        """錶盤刻度：整點為線段，其他為一點"""
+        outer_x, outer_y = TICK_OUTER
+        for i in range(60):
+            if i % 5 == 0:
+                display.line(TICK_HOUR[0][i], TICK_HOUR[1][i], outer_x[i], outer_y[i], WHITE)
+            else:
+                display.pixel(TICK_MINUTE[0][i], TICK_MINUTE[1][i], GRAY)
+        self.drawn_hands[0] = self.drawn_hands[1] = self.drawn_hands[2] = -1
     
-    def run(self):
-        """主執行迴圈 - 修正版本"""
-        last_update = time.ticks_ms()
-        last_minute = -1
-        snake_game = None
+    def _draw_hands(self, display, hour, minute, second):
+        """擦掉移動的指針、修補被擦到的文字，再依序畫出所有指針
         
-        # 初始化主畫面
-        self.draw_clock_face()
+        每秒只傳送新舊指針經過的像素與被擦到的文字欄位，不清除整個畫面。
+        """
+        drawn = self.drawn_hands
+        positions = (hour, minute, second)
+        for k in range(3):
+            old = drawn[k]
+            if old < 0 or old == positions[k]:
+                continue
+            xs, ys = HAND_TABLES[k]
+            x = xs[old]
+            y = ys[old]
+            display.line(CLOCK_CX, CLOCK_CY, x, y, BLACK)
+            x0 = min(x, CLOCK_CX)
+            y0 = min(y, CLOCK_CY)
+            x1 = max(x, CLOCK_CX) + 1
+            y1 = max(y, CLOCK_CY) + 1
+            for field in self.clock_fields:
+                if field.overlaps(x0, y0, x1, y1):
+                    field.repaint(display)
+        # 未移動的指針也重畫，補回被擦掉或被文字蓋掉的交叉點
+        for k in range(3):
+            pos = positions[k]
+            drawn[k] = pos
+            if pos >= 0:
+                xs, ys = HAND_TABLES[k]
+                display.line(CLOCK_CX, CLOCK_CY, xs[pos], ys[pos], HAND_COLORS[k])
+        display.fill_rect(CLOCK_CX - 2, CLOCK_CY - 2, 5, 5, RED)
+    
+    def run(self):
+        """主執行迴圈：以 uasyncio 協作式執行各個工作"""
+        asyncio.run(self.run_async())
+    
+    async def run_async(self):
+        # 下列六個工作都從執行中開始，各自第一次等待時才算閒置
+        self._active = 6
+        self._wake_us = time.ticks_us()
+        self.wakeups = 1
+        asyncio.create_task(self.render_task())
+        asyncio.create_task(self.clock_task())
+        asyncio.create_task(self.app_task())
+        asyncio.create_task(self.network_task())
+        asyncio.create_task(self.weather_task())
+        if LIGHT_SLEEP:
+            self.encoder.configure_wake()
+            asyncio.create_task(self.idle_task())
+        if PROFILE:
+            self._active += 1
+            asyncio.create_task(self.profile_task())
+        if len(self.locations) > 1:
+            self._active += 1
+            asyncio.create_task(self.city_task())
+        if INPUT_RECORD or INPUT_REPLAY:
+            self.input_log = InputLog(INPUT_LOG_FILE)
+            if INPUT_RECORD:
+                self.input_log.start_recording(self.encoder)
+            elif self.input_log.start_replay():
+                self._active += 1
+                asyncio.create_task(self.replay_task())
+        # 主畫面已在開機時畫好，這裡只更新有變動的欄位
+        self.request_frame()
+        await self.input_task()
+    
+    def _suspend(self):
+        self._active -= 1
+        if self._active == 0:
+            # 所有工作都在等待：趁到下一個期限前的空檔回收，暫停不會落在下一幀中途
+            self.memory.idle(self.next_deadline_ms())
+            self.active_us += time.ticks_diff(time.ticks_us(), self._wake_us)
+            self.idle_event.set()
+    
+    def _resume(self):
+        if self._active == 0:
+            self.wakeups += 1
+            self._wake_us = time.ticks_us()
+        self._active += 1
+        self._resumes += 1
+    
+    async def _sleep(self, task, ms):
+        """登記醒來期限後睡 ms 毫秒，閒置工作據此決定能睡多久"""
+        deadline = time.ticks_add(time.ticks_ms(), ms)
+        self.deadlines[task] = deadline
+        self._suspend()
+        # _suspend() 可能在空檔回收，只睡到期限剩下的時間
+        await asyncio.sleep_ms(max(0, time.ticks_diff(deadline, time.ticks_ms())))
+        self._resume()
+        self.deadlines[task] = None
+    
+    async def _wait(self, event):
+        """等待事件（或 ThreadSafeFlag），期間不登記期限"""
+        self._suspend()
+        await event.wait()
+        self._resume()
+    
+    def next_deadline_ms(self):
+        """距離最近一個工作期限的毫秒數，沒有期限時回傳 None"""
+        now = time.ticks_ms()
+        delay = None
+        for deadline in self.deadlines:
+            if deadline is not None:
+                remaining = time.ticks_diff(deadline, now)
+                if delay is None or remaining < delay:
+                    delay = remaining
+        return delay
+    
+    def report_power(self):
+        """印出開機以來每分鐘的喚醒次數與 CPU 使用率"""
+        elapsed = time.ticks_diff(time.ticks_ms(), self._power_start)
+        if elapsed <= 0:
+            return
+        active = self.active_us
+        if self._active:
+            active += time.ticks_diff(time.ticks_us(), self._wake_us)
+        print(f"[電源] 喚醒 {self.wakeups * 60000 / elapsed:.1f} 次/分, "
+              f"使用率 {active / (elapsed * 10):.2f}%, light sleep {self.slept_ms * 100 / elapsed:.1f}%")
+    
+    def request_frame(self):
+        """通知繪圖工作有內容需要重畫"""
+        self.frame_event.set()
+    
+    def show_screen(self, screen):
+        """切換畫面，由繪圖工作完整重畫"""
+        self.current_screen = screen
+        self._screen_changed = True
+        self.request_frame()
+    
+    def load_app(self, index):
+        """匯入應用程式模組並建立它的 App"""
+        module_name = APPS[index][1]
+        loaded = module_name in sys.modules
+        module = __import__(module_name)
+        if not loaded:
+            self.app_loads += 1
+            profiler.install_module(module)
+            print(f"[應用程式] 載入 {module_name}，剩餘 {gc.mem_free()} bytes")
+        return module.App(self)
+    
+    def open_app(self):
+        """進入（或重新開始）主畫面選擇的應用程式"""
+        app = self.apps[self.app_index]
+        if app is None:
+            self.memory.prepare()
+            app = self.load_app(self.app_index)
+            self.apps[self.app_index] = app
+        self.app = app
+        app.start()
+        self.show_screen(1)
+        self.wake_app()
+    
+    def close_app(self):
+        """返回主畫面；沒有 APP_PRELOAD 時卸載應用程式模組並回收記憶體"""
+        self.show_screen(0)
+        if APP_PRELOAD:
+            return
+        self.app = None
+        self.apps[self.app_index] = None
+        module_name = APPS[self.app_index][1]
+        profiler.uninstall_module(module_name)
+        if module_name in sys.modules:
+            del sys.modules[module_name]
+        ui.text_renderer.clear()
+        self.memory.collect()
+        print(f"[應用程式] 卸載 {module_name}，剩餘 {gc.mem_free()} bytes")
+    
+    def wake_app(self):
+        """讓應用程式工作重新開始呼叫 tick()"""
+        self.app_event.set()
+    
+    def app_busy(self):
+        """目前的應用程式是否不能被阻塞（例如遊戲進行中）"""
+        return self.current_screen == 1 and self.app.busy()
+    
+    async def input_task(self):
+        """輸入：主畫面上切換與進入應用程式，應用程式中交給 App.input()
         
+        中斷模式下沒有待處理的輸入時等編碼器中斷喚醒，不再每 10 ms 輪詢；
+        沒有作用的旋轉方向直接丟棄，避免留在佇列中讓輸入工作一直醒著。
+        """
+        encoder = self.encoder
         while True:
-            current_time = time.ticks_ms()
-            
             if self.current_screen == 0:  # 主畫面
-                # 使用 peek 來檢查是否有旋轉，避免消耗數據
-                if self.encoder.peek_rotation() > 0:
-                    # 確認要進入遊戲，才真正讀取值
-                    rotation = self.encoder.get_rotation()
-                    if rotation > 0:
-                        print("進入遊戲模式")
-                        self.current_screen = 1
-                        if snake_game is None:
-                            snake_game = SnakeGame(self.display, self.encoder)
-                        else:
-                            snake_game.reset_game()
-                        self.display.fill(BLACK)
-                        snake_game.draw_boundary()
-                        snake_game.draw()
-                
-                # 更新時間顯示
-                _, _, _, _, _, minute, _, _ = self.rtc.datetime()
-                if minute != last_minute:
-                    self.draw_clock_face()
-                    last_minute = minute
-                
-                # 更新天氣
-                if time.ticks_diff(current_time, last_update) > 1800000:
-                    self.update_weather()
-                    last_update = current_time
+                if encoder.get_rotation() > 0:
+                    print(f"進入 {APPS[self.app_index][0]}")
+                    self.open_app()
+                elif len(APPS) > 1 and encoder.is_button_pressed():
+                    self.app_index = (self.app_index + 1) % len(APPS)
+                    self.request_frame()
+            elif not self.app.input(encoder):
+                print("返回主畫面")
+                self.close_app()
             
-            elif self.current_screen == 1:  # 遊戲畫面
-                if snake_game:
-                    if snake_game.game_over:
-                        # 遊戲結束狀態
-                        if self.encoder.is_button_pressed():
-                            print("重新開始遊戲")
-                            snake_game.reset_game()
-                            self.display.fill(BLACK)
-                            snake_game.draw_boundary()
-                            snake_game.draw()
-                        elif self.encoder.peek_rotation() < 0:
-                            rotation = self.encoder.get_rotation()
-                            if rotation < 0:
-                                print("返回主畫面")
-                                self.current_screen = 0
-                                self.draw_clock_face()
-                    else:
-                        # 遊戲進行中 - 只更新方向，不讀取旋轉
-                        snake_game.update_direction()
-                        
-                        # 定時移動蛇
-                        if time.ticks_diff(current_time, snake_game.last_move) >= snake_game.game_speed:
-                            snake_game.move_snake()
-                            snake_game.last_move = current_time
-                            snake_game.draw()
+            if encoder.needs_polling():
+                await self._sleep(TASK_INPUT, INPUT_POLL_MS)
+            else:
+                await self._wait(encoder.wake_flag)
+    
+    async def app_task(self):
+        """應用程式節拍：依 App.tick() 回傳的間隔定時呼叫（例如遊戲每一步）"""
+        while True:
+            delay = self.app.tick() if self.current_screen == 1 else None
+            if delay is None:
+                self.app_event.clear()
+                await self._wait(self.app_event)
+            elif delay > 0:
+                await self._sleep(TASK_APP, delay)
+    
+    async def render_task(self):
+        """繪圖：等待其他工作要求重畫，只畫有變動的部分"""
+        while True:
+            await self._wait(self.frame_event)
+            self.frame_event.clear()
             
-            time.sleep_ms(10)
-
-# 主程式
-def main():
-    # 初始化SPI和顯示器
-    spi = SPI(2, baudrate=40000000, polarity=0, phase=0,
-              sck=Pin(18), mosi=Pin(23))
+            if PROFILE:
+                start = time.ticks_us()
+            full = self._screen_changed
+            self._screen_changed = False
+            if self.current_screen == 0:
+                self.draw_clock_face(full)
+            else:
+                self.app.draw(full)
+            if PROFILE:
+                profiler.record(PROF_FRAME, time.ticks_diff(time.ticks_us(), start))
+                if full:
+                    self.overlay_field.invalidate()
     
-    dc_pin = Pin(27, Pin.OUT)
-    cs_pin = Pin(5, Pin.OUT)
-    reset_pin = Pin(26, Pin.OUT)
-    backlight_pin = Pin(33, Pin.OUT)
+    async def clock_task(self):
+        """時鐘：每到整分鐘（指針時鐘為每秒）要求重畫主畫面，並定期印出電源統計"""
+        last_report = time.ticks_ms()
+        period = 1 if CLOCK_ANALOG else 60
+        while True:
+            deadline = self.time_service.deadline(period)
+            await self._sleep(TASK_CLOCK, max(1, time.ticks_diff(deadline, time.ticks_ms())))
+            if self.current_screen == 0:
+                self.request_frame()
+            if time.ticks_diff(time.ticks_ms(), last_report) >= POWER_REPORT_MS:
+                last_report = time.ticks_ms()
+                self.report_power()
+                # 搜尋最大可用區塊需要回收多次，應用程式忙碌時只印統計
+                self.memory.report(not self.app_busy())
     
-    display = gc9a01.GC9A01(
-        spi,
-        dc_pin,
-        cs_pin,
-        reset_pin,
-        backlight_pin,
-        0
-    )
+    async def network_task(self):
+        """網路：連線 WiFi 並同步時間，之後定期重新校時（失敗時指數退避）"""
+        while True:
+            delay = WIFI_RETRY_MS
+            try:
+                self.wifi_connected = await self.weather_api.connect_wifi(WIFI_SSID, WIFI_PASSWORD)
+                self.boot.mark("wifi", self.wifi_connected)
+                if self.wifi_connected:
+                    # ntptime 會阻塞，應用程式忙碌（遊戲進行中）時延後校時
+                    while self.app_busy():
+                        await self._sleep(TASK_NETWORK, 1000)
+                    synced = self.time_service.sync()
+                    self.boot.mark("ntp", synced)
+                    if synced and self.current_screen == 0:
+                        self.request_frame()
+                    self.network_ready.set()
+                    delay = self.time_service.next_sync_ms()
+            except Exception as e:
+                # 未預期的錯誤不能讓工作結束，照連線失敗的間隔重試
+                print(f"網路工作錯誤: {e}")
+                self.wifi_connected = False
+            await self._sleep(TASK_NETWORK, delay)
     
-    display.backlight.value(1)
+    async def weather_task(self):
+        """天氣：資料過期時更新，等待網路期間不阻塞其他工作"""
+        api = self.weather_api
+        await self._wait(self.network_ready)
+        while True:
+            if not api.is_fresh():
+                try:
+                    if LIGHT_SLEEP:
+                        # light sleep 期間 WiFi 會斷線
+                        self.wifi_connected = await api.connect_wifi(WIFI_SSID, WIFI_PASSWORD)
+                    # 回應的解析會配置不少暫時的物件，先回收讓它不觸發自動回收
+                    self.memory.prepare(self.next_deadline_ms())
+                    start = time.ticks_us()
+                    # 應用程式執行中不能退回阻塞的更新
+                    new_weather = await api.fetch_weather(self.locations, self.current_screen == 0)
+                    if PROFILE:
+                        profiler.record(PROF_WEATHER, time.ticks_diff(time.ticks_us(), start))
+                except Exception as e:
+                    # 未預期的錯誤不能讓工作結束，照更新失敗的間隔重試
+                    print(f"天氣工作錯誤: {e}")
+                    new_weather = None
+                self.boot.mark("weather", bool(new_weather))
+                if new_weather:
+                    self.weather_info = new_weather
+                    if self.current_screen == 0:
+                        self.request_frame()
+            await self._sleep(TASK_WEATHER, max(api.expires_in_ms(), WEATHER_RETRY_MS))
     
-    # 初始化滾輪編碼器
-    encoder = RotaryEncoder(
-        clk_pin=14,
-        dt_pin=12,
-        sw_pin=13
-    )
+    async def profile_task(self):
+        """效能資訊（PROFILE）：每秒更新畫面上的數字並檢查序列埠指令"""
+        last_wakeups = self.wakeups
+        last_time = time.ticks_ms()
+        show_heap = False
+        while True:
+            await self._sleep(TASK_PROFILE, 1000)
+            now = time.ticks_ms()
+            elapsed = max(1, time.ticks_diff(now, last_time))
+            hz = (self.wakeups - last_wakeups) * 1000 // elapsed
+            last_wakeups = self.wakeups
+            last_time = now
+            if show_heap:
+                text = f"{gc.mem_free() // 1024}K free"
+            else:
+                p50 = profiler.percentile(PROF_FRAME, 50) / 1000
+                p99 = profiler.percentile(PROF_FRAME, 99) / 1000
+                text = f"{hz}Hz {p50:.1f}/{p99:.1f}"
+            show_heap = not show_heap
+            self.overlay_field.update(self.display, text)
+            profiler.poll_serial()
+    
+    async def city_task(self):
+        """城市輪播（多個城市時）：定時切換主畫面顯示的城市，不需要網路"""
+        count = len(self.locations)
+        while True:
+            await self._sleep(TASK_CITY, CITY_ROTATE_MS)
+            if self.current_screen != 0:
+                continue
+            # 跳過沒有資料的城市
+            forecast = self.weather_info
+            city = self.city
+            for _ in range(count):
+                city = (city + 1) % count
+                if not forecast or forecast.has(city):
+                    break
+            if city != self.city:
+                self.city = city
+                self.request_frame()
+    
+    async def replay_task(self):
+        """重播（INPUT_REPLAY）：等遊戲走到紀錄的那一步，再把事件放回編碼器的佇列"""
+        log = self.input_log
+        while True:
+            event, delay = log.next_event()
+            if event == EVENT_NONE:
+                break
+            while not log.reached():
+                log.progress.clear()
+                await self._wait(log.progress)
+            delay = time.ticks_diff(time.ticks_add(log.mark, delay), time.ticks_ms())
+            if delay > 0:
+                await self._sleep(TASK_REPLAY, delay)
+            self.encoder.inject(event)
+            log.delivered()
+        print(f"[重播] 紀錄結束，共 {log.events} 筆事件")
+        self._suspend()
     
-    # 簡單測試編碼器
+    async def idle_task(self):
+        """閒置（LIGHT_SLEEP）：所有工作都在等待時 light sleep 到最近的期限
+        
+        編碼器或按鈕會提早喚醒。應用程式忙碌（遊戲進行中）時不睡，避免遺失旋轉。
+        """
+        while True:
+            await self.idle_event.wait()
+            self.idle_event.clear()
+            # 讓同一時刻被喚醒的工作先執行完
+            resumes = self._resumes
+            await asyncio.sleep_ms(0)
+            if self._active or self._resumes != resumes or self.app_busy():
+                continue
+            delay = self.next_deadline_ms()
+            if delay is None or delay < LIGHT_SLEEP_MIN_MS:
+                continue
+            start = time.ticks_ms()
+            machine.lightsleep(delay)
+            self.slept_ms += time.ticks_diff(time.ticks_ms(), start)
+            self.encoder.resync()
+
+def encoder_self_test(encoder):
+    """編碼器診斷模式：顯示原始腳位狀態，按下按鈕或 3 秒後結束"""
     print("開始編碼器測試，請旋轉編碼器...")
     print("如果沒有反應，可能是腳位連接問題")
     
+    # 等放開開機時按住的按鈕，避免直接結束測試
+    while encoder.sw and encoder.sw.value() == 0:
+        time.sleep_ms(10)
+    encoder.is_button_pressed()
+    
     test_count = 0
     while test_count < 30:  # 測試3秒
         clk, dt = encoder.get_raw_states()
@@ -595,10 +2089,54 @@ def main():
         test_count += 1
     
     print("編碼器測試結束，啟動手錶程式...")
-    time.sleep(1)
+
+# 主程式
+def main():
+    boot = BootTimer()
     
-    # 建立並執行智慧型手錶
-    watch = SmartWatch(display, encoder)
+    # 初始化SPI和顯示器
+    spi = SPI(2, baudrate=40000000, polarity=0, phase=0,
+              sck=Pin(18), mosi=Pin(23))
+    
+    dc_pin = Pin(27, Pin.OUT)
+    cs_pin = Pin(5, Pin.OUT)
+    reset_pin = Pin(26, Pin.OUT)
+    backlight_pin = Pin(33, Pin.OUT)
+    
+    display = gc9a01.GC9A01(
+        spi,
+        dc_pin,
+        cs_pin,
+        reset_pin,
+        backlight_pin,
+        0
+    )
+    boot.mark("display")
+    
+    if PROFILE:
+        profiler.install()
+    
+    # 中斷處理函式發生例外時需要的緩衝區
+    micropython.alloc_emergency_exception_buf(100)
+    
+    # 初始化滾輪編碼器
+    encoder = RotaryEncoder(
+        clk_pin=14,
+        dt_pin=12,
+        sw_pin=13,
+        use_irq=ENCODER_USE_IRQ
+    )
+    boot.mark("encoder")
+    
+    # 診斷模式：設定開啟或按住按鈕開機
+    if ENCODER_SELF_TEST or (encoder.sw and encoder.sw.value() == 0):
+        display.backlight.value(1)
+        encoder_self_test(encoder)
+    
+    # 建立手錶並畫出第一個畫面（天氣來自 flash 快取），再開背光避免看到殘影；
+    # WiFi、校時與天氣在 run() 的背景工作中進行
+    watch = SmartWatch(display, encoder, boot)
+    display.backlight.value(1)
     watch.run()
 
 if __name__ == "__main__":
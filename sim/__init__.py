@@ -0,0 +1,65 @@
+"""主機端硬體模擬層（HAL）
+
+在 CPython 上以模擬模組取代 MicroPython 的 machine、esp32、micropython、gc9a01、
+vga1_8x16、framebuf、network、urequests、uasyncio、ntptime、gc 與 time，main.py 不需修改即可在電腦上執行：
+
+    import sim
+    sim.install()
+    import main
+
+時間由 sim.clock 的虛擬時鐘提供，sleep 不會真的等待；天氣 API 由
+sim.cwa 在本機回應；檔案寫在 sim.flash 的暫存目錄。
+"""
+import sys
+
+from sim import (cwa, esp32, flash, framebuf, gc, gc9a01, machine, micropython, network, ntptime,
+                 uasyncio, urequests, utime, vga1_8x16)
+from sim.clock import Halt, clock
+
+__all__ = ["Halt", "clock", "install", "reset", "set_true_time"]
+
+MODULES = {
+    "machine": machine,
+    "esp32": esp32,
+    "micropython": micropython,
+    "gc9a01": gc9a01,
+    "vga1_8x16": vga1_8x16,
+    "framebuf": framebuf,
+    "network": network,
+    "urequests": urequests,
+    "uasyncio": uasyncio,
+    "ntptime": ntptime,
+    "gc": gc,
+    "time": utime,
+    "utime": utime,
+}
+
+# 預設的「真實時間」（UTC），NTP 同步後 RTC 會跳到這個時間
+DEFAULT_TRUE_TIME = (2024, 1, 15, 8, 30, 0)
+
+
+def install():
+    """把模擬模組註冊到 sys.modules，之後 import main 會使用它們"""
+    sys.modules.update(MODULES)
+    reset()
+
+
+def reset():
+    """重設所有模擬狀態（時鐘、腳位、網路、HTTP 路由、檔案系統）"""
+    clock.reset()
+    gc.reset()
+    flash.erase()
+    machine.reset_pins()
+    esp32.reset()
+    network.reset()
+    urequests.reset()
+    uasyncio.reset()
+    ntptime.reset()
+    urequests.route(cwa.BASE_URL, cwa.handle)
+    set_true_time(DEFAULT_TRUE_TIME)
+
+
+def set_true_time(datetime_tuple):
+    """設定虛擬時鐘目前對應的真實時間 (year, month, day, hour, minute, second)"""
+    secs = utime.mktime(datetime_tuple)
+    clock.true_offset_us = secs * 1000000 - clock.now_us + clock.now_us * clock.drift_ppm // 1000000
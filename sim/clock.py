@@ -0,0 +1,111 @@
+"""模擬用虛擬時鐘
+
+所有 ticks_ms / sleep_ms / RTC 都從這個時鐘取值，sleep 只推進虛擬時間、
+不會真的等待，因此幾分鐘的手錶運作可以在數秒內跑完。
+"""
+import heapq
+
+# ESP32 port 的 ticks 週期（與 MicroPython 相同的回繞行為）
+TICKS_PERIOD = 1 << 30
+TICKS_HALFPERIOD = TICKS_PERIOD // 2
+
+
+class Halt(BaseException):
+    """虛擬時間到達 halt_at 期限時由 sleep 拋出，用來中止 while True 迴圈"""
+
+
+class VirtualClock:
+    """以微秒為單位的虛擬時鐘，支援排程事件"""
+
+    def __init__(self):
+        # 阻塞結束時呼叫（machine 執行排程中的 soft IRQ），不隨 reset() 清除
+        self.unblock_hooks = []
+        self.reset()
+
+    def reset(self):
+        self.now_us = 0
+        self.slept_us = 0
+        self.sleep_calls = 0
+        # RTC 讀值 = now_us + rtc_offset_us（以 2000-01-01 為紀元）
+        self.rtc_offset_us = 0
+        # 真實世界時間 = now_us + true_offset_us，NTP 同步時寫入 RTC
+        self.true_offset_us = 0
+        # 本地振盪器（ticks 與 RTC）比真實時間快多少 ppm，負數為慢
+        self.drift_ppm = 0
+        self.sleep_hooks = []
+        self.blocking = 0  # advance_us 的巢狀深度；大於 0 時 Python 被阻塞（SPI、網路、回收）
+        self._events = []
+        self._seq = 0
+        self._halt_us = None
+
+    def call_at(self, t_us, fn, *args):
+        """在虛擬時間 t_us 呼叫 fn(*args)"""
+        self._seq += 1
+        heapq.heappush(self._events, (t_us, self._seq, fn, args))
+
+    def call_later(self, delay_us, fn, *args):
+        self.call_at(self.now_us + delay_us, fn, *args)
+
+    def advance_us(self, dt_us):
+        """推進虛擬時間（阻塞的工作），途中依序觸發到期的事件"""
+        target = self.now_us + max(0, int(dt_us))
+        events = self._events
+        self.blocking += 1
+        try:
+            while events and events[0][0] <= target:
+                t_us, _, fn, args = heapq.heappop(events)
+                if t_us > self.now_us:
+                    self.now_us = t_us
+                fn(*args)
+            self.now_us = target
+        finally:
+            self.blocking -= 1
+        if not self.blocking:
+            for hook in self.unblock_hooks:
+                hook()
+
+    def sleep_us(self, us):
+        """模擬 sleep：通知觀察者後推進時間，超過期限時拋出 Halt"""
+        self.sleep_until(self.now_us + max(0, int(us)))
+
+    def sleep_until(self, t_us, wake=None):
+        """睡到 t_us；若某個排程事件之後 wake() 成立則提早醒來
+
+        回傳實際睡了幾微秒；超過 halt_at 期限時拋出 Halt。
+        """
+        self.sleep_calls += 1
+        for hook in self.sleep_hooks:
+            hook(t_us - self.now_us)
+        # 觀察者推進的時間（模擬的回收暫停）算在工作時間，不算睡眠
+        start = self.now_us
+        halt = self._halt_us is not None and t_us >= self._halt_us
+        limit = self._halt_us if halt else t_us
+        events = self._events
+        while events and events[0][0] <= limit:
+            event_us, _, fn, args = heapq.heappop(events)
+            if event_us > self.now_us:
+                self.now_us = event_us
+            fn(*args)
+            if wake is not None and wake():
+                break
+        else:
+            self.now_us = max(self.now_us, limit)
+            if halt:
+                raise Halt()
+        self.slept_us += self.now_us - start
+        return self.now_us - start
+
+    def halt_at(self, t_us):
+        self._halt_us = t_us
+
+    def halt_after_ms(self, ms):
+        self._halt_us = self.now_us + ms * 1000
+
+    def rtc_us(self):
+        return self.now_us + self.rtc_offset_us
+
+    def true_us(self):
+        return self.now_us + self.true_offset_us - self.now_us * self.drift_ppm // 1000000
+
+
+clock = VirtualClock()
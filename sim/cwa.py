@@ -0,0 +1,133 @@
+"""中央氣象署 F-C0032-001（一般天氣預報－今明 36 小時）的本機替身
+
+產生與正式 API 相同結構的 JSON：records.location[].weatherElement[]，
+每個元素（Wx、PoP、MinT、CI、MaxT）有三個 12 小時時段。內容依城市與
+發布時間固定產生，同一組參數每次回應都相同。
+"""
+import json
+from urllib.parse import unquote
+
+from sim.clock import clock
+from sim.utime import gmtime
+
+BASE_URL = "https://opendata.cwa.gov.tw/api/v1/rest/datastore/F-C0032-001"
+
+LOCATIONS = (
+    "嘉義縣", "新北市", "嘉義市", "新竹縣", "新竹市", "臺北市", "臺南市",
+    "宜蘭縣", "苗栗縣", "雲林縣", "花蓮縣", "臺中市", "臺東縣", "桃園市",
+    "南投縣", "高雄市", "金門縣", "屏東縣", "基隆市", "澎湖縣", "彰化縣",
+    "連江縣",
+)
+
+WX = (
+    ("晴天", 1), ("晴時多雲", 2), ("多雲時晴", 3), ("多雲", 4),
+    ("多雲時陰", 5), ("陰時多雲", 6), ("陰天", 7), ("多雲短暫雨", 8),
+    ("陰短暫雨", 11), ("陰時多雲短暫陣雨", 18), ("多雲午後短暫雷陣雨", 22),
+)
+
+CI = ("寒冷", "稍有寒意", "舒適", "悶熱", "易中暑")
+
+# 時段的起訖時間與正式 API 相同，是臺灣時間
+UTC_OFFSET = 8 * 3600
+
+# 每次回應時資料的版本，改變它即可模擬氣象署發布新預報
+revision = 0
+
+
+def _slot_times(now_secs):
+    """依發布時間產生三個 12 小時時段的起訖字串（臺灣時間 06 時與 18 時起算）"""
+    now_secs += UTC_OFFSET
+    year, month, mday, hour = gmtime(now_secs)[:4]
+    start_hour = 6 if 6 <= hour < 18 else 18
+    start = now_secs - ((hour - start_hour) % 24) * 3600 - now_secs % 3600
+    slots = []
+    for i in range(3):
+        begin = start + i * 43200
+        end = begin + 43200
+        slots.append((_fmt(begin), _fmt(end)))
+    return slots
+
+
+def _fmt(secs):
+    year, month, mday, hour, minute, second = gmtime(secs)[:6]
+    return f"{year}-{month:02d}-{mday:02d} {hour:02d}:{minute:02d}:{second:02d}"
+
+
+def _location(name, slots, seed):
+    index = LOCATIONS.index(name) if name in LOCATIONS else len(name)
+    base = (index * 7 + seed * 13) & 0xFF
+    wx, pop, min_t, ci, max_t = [], [], [], [], []
+    for i, (start, end) in enumerate(slots):
+        w_name, w_code = WX[(base + i * 3) % len(WX)]
+        low = 14 + (base + i * 5) % 12
+        high = low + 3 + (base + i) % 6
+        wx.append({"startTime": start, "endTime": end,
+                   "parameter": {"parameterName": w_name, "parameterValue": str(w_code)}})
+        pop.append({"startTime": start, "endTime": end,
+                    "parameter": {"parameterName": str((base * 10 + i * 20) % 100),
+                                  "parameterUnit": "百分比"}})
+        min_t.append({"startTime": start, "endTime": end,
+                      "parameter": {"parameterName": str(low), "parameterUnit": "C"}})
+        ci.append({"startTime": start, "endTime": end,
+                   "parameter": {"parameterName": CI[(base + i) % len(CI)]}})
+        max_t.append({"startTime": start, "endTime": end,
+                      "parameter": {"parameterName": str(high), "parameterUnit": "C"}})
+    return {
+        "locationName": name,
+        "weatherElement": [
+            {"elementName": "Wx", "time": wx},
+            {"elementName": "PoP", "time": pop},
+            {"elementName": "MinT", "time": min_t},
+            {"elementName": "CI", "time": ci},
+            {"elementName": "MaxT", "time": max_t},
+        ],
+    }
+
+
+def build_payload(locations=None, now_secs=None):
+    """組出完整回應內容（dict）"""
+    if now_secs is None:
+        now_secs = clock.true_us() // 1000000
+    if locations is None:
+        locations = LOCATIONS
+    slots = _slot_times(now_secs)
+    return {
+        "success": "true",
+        "result": {
+            "resource_id": "F-C0032-001",
+            "fields": [
+                {"id": "datasetDescription", "type": "String"},
+                {"id": "locationName", "type": "String"},
+                {"id": "parameterName", "type": "String"},
+                {"id": "parameterValue", "type": "String"},
+                {"id": "parameterUnit", "type": "String"},
+                {"id": "startTime", "type": "Timestamp"},
+                {"id": "endTime", "type": "Timestamp"},
+            ],
+        },
+        "records": {
+            "datasetDescription": "三十六小時天氣預報",
+            "location": [_location(name, slots, revision) for name in locations],
+        },
+    }
+
+
+def parse_query(url):
+    query = {}
+    if "?" in url:
+        for pair in url.split("?", 1)[1].split("&"):
+            key, _, value = pair.partition("=")
+            query[unquote(key)] = unquote(value)
+    return query
+
+
+def handle(url):
+    """urequests 路由處理函式"""
+    query = parse_query(url)
+    if not query.get("Authorization"):
+        return 401, b'{"message":"Unauthorized"}'
+    names = None
+    if query.get("locationName"):
+        names = [n for n in query["locationName"].split(",") if n in LOCATIONS]
+    body = json.dumps(build_payload(names), ensure_ascii=False, separators=(",", ":"))
+    return 200, body.encode("utf-8")
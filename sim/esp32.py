@@ -0,0 +1,36 @@
+"""esp32 模組的模擬版本：light sleep 的 ext0 / ext1 喚醒設定"""
+from sim import machine
+
+WAKEUP_ALL_LOW = False
+WAKEUP_ANY_HIGH = True
+
+_ext0 = None  # (腳位編號, 喚醒電位)
+_ext1 = None  # (腳位編號, WAKEUP_*)
+
+
+def wake_on_ext0(pin, level):
+    global _ext0
+    _ext0 = None if pin is None else (pin.id, 1 if level else 0)
+
+
+def wake_on_ext1(pins, level):
+    global _ext1
+    _ext1 = None if not pins else (tuple(pin.id for pin in pins), level)
+
+
+def pin_wake():
+    """目前的腳位電位是否會喚醒 light sleep"""
+    if _ext0 is not None and machine.level(_ext0[0]) == _ext0[1]:
+        return True
+    if _ext1 is not None:
+        pin_ids, level = _ext1
+        if level == WAKEUP_ANY_HIGH:
+            return any(machine.level(pin_id) for pin_id in pin_ids)
+        return not any(machine.level(pin_id) for pin_id in pin_ids)
+    return False
+
+
+def reset():
+    global _ext0, _ext1
+    _ext0 = None
+    _ext1 = None
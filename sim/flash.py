@@ -0,0 +1,27 @@
+"""ESP32 檔案系統的模擬版本
+
+main.py 直接用 open() 讀寫檔案；在電腦上把這些檔案放在暫存目錄，
+sim.reset() 時清空，避免情境之間互相影響，也不會寫進專案目錄。
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+root = tempfile.mkdtemp(prefix="sim-flash-")
+atexit.register(shutil.rmtree, root, True)
+
+
+def path(name):
+    """模擬檔案系統上 name 對應的實際路徑"""
+    return os.path.join(root, name)
+
+
+def erase():
+    """刪除模擬檔案系統上的所有檔案與目錄"""
+    for name in os.listdir(root):
+        full = os.path.join(root, name)
+        if os.path.isdir(full):
+            shutil.rmtree(full)
+        else:
+            os.remove(full)
@@ -0,0 +1,111 @@
+"""framebuf 模組的模擬版本
+
+只實作遊戲區繪圖用到的格式與方法：RGB565（每像素 16 位元，little endian）、
+GS4_HMSB（每像素 4 位元，同一個位元組中左邊的像素在高 4 位元）與 GS8；
+fill、fill_rect、pixel，以及可指定透明色與調色盤的 blit。
+"""
+MONO_VLSB = 0
+RGB565 = 1
+GS4_HMSB = 2
+MONO_HLSB = 3
+MONO_HMSB = 4
+GS2_HMSB = 5
+GS8 = 6
+
+
+class FrameBuffer:
+    def __init__(self, buf, width, height, format, stride=None):
+        if format not in (RGB565, GS4_HMSB, GS8):
+            raise ValueError("sim.framebuf 不支援這個格式")
+        self.buf = memoryview(buf).cast("B")
+        self.width = width
+        self.height = height
+        self.format = format
+        self.stride = width if stride is None else stride
+
+    # --- 像素存取 ---
+
+    def _get(self, x, y):
+        i = y * self.stride + x
+        buf = self.buf
+        if self.format == RGB565:
+            return buf[2 * i] | buf[2 * i + 1] << 8
+        if self.format == GS8:
+            return buf[i]
+        byte = buf[i >> 1]
+        return byte >> 4 if not i & 1 else byte & 0x0F
+
+    def _set(self, x, y, color):
+        i = y * self.stride + x
+        buf = self.buf
+        if self.format == RGB565:
+            buf[2 * i] = color & 0xFF
+            buf[2 * i + 1] = (color >> 8) & 0xFF
+        elif self.format == GS8:
+            buf[i] = color & 0xFF
+        elif i & 1:
+            buf[i >> 1] = (buf[i >> 1] & 0xF0) | (color & 0x0F)
+        else:
+            buf[i >> 1] = (buf[i >> 1] & 0x0F) | (color & 0x0F) << 4
+
+    def pixel(self, x, y, color=None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        if color is None:
+            return self._get(x, y)
+        self._set(x, y, color)
+        return None
+
+    # --- 繪圖 ---
+
+    def fill(self, color):
+        self.fill_rect(0, 0, self.width, self.height, color)
+
+    def fill_rect(self, x, y, w, h, color):
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = min(self.width, x + w)
+        y1 = min(self.height, y + h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        if self.format == GS4_HMSB:
+            if not (x0 | x1) & 1 and self.stride % 2 == 0:
+                # 左右邊界都對齊位元組時整段寫入
+                run = bytes(((color & 0x0F) * 0x11,)) * ((x1 - x0) >> 1)
+                for row in range(y0, y1):
+                    start = (row * self.stride + x0) >> 1
+                    self.buf[start:start + len(run)] = run
+                return
+            for row in range(y0, y1):
+                for col in range(x0, x1):
+                    self._set(col, row, color)
+            return
+        # RGB565 與 GS8 每一列是相同的位元組序列，整段寫入
+        if self.format == RGB565:
+            size = 2
+            run = bytes((color & 0xFF, (color >> 8) & 0xFF)) * (x1 - x0)
+        else:
+            size = 1
+            run = bytes((color & 0xFF,)) * (x1 - x0)
+        for row in range(y0, y1):
+            start = (row * self.stride + x0) * size
+            self.buf[start:start + len(run)] = run
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        """把 fbuf 畫到 (x, y)；palette 為 N x 1 的 FrameBuffer，key 為透明色"""
+        if isinstance(fbuf, tuple):
+            fbuf = FrameBuffer(*fbuf)
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = min(self.width, x + fbuf.width)
+        y1 = min(self.height, y + fbuf.height)
+        lookup = None
+        if palette is not None:
+            lookup = [palette._get(i, 0) for i in range(palette.width)]
+        for row in range(y0, y1):
+            for col in range(x0, x1):
+                color = fbuf._get(col - x, row - y)
+                if lookup is not None:
+                    color = lookup[color]
+                if color != key:
+                    self._set(col, row, color)
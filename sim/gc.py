@@ -0,0 +1,109 @@
+"""gc 模組的模擬版本：補上 MicroPython 的 mem_free / mem_alloc / threshold 與自動回收
+
+其餘屬性轉交給 CPython 的 gc。CPython 以參考計數立即釋放，MicroPython 的垃圾
+則在下一次回收前一直佔用堆積。這裡以 tracemalloc 近似：每次 sample()（量測工具
+在每幀結束時呼叫）把上次取樣後的峰值增量當成新的垃圾，累計量超過 threshold()
+或超過堆積扣掉常駐量後的空間時，視為 MicroPython 在那一幀中自動回收。
+
+tracemalloc 的常駐量包含模擬器本身（例如 115 KB 的畫面緩衝區），因此
+mem_alloc() 是 ESP32 上常駐量的估計值加上累計的垃圾，回收暫停也以估計值計算。
+沒有追蹤時垃圾視為 0。collect() 與自動回收都會依估計的暫停推進虛擬時鐘。
+模擬的伺服器產生回應時用 host_only() 排除，不算裝置上的配置。
+"""
+import gc as _gc
+import tracemalloc
+from contextlib import contextmanager
+
+from sim.clock import clock
+
+HEAP_BYTES = 111168  # ESP32（無 PSRAM）常見的堆積大小
+LIVE_BYTES = 48 * 1024  # 手錶在 ESP32 上的常駐量估計
+# 回收暫停的估計：固定成本 + 清除整個堆積 + 標記常駐的物件
+PAUSE_US = 500 + (HEAP_BYTES * 20 + LIVE_BYTES * 60) // 1024
+
+_threshold = -1
+_garbage = 0  # 上次回收後累計的配置量
+_base = 0  # 上次取樣時 tracemalloc 的用量
+collections = 0  # collect() 次數
+auto_collections = 0  # 模擬的自動回收次數
+
+
+def reset():
+    """清除門檻與回收統計（sim.reset() 時呼叫）"""
+    global _threshold, _garbage, _base, collections, auto_collections
+    _threshold = -1
+    _garbage = _base = 0
+    collections = auto_collections = 0
+
+
+def _rebase():
+    """從目前的用量開始量下一次的峰值增量"""
+    global _base
+    _base = 0
+    if tracemalloc.is_tracing():
+        _base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+
+def _restart():
+    """回收之後垃圾歸零，從目前的用量開始累計"""
+    global _garbage
+    _garbage = 0
+    _rebase()
+
+
+def sample():
+    """回傳上次取樣後的配置峰值增量並累計為垃圾；超過門檻或堆積用完時模擬一次自動回收"""
+    global _garbage, _base, auto_collections
+    if not tracemalloc.is_tracing():
+        return 0
+    current, peak = tracemalloc.get_traced_memory()
+    grown = max(0, peak - _base)
+    tracemalloc.reset_peak()
+    _base = current
+    _garbage += grown
+    if (_threshold >= 0 and _garbage >= _threshold) or _garbage >= HEAP_BYTES - LIVE_BYTES:
+        auto_collections += 1
+        _restart()
+        clock.advance_us(PAUSE_US)
+    return grown
+
+
+@contextmanager
+def host_only():
+    """期間的配置只發生在主機上（例如模擬的伺服器），不累計為垃圾"""
+    sample()
+    try:
+        yield
+    finally:
+        _rebase()
+
+
+def collect():
+    global collections
+    collected = _gc.collect()
+    collections += 1
+    _restart()
+    clock.advance_us(PAUSE_US)
+    return collected
+
+
+def threshold(amount=None):
+    """與 MicroPython 相同：自上次回收配置超過 amount 位元組時自動回收，-1 關閉"""
+    global _threshold
+    if amount is None:
+        return _threshold
+    _threshold = amount
+
+
+def mem_alloc():
+    sample()
+    return LIVE_BYTES + _garbage
+
+
+def mem_free():
+    return max(0, HEAP_BYTES - mem_alloc())
+
+
+def __getattr__(name):
+    return getattr(_gc, name)
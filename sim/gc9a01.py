@@ -0,0 +1,224 @@
+"""GC9A01 顯示器驅動的模擬版本
+
+介面與 gc9a01py 相同，所有繪圖都寫入一塊 240x240 的 RGB565 記憶體畫面，
+並依真實驅動的傳輸方式統計 SPI 位址視窗數、像素數與位元組數：
+
+- 每次設定位址視窗 = CASET(1+4) + RASET(1+4) + RAMWR(1) = 11 bytes
+- 每個像素 2 bytes
+- rect 由四條 hline/vline 組成，text 每個字元一個視窗
+"""
+from array import array
+
+BLACK = 0x0000
+BLUE = 0x001F
+RED = 0xF800
+GREEN = 0x07E0
+CYAN = 0x07FF
+MAGENTA = 0xF81F
+YELLOW = 0xFFE0
+WHITE = 0xFFFF
+
+WINDOW_OVERHEAD = 11
+
+
+def color565(red, green=0, blue=0):
+    return (red & 0xF8) << 8 | (green & 0xFC) << 3 | blue >> 3
+
+
+class Stats:
+    """繪圖呼叫與 SPI 傳輸統計"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = {}
+        self.windows = 0
+        self.pixels = 0
+        self.bytes = 0
+
+    def count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def snapshot(self):
+        return (self.total_calls(), self.windows, self.pixels, self.bytes)
+
+
+class GC9A01:
+    def __init__(self, spi, dc, cs=None, reset=None, backlight=None, rotation=0):
+        self.spi = spi
+        self.dc = dc
+        self.cs = cs
+        self.reset = reset
+        self.backlight = backlight
+        self._rotation = rotation
+        self.width = 240
+        self.height = 240
+        self.stats = Stats()
+        self.fb = array("H", bytes(2 * self.width * self.height))
+        self._glyphs = {}
+
+    # --- 模擬用輔助 ---
+
+    def get_pixel(self, x, y):
+        return self.fb[y * self.width + x]
+
+    def region(self, x, y, w, h):
+        """回傳指定區域的像素（用於比對畫面內容）"""
+        rows = []
+        for row in range(y, y + h):
+            start = row * self.width + x
+            rows.append(self.fb[start:start + w].tobytes())
+        return b"".join(rows)
+
+    def frame_bytes(self):
+        return self.fb.tobytes()
+
+    # --- 傳輸統計 ---
+
+    def _clip(self, x, y, w, h):
+        if x < 0:
+            w += x
+            x = 0
+        if y < 0:
+            h += y
+            y = 0
+        w = min(w, self.width - x)
+        h = min(h, self.height - y)
+        if w <= 0 or h <= 0:
+            return None
+        return x, y, w, h
+
+    def _push(self, npixels):
+        stats = self.stats
+        stats.windows += 1
+        stats.pixels += npixels
+        stats.bytes += WINDOW_OVERHEAD + 2 * npixels
+        self.spi.bytes_written += WINDOW_OVERHEAD + 2 * npixels
+
+    def _fill(self, x, y, w, h, color):
+        clipped = self._clip(x, y, w, h)
+        if clipped is None:
+            return
+        x, y, w, h = clipped
+        self._push(w * h)
+        run = array("H", [color]) * w
+        fb = self.fb
+        start = y * self.width + x
+        for _ in range(h):
+            fb[start:start + w] = run
+            start += self.width
+
+    # --- 驅動介面 ---
+
+    def rotation(self, rotation):
+        self._rotation = rotation
+
+    def fill(self, color):
+        self.stats.count("fill")
+        self._fill(0, 0, self.width, self.height, color)
+
+    def fill_rect(self, x, y, width, height, color):
+        self.stats.count("fill_rect")
+        self._fill(x, y, width, height, color)
+
+    def hline(self, x, y, length, color):
+        self.stats.count("hline")
+        self._fill(x, y, length, 1, color)
+
+    def vline(self, x, y, length, color):
+        self.stats.count("vline")
+        self._fill(x, y, 1, length, color)
+
+    def rect(self, x, y, w, h, color):
+        self.stats.count("rect")
+        self._fill(x, y, w, 1, color)
+        self._fill(x, y + h - 1, w, 1, color)
+        self._fill(x, y, 1, h, color)
+        self._fill(x + w - 1, y, 1, h, color)
+
+    def pixel(self, x, y, color):
+        self.stats.count("pixel")
+        self._fill(x, y, 1, 1, color)
+
+    def line(self, x0, y0, x1, y1, color):
+        """Bresenham 直線，連續同列/同行的像素合併成一次傳輸"""
+        self.stats.count("line")
+        steep = abs(y1 - y0) > abs(x1 - x0)
+        if steep:
+            x0, y0 = y0, x0
+            x1, y1 = y1, x1
+        if x0 > x1:
+            x0, x1 = x1, x0
+            y0, y1 = y1, y0
+        dx = x1 - x0
+        dy = abs(y1 - y0)
+        err = dx // 2
+        ystep = 1 if y0 < y1 else -1
+        xs = x0
+        dlen = 0
+        while x0 <= x1:
+            dlen += 1
+            err -= dy
+            if err < 0:
+                err += dx
+                if steep:
+                    self._fill(y0, xs, 1, dlen, color)
+                else:
+                    self._fill(xs, y0, dlen, 1, color)
+                dlen = 0
+                y0 += ystep
+                xs = x0 + 1
+            x0 += 1
+        if dlen:
+            if steep:
+                self._fill(y0, xs, 1, dlen, color)
+            else:
+                self._fill(xs, y0, dlen, 1, color)
+
+    def blit_buffer(self, buffer, x, y, width, height):
+        self.stats.count("blit_buffer")
+        clipped = self._clip(x, y, width, height)
+        if clipped is None:
+            return
+        pixels = array("H")
+        pixels.frombytes(bytes(buffer[:2 * width * height]))
+        pixels.byteswap()  # 緩衝區為大端序 RGB565
+        self._push(width * height)
+        fb = self.fb
+        cx, cy, cw, ch = clipped
+        for row in range(ch):
+            src = (cy - y + row) * width + (cx - x)
+            dst = (cy + row) * self.width + cx
+            fb[dst:dst + cw] = pixels[src:src + cw]
+
+    def text(self, font, text, x0, y0, color=WHITE, background=BLACK):
+        self.stats.count("text")
+        for char in text:
+            ch = ord(char)
+            if (font.FIRST <= ch < font.LAST
+                    and x0 + font.WIDTH <= self.width
+                    and y0 + font.HEIGHT <= self.height):
+                self._glyph(font, ch, x0, y0, color, background)
+            x0 += font.WIDTH
+
+    def _glyph(self, font, ch, x, y, color, background):
+        key = (id(font), ch, color, background)
+        rows = self._glyphs.get(key)
+        if rows is None:
+            rows = []
+            base = (ch - font.FIRST) * font.HEIGHT
+            for row in range(font.HEIGHT):
+                bits = font.FONT[base + row]
+                rows.append(array("H", [color if bits & (0x80 >> col) else background
+                                        for col in range(font.WIDTH)]))
+            self._glyphs[key] = rows
+        self._push(font.WIDTH * font.HEIGHT)
+        fb = self.fb
+        start = y * self.width + x
+        for run in rows:
+            fb[start:start + font.WIDTH] = run
+            start += self.width
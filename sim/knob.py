@@ -0,0 +1,69 @@
+"""旋轉編碼器（KY-040 類型）的實體模擬
+
+每一格（detent）是一個完整的格雷碼週期，靜止時 CLK、DT 皆為高電位：
+  順時針 (CLK, DT): 11 -> 01 -> 00 -> 10 -> 11
+  逆時針 (CLK, DT): 11 -> 10 -> 00 -> 01 -> 11
+邊緣以虛擬時鐘事件排程，edge_us 決定轉速。
+"""
+from sim import machine
+from sim.clock import clock
+
+CW_SEQUENCE = ((0, 1), (0, 0), (1, 0), (1, 1))
+CCW_SEQUENCE = ((1, 0), (0, 0), (0, 1), (1, 1))
+
+
+class Knob:
+    def __init__(self, clk_pin=14, dt_pin=12, sw_pin=13):
+        self.clk_pin = clk_pin
+        self.dt_pin = dt_pin
+        self.sw_pin = sw_pin
+        self.detents = 0  # 實際轉動的淨格數
+        self.turns = 0  # 實際轉動的總格數
+        self._busy_until = 0
+        for pin_id in (clk_pin, dt_pin, sw_pin):
+            machine.drive(pin_id, 1)
+
+    def _at(self, delay_us):
+        """回傳下一段動作的開始時間，確保動作不重疊"""
+        start = max(clock.now_us + delay_us, self._busy_until)
+        return start
+
+    def turn(self, steps, edge_us=15000, delay_us=0, bounce=0):
+        """轉動 steps 格（正數順時針），每個邊緣間隔 edge_us
+
+        bounce > 0 時每個邊緣前先產生 bounce 次接點彈跳（該腳位快速來回切換）。
+        """
+        sequence = CW_SEQUENCE if steps > 0 else CCW_SEQUENCE
+        t = self._at(delay_us)
+        prev = (1, 1)
+        for _ in range(abs(steps)):
+            for clk, dt in sequence:
+                t += edge_us
+                if bounce:
+                    step = max(1, edge_us // (4 * bounce + 4))
+                    for k in range(bounce):
+                        clock.call_at(t - (2 * k + 2) * step, self._edge, clk, dt)
+                        clock.call_at(t - (2 * k + 1) * step, self._edge, *prev)
+                clock.call_at(t, self._edge, clk, dt)
+                prev = (clk, dt)
+            clock.call_at(t, self._count, 1 if steps > 0 else -1)
+        self._busy_until = t
+        return t
+
+    def press(self, hold_us=120000, delay_us=0):
+        """按下按鈕並在 hold_us 後放開"""
+        t = self._at(delay_us)
+        clock.call_at(t, machine.drive, self.sw_pin, 0)
+        clock.call_at(t + hold_us, machine.drive, self.sw_pin, 1)
+        self._busy_until = t + hold_us
+        return self._busy_until
+
+    def _edge(self, clk, dt):
+        if machine.level(self.clk_pin) != clk:
+            machine.drive(self.clk_pin, clk)
+        if machine.level(self.dt_pin) != dt:
+            machine.drive(self.dt_pin, dt)
+
+    def _count(self, step):
+        self.detents += step
+        self.turns += 1
@@ -0,0 +1,229 @@
+"""machine 模組的模擬版本：Pin、SPI、RTC、lightsleep
+
+同一個 GPIO 編號建立的多個 Pin 物件共用同一份腳位狀態，模擬程式可用
+drive() 改變輸入腳位的電位，並依設定觸發 IRQ 回呼。lightsleep 期間
+與裝置相同不會觸發 IRQ，只有 esp32.wake_on_ext0/ext1 設定的腳位能喚醒。
+
+hard IRQ 在邊緣當下呼叫。soft IRQ 與 ESP32 相同排入排程器：Python 沒有被阻塞時
+（模擬中程式不花虛擬時間）立即執行；虛擬時鐘被阻塞的工作推進時（clock.advance_us，
+例如回收暫停、同步的網路請求）先排入 SCHEDULER_DEPTH 格的佇列，阻塞結束後才依序
+執行，處理函式讀到的是當時的電位；佇列滿了就丟掉，計入 scheduler_dropped。
+模擬中 SPI 傳輸不花虛擬時間，所以只有上述工作會延後 soft IRQ。
+"""
+import calendar
+
+from sim.clock import clock
+from sim.utime import EPOCH_OFFSET, gmtime
+
+
+class _PinState:
+    __slots__ = ("level", "handler", "trigger", "owner", "hard")
+
+    def __init__(self, level):
+        self.level = level
+        self.handler = None
+        self.trigger = 0
+        self.owner = None
+        self.hard = False
+
+
+_pins = {}
+_asleep = False
+
+SCHEDULER_DEPTH = 8  # ESP32 port 的 MICROPY_SCHEDULER_DEPTH
+_scheduled = []  # 阻塞期間排入的 soft IRQ：(處理函式, Pin)
+scheduler_dropped = 0
+
+# 喚醒原因（與 ESP32 port 的數值相同）
+PIN_WAKE = EXT0_WAKE = 2
+EXT1_WAKE = 3
+TIMER_WAKE = 4
+SLEEP = 2
+DEEPSLEEP = 4
+
+lightsleep_calls = 0
+lightsleep_us = 0
+_wake_reason = 0
+
+
+def drive(pin_id, level):
+    """由模擬端設定輸入腳位電位，必要時觸發 IRQ"""
+    global scheduler_dropped
+    state = _pins.get(pin_id)
+    if state is None:
+        state = _pins[pin_id] = _PinState(level)
+        return
+    old = state.level
+    state.level = 1 if level else 0
+    if state.handler is None or old == state.level or _asleep:
+        return
+    edge = Pin.IRQ_RISING if state.level else Pin.IRQ_FALLING
+    if not state.trigger & edge:
+        return
+    if state.hard or not clock.blocking:
+        state.handler(state.owner)
+    elif len(_scheduled) < SCHEDULER_DEPTH:
+        _scheduled.append((state.handler, state.owner))
+    else:
+        scheduler_dropped += 1
+
+
+def _run_scheduled():
+    """阻塞結束：依序執行排程中的 soft IRQ"""
+    while _scheduled:
+        handler, pin = _scheduled.pop(0)
+        handler(pin)
+
+
+clock.unblock_hooks.append(_run_scheduled)
+
+
+def level(pin_id):
+    state = _pins.get(pin_id)
+    return state.level if state else 0
+
+
+def reset_pins():
+    global lightsleep_calls, lightsleep_us, _asleep, _wake_reason, scheduler_dropped
+    _pins.clear()
+    _scheduled.clear()
+    scheduler_dropped = 0
+    lightsleep_calls = 0
+    lightsleep_us = 0
+    _asleep = False
+    _wake_reason = 0
+
+
+class Pin:
+    IN = 1
+    OUT = 3
+    OPEN_DRAIN = 7
+    PULL_UP = 2
+    PULL_DOWN = 1
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+    WAKE_LOW = 4
+    WAKE_HIGH = 5
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        state = _pins.get(id)
+        if state is None:
+            state = _pins[id] = _PinState(1 if pull == Pin.PULL_UP else 0)
+        self._state = state
+        if value is not None:
+            state.level = 1 if value else 0
+
+    def init(self, mode=-1, pull=-1, value=None):
+        if value is not None:
+            self._state.level = 1 if value else 0
+
+    def value(self, v=None):
+        if v is None:
+            return self._state.level
+        self._state.level = 1 if v else 0
+
+    __call__ = value
+
+    def on(self):
+        self._state.level = 1
+
+    def off(self):
+        self._state.level = 0
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, wake=None, hard=False):
+        state = self._state
+        state.handler = handler
+        state.trigger = trigger if handler else 0
+        state.owner = self
+        state.hard = hard
+
+    def __repr__(self):
+        return f"Pin({self.id})"
+
+
+class SPI:
+    """只記錄寫入位元組數的 SPI 匯流排"""
+
+    def __init__(self, id, baudrate=1000000, polarity=0, phase=0, bits=8,
+                 firstbit=0, sck=None, mosi=None, miso=None):
+        self.id = id
+        self.baudrate = baudrate
+        self.bytes_written = 0
+
+    def init(self, baudrate=None, **kwargs):
+        if baudrate:
+            self.baudrate = baudrate
+
+    def deinit(self):
+        pass
+
+    def write(self, buf):
+        self.bytes_written += len(buf)
+
+
+class RTC:
+    """讀寫虛擬時鐘上的 RTC 偏移量"""
+
+    def datetime(self, datetimetuple=None):
+        if datetimetuple is None:
+            us = clock.rtc_us()
+            secs = us // 1000000
+            year, month, mday, hour, minute, second, weekday, _ = gmtime(secs)
+            return (year, month, mday, weekday, hour, minute, second, us % 1000000)
+        year, month, mday, _, hour, minute, second, subsec = datetimetuple
+        secs = calendar.timegm((year, month, mday, hour, minute, second)) - EPOCH_OFFSET
+        clock.rtc_offset_us = secs * 1000000 + subsec - clock.now_us
+
+    def init(self, datetimetuple):
+        self.datetime(datetimetuple)
+
+
+def disable_irq():
+    return 1
+
+
+def enable_irq(state=1):
+    pass
+
+
+def _pin_wake():
+    # 延後匯入，避免與 sim.esp32 互相匯入
+    from sim import esp32
+    return esp32.pin_wake()
+
+
+def lightsleep(time_ms=None):
+    """睡到 time_ms 毫秒後，或 esp32 設定的喚醒腳位到達喚醒電位為止"""
+    global lightsleep_calls, lightsleep_us, _asleep, _wake_reason
+    lightsleep_calls += 1
+    if time_ms is None:
+        t_us = clock.now_us + (1 << 40)
+    else:
+        t_us = clock.now_us + max(0, int(time_ms)) * 1000
+    _asleep = True
+    try:
+        if _pin_wake():
+            slept = 0
+        else:
+            slept = clock.sleep_until(t_us, _pin_wake)
+    finally:
+        _asleep = False
+    lightsleep_us += slept
+    _wake_reason = TIMER_WAKE if clock.now_us >= t_us else PIN_WAKE
+
+
+def wake_reason():
+    return _wake_reason
+
+
+def freq(hz=None):
+    return 240000000
+
+
+def unique_id():
+    return b"\x24\x0a\xc4\x00\x00\x01"
+
+
+def reset():
+    raise SystemExit("machine.reset()")
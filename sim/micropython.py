@@ -0,0 +1,24 @@
+"""micropython 模組的模擬版本"""
+
+
+def const(value):
+    return value
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def schedule(func, arg):
+    func(arg)
+
+
+def mem_info(verbose=None):
+    pass
+
+
+def native(func):
+    return func
+
+
+viper = native
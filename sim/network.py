@@ -0,0 +1,80 @@
+"""network 模組的模擬版本
+
+connect() 後經過 CONNECT_DELAY_MS 虛擬毫秒才變成已連線；
+REACHABLE 設為 False 可模擬找不到基地台；CONNECT_ERRORS 次 connect() 會拋出
+OSError（ESP32 的 WiFi 驅動程式偶爾會這樣）。
+"""
+from sim.clock import clock
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 1000
+STAT_CONNECTING = 1001
+STAT_GOT_IP = 1010
+STAT_NO_AP_FOUND = 201
+
+CONNECT_DELAY_MS = 1500
+REACHABLE = True
+CONNECT_ERRORS = 0
+
+_interfaces = {}
+
+
+class WLAN:
+    def __new__(cls, interface_id=STA_IF):
+        wlan = _interfaces.get(interface_id)
+        if wlan is None:
+            wlan = _interfaces[interface_id] = super().__new__(cls)
+            wlan._active = False
+            wlan._connect_at = None
+            wlan.connect_calls = 0
+        return wlan
+
+    def __init__(self, interface_id=STA_IF):
+        pass
+
+    def active(self, is_active=None):
+        if is_active is None:
+            return self._active
+        self._active = bool(is_active)
+        if not self._active:
+            self._connect_at = None
+
+    def connect(self, ssid=None, key=None):
+        global CONNECT_ERRORS
+        self.connect_calls += 1
+        if CONNECT_ERRORS:
+            CONNECT_ERRORS -= 1
+            raise OSError("Wifi Internal Error")
+        if self._active and REACHABLE:
+            self._connect_at = clock.now_us + CONNECT_DELAY_MS * 1000
+
+    def disconnect(self):
+        self._connect_at = None
+
+    def isconnected(self):
+        return self._connect_at is not None and clock.now_us >= self._connect_at
+
+    def status(self, param=None):
+        if self.isconnected():
+            return STAT_GOT_IP
+        if self._connect_at is not None:
+            return STAT_CONNECTING
+        return STAT_NO_AP_FOUND if self.connect_calls else STAT_IDLE
+
+    def ifconfig(self, config=None):
+        return ("192.168.0.42", "255.255.255.0", "192.168.0.1", "8.8.8.8")
+
+
+def is_up():
+    wlan = _interfaces.get(STA_IF)
+    return wlan is not None and wlan.isconnected()
+
+
+def reset():
+    global CONNECT_DELAY_MS, REACHABLE, CONNECT_ERRORS
+    _interfaces.clear()
+    CONNECT_DELAY_MS = 1500
+    REACHABLE = True
+    CONNECT_ERRORS = 0
@@ -0,0 +1,30 @@
+"""ntptime 模組的模擬版本
+
+settime() 把 RTC 設成虛擬時鐘上的「真實時間」；FAIL 設為 True 可模擬逾時。
+time() 與真實 NTP 相同只有秒的解析度（無條件捨去）。
+"""
+from sim import network
+from sim.clock import clock
+
+host = "pool.ntp.org"
+timeout = 1
+
+LATENCY_MS = 60
+FAIL = False
+
+
+def time():
+    if FAIL or not network.is_up():
+        raise OSError(116)  # ETIMEDOUT
+    clock.advance_us(LATENCY_MS * 1000)
+    return clock.true_us() // 1000000
+
+
+def settime():
+    time()
+    clock.rtc_offset_us = clock.true_us() - clock.now_us
+
+
+def reset():
+    global FAIL
+    FAIL = False
@@ -0,0 +1,334 @@
+"""uasyncio 模組的模擬版本
+
+單執行緒的協作式排程器，時間取自虛擬時鐘：沒有工作可以執行時以
+clock.sleep_us 等到下一個工作到期（會觸發量測工具的 sleep 觀察者與
+排程好的腳位事件），因此與裝置上的 uasyncio 一樣以「幀」為單位量測。
+
+open_connection 依 urequests.route() 的路由回應 HTTP/1.0 請求，連線與
+等待回應的時間以非同步等待模擬，期間其他工作照常執行。CLOSE_ERRORS 次
+wait_closed() 會拋出 OSError（TLS 連線異常結束時裝置上會這樣）。
+SSL_SUPPORTED = False 模擬 open_connection 沒有 ssl 參數的舊版韌體（TypeError）。
+"""
+import heapq
+
+from sim import urequests
+from sim.clock import Halt, clock
+
+# 網路延遲：TCP + TLS 握手、送出請求到收到回應（合計與 urequests.LATENCY_MS 相同）
+CONNECT_MS = 600
+RESPONSE_MS = 300
+CLOSE_ERRORS = 0
+SSL_SUPPORTED = True
+
+
+class CancelledError(BaseException):
+    pass
+
+
+class TimeoutError(Exception):
+    pass
+
+
+class _Yield:
+    """await 時交回排程器；us 為 None 表示暫停到被喚醒為止"""
+    __slots__ = ("us",)
+
+    def __init__(self, us):
+        self.us = us
+
+    def __await__(self):
+        yield self
+
+
+_PARK = _Yield(None)
+
+
+class Task:
+    def __init__(self, coro):
+        self.coro = coro
+        self.finished = False
+        self.result = None
+        self.exception = None
+        self.waiting = []
+        self._token = 0
+        self._cancel = False
+
+    def done(self):
+        return self.finished
+
+    def cancel(self):
+        if self.finished:
+            return False
+        self._cancel = True
+        _schedule(self, clock.now_us)
+        return True
+
+    def __await__(self):
+        if not self.finished:
+            self.waiting.append(_current)
+            yield _PARK
+        if self.exception is not None:
+            raise self.exception
+        return self.result
+
+
+_queue = []
+_seq = 0
+_current = None
+
+
+def _schedule(task, t_us):
+    """把 task 排在 t_us 執行；同一個工作先前的排程會作廢"""
+    global _seq
+    _seq += 1
+    task._token += 1
+    heapq.heappush(_queue, (t_us, _seq, task, task._token))
+
+
+def _finish(task, result=None, exception=None):
+    task.finished = True
+    task.result = result
+    task.exception = exception
+    for waiter in task.waiting:
+        _schedule(waiter, clock.now_us)
+    task.waiting.clear()
+
+
+def _step(task):
+    global _current
+    _current = task
+    try:
+        if task._cancel:
+            task._cancel = False
+            request = task.coro.throw(CancelledError())
+        else:
+            request = task.coro.send(None)
+    except StopIteration as e:
+        _finish(task, e.value)
+        return
+    except (Halt, KeyboardInterrupt):
+        raise
+    except BaseException as e:
+        _finish(task, exception=e)
+        if not isinstance(e, CancelledError) and task is not _main:
+            # 與 uasyncio 的預設例外處理相同：印出後繼續執行其他工作
+            import traceback
+            print("Task exception wasn't retrieved")
+            traceback.print_exception(e)
+        return
+    finally:
+        _current = None
+    if request.us is not None:
+        _schedule(task, clock.now_us + request.us)
+
+
+_main = None
+
+
+def create_task(coro):
+    task = Task(coro)
+    _schedule(task, clock.now_us)
+    return task
+
+
+def current_task():
+    return _current
+
+
+def run(coro):
+    """執行 coro 直到結束；虛擬時間到期時 Halt 會從這裡拋出"""
+    global _main
+    _main = create_task(coro)
+    main = _main
+    while not main.finished:
+        if not _queue:
+            raise RuntimeError("所有工作都在等待，沒有可執行的工作")
+        t_us, _, task, token = _queue[0]
+        if token != task._token or task.finished:
+            heapq.heappop(_queue)
+            continue
+        if t_us > clock.now_us:
+            # 等待期間中斷處理函式可能 set() ThreadSafeFlag，排入更早的工作
+            clock.sleep_until(t_us, lambda: _queue[0][0] < t_us)
+            continue
+        heapq.heappop(_queue)
+        _step(task)
+    if main.exception is not None:
+        raise main.exception
+    return main.result
+
+
+def new_event_loop():
+    """捨棄所有排程中的工作"""
+    global _main
+    _queue.clear()
+    _main = None
+
+
+def reset():
+    global CLOSE_ERRORS, SSL_SUPPORTED
+    CLOSE_ERRORS = 0
+    SSL_SUPPORTED = True
+    new_event_loop()
+
+
+def sleep_ms(ms):
+    return _Yield(max(0, int(ms)) * 1000)
+
+
+def sleep(seconds):
+    return _Yield(max(0, int(seconds * 1000000)))
+
+
+async def wait_for_ms(awaitable, timeout_ms):
+    """等待 awaitable 完成，逾時拋出 TimeoutError（只支援 Task 與 Event.wait()）"""
+    if not isinstance(awaitable, Task):
+        awaitable = create_task(awaitable)
+    task = awaitable
+
+    async def timer():
+        await sleep_ms(timeout_ms)
+        if not task.finished:
+            task.cancel()
+
+    timeout = create_task(timer())
+    try:
+        return await task
+    except CancelledError:
+        if timeout.finished:
+            raise TimeoutError()
+        task.cancel()
+        raise
+    finally:
+        timeout.cancel()
+
+
+def wait_for(awaitable, timeout):
+    return wait_for_ms(awaitable, int(timeout * 1000))
+
+
+async def gather(*awaitables):
+    results = []
+    for aw in awaitables:
+        results.append(await (aw if isinstance(aw, Task) else create_task(aw)))
+    return results
+
+
+class Event:
+    def __init__(self):
+        self.state = False
+        self.waiting = []
+
+    def is_set(self):
+        return self.state
+
+    def set(self):
+        self.state = True
+        for task in self.waiting:
+            _schedule(task, clock.now_us)
+        self.waiting.clear()
+
+    def clear(self):
+        self.state = False
+
+    async def wait(self):
+        if not self.state:
+            self.waiting.append(_current)
+            await _PARK
+        return True
+
+
+class ThreadSafeFlag:
+    """可以在中斷處理函式中 set() 的旗標"""
+
+    def __init__(self):
+        self.state = False
+        self.waiting = None
+
+    def set(self):
+        self.state = True
+        if self.waiting is not None:
+            _schedule(self.waiting, clock.now_us)
+            self.waiting = None
+
+    def clear(self):
+        self.state = False
+
+    async def wait(self):
+        if not self.state:
+            self.waiting = _current
+            await _PARK
+        self.state = False
+
+
+class Stream:
+    """open_connection 回傳的讀寫串流（讀寫共用同一個物件）"""
+
+    def __init__(self, scheme, host):
+        self._scheme = scheme
+        self._host = host
+        self._out = bytearray()
+        self._response = None
+        self._pos = 0
+        self._ready_us = 0
+
+    def write(self, buf):
+        self._out += buf
+
+    async def drain(self):
+        if self._response is None and b"\r\n\r\n" in self._out:
+            path = bytes(self._out).split(b"\r\n", 1)[0].split(b" ")[1].decode()
+            status, body = urequests.dispatch(f"{self._scheme}://{self._host}{path}")
+            header = f"HTTP/1.0 {status} OK\r\nContent-Length: {len(body)}\r\n\r\n"
+            self._response = header.encode() + body
+            self._ready_us = clock.now_us + RESPONSE_MS * 1000
+        await sleep_ms(0)
+
+    async def _available(self):
+        if self._response is None:
+            return 0
+        if clock.now_us < self._ready_us:
+            await _Yield(self._ready_us - clock.now_us)
+        return len(self._response) - self._pos
+
+    async def read(self, n=-1):
+        available = await self._available()
+        if n < 0 or n > available:
+            n = available
+        chunk = self._response[self._pos:self._pos + n] if n else b""
+        self._pos += n
+        return chunk
+
+    async def readinto(self, buf):
+        chunk = await self.read(len(buf))
+        buf[:len(chunk)] = chunk
+        return len(chunk)
+
+    async def readline(self):
+        available = await self._available()
+        if not available:
+            return b""
+        end = self._response.find(b"\n", self._pos)
+        end = len(self._response) if end < 0 else end + 1
+        line = self._response[self._pos:end]
+        self._pos = end
+        return line
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        global CLOSE_ERRORS
+        if CLOSE_ERRORS:
+            CLOSE_ERRORS -= 1
+            raise OSError(113)  # ECONNABORTED
+
+
+async def open_connection(host, port, ssl=None, server_hostname=None):
+    if ssl is not None and not SSL_SUPPORTED:
+        raise TypeError("unexpected keyword argument 'ssl'")
+    urequests.check_network()
+    await sleep_ms(CONNECT_MS)
+    urequests.check_network()
+    stream = Stream("https" if ssl else "http", host)
+    return stream, stream
@@ -0,0 +1,115 @@
+"""urequests 模組的模擬版本
+
+請求依 URL 前綴分派給 route() 註冊的處理函式，處理函式回傳
+(status_code, body_bytes)。URL 含有未編碼的非 ASCII 字元時與伺服器一樣回應 400。每次請求會阻塞推進 LATENCY_MS 虛擬毫秒
+（TLS 握手加傳輸），與裝置上 urequests.get 的阻塞行為一致。
+"""
+import json as _json
+
+from sim import gc, network
+from sim.clock import clock
+
+LATENCY_MS = 900
+
+_routes = []
+requests_made = 0
+bytes_served = 0
+
+
+def route(prefix, handler):
+    _routes.append((prefix, handler))
+
+
+def reset():
+    global LATENCY_MS, requests_made, bytes_served
+    _routes.clear()
+    LATENCY_MS = 900
+    requests_made = 0
+    bytes_served = 0
+
+
+class _Stream:
+    """Response.raw：以 read / readinto 分段讀取回應內容"""
+
+    def __init__(self, body):
+        self._body = body
+        self._pos = 0
+
+    def read(self, size=-1):
+        body = self._body
+        if size is None or size < 0:
+            size = len(body) - self._pos
+        chunk = body[self._pos:self._pos + size]
+        self._pos += len(chunk)
+        return chunk
+
+    def readinto(self, buf, size=None):
+        if size is None:
+            size = len(buf)
+        chunk = self.read(size)
+        buf[:len(chunk)] = chunk
+        return len(chunk)
+
+    def close(self):
+        pass
+
+
+class Response:
+    def __init__(self, status_code, body, reason=b"OK"):
+        self.status_code = status_code
+        self.reason = reason
+        self.encoding = "utf-8"
+        self.raw = _Stream(body)
+        self._cached = None
+
+    @property
+    def content(self):
+        if self._cached is None:
+            self._cached = self.raw.read()
+        return self._cached
+
+    @property
+    def text(self):
+        return str(self.content, self.encoding)
+
+    def json(self):
+        return _json.loads(self.content)
+
+    def close(self):
+        self.raw.close()
+
+
+def check_network():
+    if not network.is_up():
+        # 與 ESP32 上未連線時 getaddrinfo 的錯誤相同
+        raise OSError(-202)
+
+
+def dispatch(url):
+    """交給 route() 註冊的處理函式，回傳 (status_code, body)；不推進時間"""
+    global requests_made, bytes_served
+    requests_made += 1
+    if not url.isascii():
+        return 400, b'{"message":"Bad Request"}'
+    for prefix, handler in _routes:
+        if url.startswith(prefix):
+            with gc.host_only():
+                status, body = handler(url)
+            bytes_served += len(body)
+            return status, body
+    raise OSError(-202)
+
+
+def request(method, url, data=None, json=None, headers=None, stream=None, timeout=None):
+    check_network()
+    clock.advance_us(LATENCY_MS * 1000)
+    status, body = dispatch(url)
+    return Response(status, body)
+
+
+def get(url, **kw):
+    return request("GET", url, **kw)
+
+
+def post(url, **kw):
+    return request("POST", url, **kw)
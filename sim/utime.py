@@ -0,0 +1,72 @@
+"""MicroPython time 模組的模擬版本
+
+ticks_* 與 sleep_* 以虛擬時鐘實作；time() / localtime() 依 MicroPython
+ESP32 的行為使用 2000-01-01 紀元並讀取 RTC。其餘屬性轉交給 CPython 的 time。
+"""
+import calendar
+import time as _time
+
+from sim.clock import clock, TICKS_PERIOD, TICKS_HALFPERIOD
+
+# Unix 紀元與 MicroPython 2000 紀元的差
+EPOCH_OFFSET = 946684800
+
+
+def ticks_ms():
+    return (clock.now_us // 1000) % TICKS_PERIOD
+
+
+def ticks_us():
+    return clock.now_us % TICKS_PERIOD
+
+
+def ticks_cpu():
+    return ticks_us()
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) % TICKS_PERIOD
+
+
+def ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2 + TICKS_HALFPERIOD) % TICKS_PERIOD) - TICKS_HALFPERIOD
+
+
+def sleep(seconds):
+    clock.sleep_us(seconds * 1000000)
+
+
+def sleep_ms(ms):
+    clock.sleep_us(ms * 1000)
+
+
+def sleep_us(us):
+    clock.sleep_us(us)
+
+
+def time():
+    return clock.rtc_us() // 1000000
+
+
+def time_ns():
+    return clock.rtc_us() * 1000
+
+
+def gmtime(secs=None):
+    if secs is None:
+        secs = time()
+    t = _time.gmtime(secs + EPOCH_OFFSET)
+    return (t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec,
+            t.tm_wday, t.tm_yday)
+
+
+localtime = gmtime
+
+
+def mktime(t):
+    year, month, mday, hour, minute, second = t[:6]
+    return calendar.timegm((year, month, mday, hour, minute, second)) - EPOCH_OFFSET
+
+
+def __getattr__(name):
+    return getattr(_time, name)
@@ -0,0 +1,17 @@
+"""vga1_8x16 字型的模擬版本
+
+尺寸與字元範圍和真實字型相同；字形是依字元碼產生的固定圖樣，
+只用於畫面比對與傳輸統計，不代表實際外觀。
+"""
+WIDTH = 8
+HEIGHT = 16
+FIRST = 0x20
+LAST = 0x7F
+
+_FONT = bytes(
+    0 if ch == 0x20 else (ch * 37 + row * 11) & 0xFF
+    for ch in range(FIRST, LAST)
+    for row in range(HEIGHT)
+)
+
+FONT = memoryview(_FONT)
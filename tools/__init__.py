@@ -0,0 +1 @@
+"""主機端工具（只在電腦上使用，不需上傳）"""
@@ -0,0 +1,258 @@
+"""python -m tools.png2rle：把 PNG 圖示轉成 ui.IconRenderer 從 flash 串流繪製的 RLE 檔
+
+只用標準函式庫解碼 PNG（灰階、RGB、調色盤與含 alpha 的格式，位元深度最多 8，
+不支援交錯）。半透明像素先與背景色（預設黑色，與主畫面相同）混合再轉成 RGB565。
+
+輸出格式：b"RL"、寬、高（各 1 位元組），接著逐列的封包，封包不跨列：
+- 控制位元組 c >= 0x80：下一個像素重複 c - 127 次（最多 128 次）
+- c < 0x80：接著 c + 1 個像素原樣複製
+像素為大端序 RGB565，與 blit_buffer 相同。
+
+    python -m tools.png2rle assets/icons/*.png -o icons
+"""
+import argparse
+import os
+import struct
+import sys
+import zlib
+
+MAGIC = b"RL"
+MAX_SIZE = 255  # 寬高各用 1 位元組
+MAX_PACKET = 128  # 每個封包最多的像素數
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# 色彩類型 -> 每個像素的樣本數
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+def _paeth(a, b, c):
+    p = a + b - c
+    pa = abs(p - a)
+    pb = abs(p - b)
+    pc = abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+
+def _unfilter(data, width, height, bpp, row_bytes):
+    """還原每列的 PNG 濾波，回傳各列的位元組"""
+    rows = []
+    prev = bytearray(row_bytes)
+    pos = 0
+    for _ in range(height):
+        kind = data[pos]
+        row = bytearray(data[pos + 1:pos + 1 + row_bytes])
+        pos += 1 + row_bytes
+        if kind == 1:
+            for i in range(bpp, row_bytes):
+                row[i] = (row[i] + row[i - bpp]) & 0xFF
+        elif kind == 2:
+            for i in range(row_bytes):
+                row[i] = (row[i] + prev[i]) & 0xFF
+        elif kind == 3:
+            for i in range(row_bytes):
+                left = row[i - bpp] if i >= bpp else 0
+                row[i] = (row[i] + ((left + prev[i]) >> 1)) & 0xFF
+        elif kind == 4:
+            for i in range(row_bytes):
+                left = row[i - bpp] if i >= bpp else 0
+                upper_left = prev[i - bpp] if i >= bpp else 0
+                row[i] = (row[i] + _paeth(left, prev[i], upper_left)) & 0xFF
+        elif kind != 0:
+            raise ValueError(f"未知的 PNG 濾波類型 {kind}")
+        rows.append(row)
+        prev = row
+    return rows
+
+
+def _samples(row, count, depth):
+    """把一列拆成 count 個 depth 位元的樣本"""
+    if depth == 8:
+        return row[:count]
+    per_byte = 8 // depth
+    mask = (1 << depth) - 1
+    return [(row[i // per_byte] >> (8 - depth * (i % per_byte + 1))) & mask for i in range(count)]
+
+
+def read_png(path):
+    """讀取 PNG，回傳 (寬, 高, 各列的 (r, g, b, a) 像素)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError(f"{path} 不是 PNG 檔")
+    pos = len(PNG_SIGNATURE)
+    header = None
+    palette = []
+    alpha = b""
+    idat = []
+    while pos + 8 <= len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", body)
+        elif kind == b"PLTE":
+            palette = [tuple(body[i:i + 3]) for i in range(0, len(body), 3)]
+        elif kind == b"tRNS":
+            alpha = body
+        elif kind == b"IDAT":
+            idat.append(body)
+        elif kind == b"IEND":
+            break
+    if header is None:
+        raise ValueError(f"{path} 缺少 IHDR")
+    width, height, depth, color_type, _, _, interlace = header
+    if color_type not in PNG_CHANNELS or depth > 8 or (color_type in (2, 4, 6) and depth != 8):
+        raise ValueError(f"{path}：不支援的格式（色彩類型 {color_type}，{depth} 位元）")
+    if interlace:
+        raise ValueError(f"{path}：不支援交錯 PNG")
+
+    channels = PNG_CHANNELS[color_type]
+    row_bytes = (width * channels * depth + 7) // 8
+    bpp = max(1, channels * depth // 8)
+    rows = _unfilter(zlib.decompress(b"".join(idat)), width, height, bpp, row_bytes)
+
+    pixels = []
+    for row in rows:
+        values = _samples(row, width * channels, depth)
+        out = []
+        if color_type == 3:
+            for index in values:
+                r, g, b = palette[index]
+                out.append((r, g, b, alpha[index] if index < len(alpha) else 255))
+        elif color_type == 0:
+            scale = 255 // ((1 << depth) - 1)
+            for v in values:
+                out.append((v * scale, v * scale, v * scale, 255))
+        elif color_type == 4:
+            for i in range(0, len(values), 2):
+                out.append((values[i], values[i], values[i], values[i + 1]))
+        elif color_type == 2:
+            for i in range(0, len(values), 3):
+                out.append((values[i], values[i + 1], values[i + 2], 255))
+        else:
+            for i in range(0, len(values), 4):
+                out.append(tuple(values[i:i + 4]))
+        pixels.append(out)
+    return width, height, pixels
+
+
+def color565(red, green, blue):
+    """與 gc9a01.color565 相同的轉換"""
+    return (red & 0xF8) << 8 | (green & 0xFC) << 3 | blue >> 3
+
+
+def to_rgb565(pixels, background=(0, 0, 0)):
+    """與背景色混合後轉成 RGB565，回傳各列的整數像素"""
+    br, bg, bb = background
+    rows = []
+    for row in pixels:
+        out = []
+        for r, g, b, a in row:
+            if a < 255:
+                r = (r * a + br * (255 - a) + 127) // 255
+                g = (g * a + bg * (255 - a) + 127) // 255
+                b = (b * a + bb * (255 - a) + 127) // 255
+            out.append(color565(r, g, b))
+        rows.append(out)
+    return rows
+
+
+def _encode_row(row, out):
+    """把一列 RGB565 像素編碼成封包，附加到 out"""
+    n = len(row)
+    i = 0
+    literal = []
+    while i < n:
+        run = 1
+        while i + run < n and run < MAX_PACKET and row[i + run] == row[i]:
+            run += 1
+        if run >= 2:
+            _flush_literal(literal, out)
+            out.append(0x80 | (run - 1))
+            out += struct.pack(">H", row[i])
+            i += run
+        else:
+            literal.append(row[i])
+            if len(literal) == MAX_PACKET:
+                _flush_literal(literal, out)
+            i += 1
+    _flush_literal(literal, out)
+
+
+def _flush_literal(literal, out):
+    if literal:
+        out.append(len(literal) - 1)
+        out += struct.pack(f">{len(literal)}H", *literal)
+        literal.clear()
+
+
+def encode(rows):
+    """把 RGB565 像素列編碼成 RLE 檔的內容"""
+    height = len(rows)
+    width = len(rows[0]) if rows else 0
+    if not (0 < width <= MAX_SIZE and 0 < height <= MAX_SIZE):
+        raise ValueError(f"圖示大小 {width}x{height} 超出 1..{MAX_SIZE}")
+    out = bytearray(MAGIC)
+    out += bytes((width, height))
+    for row in rows:
+        _encode_row(row, out)
+    return bytes(out)
+
+
+def decode(data):
+    """解碼 RLE 檔，回傳各列的 RGB565 像素（檢查轉換結果用）"""
+    if data[:2] != MAGIC:
+        raise ValueError("不是 RLE 圖示")
+    width, height = data[2], data[3]
+    pixels = []
+    pos = 4
+    while len(pixels) < width * height:
+        c = data[pos]
+        if c & 0x80:
+            pixels += [data[pos + 1] << 8 | data[pos + 2]] * (c - 127)
+            pos += 3
+        else:
+            count = c + 1
+            pixels += struct.unpack(f">{count}H", data[pos + 1:pos + 1 + 2 * count])
+            pos += 1 + 2 * count
+    return [pixels[y * width:(y + 1) * width] for y in range(height)]
+
+
+def convert(path, background=(0, 0, 0)):
+    """把 PNG 轉成 RLE 檔的內容"""
+    _, _, pixels = read_png(path)
+    return encode(to_rgb565(pixels, background))
+
+
+def _parse_color(text):
+    value = int(text.lstrip("#"), 16)
+    return value >> 16, (value >> 8) & 0xFF, value & 0xFF
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tools.png2rle", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("png", nargs="+")
+    parser.add_argument("-o", "--output", default="icons", help="輸出目錄（預設 icons）")
+    parser.add_argument("--background", type=_parse_color, default=(0, 0, 0),
+                        help="透明像素混合的背景色，例如 000000")
+    args = parser.parse_args(argv)
+    os.makedirs(args.output, exist_ok=True)
+    for path in args.png:
+        try:
+            data = convert(path, args.background)
+        except (OSError, ValueError) as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            return 1
+        name = os.path.splitext(os.path.basename(path))[0] + ".rle"
+        with open(os.path.join(args.output, name), "wb") as f:
+            f.write(data)
+        raw = data[2] * data[3] * 2
+        print(f"{name}: {data[2]}x{data[3]}, {len(data)} B（未壓縮 {raw} B，{len(data) / raw:.0%}）")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main_cli())
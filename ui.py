@@ -0,0 +1,348 @@
+"""畫面共用的設定與元件：螢幕大小、顏色、文字點陣快取、RLE 圖示與保留式欄位
+
+main.py 與應用程式模組（app_*.py）都從這裡匯入，應用程式不需要匯入 main。
+"""
+import gc9a01
+import vga1_8x16 as font
+
+# 螢幕設定
+SCREEN_WIDTH = 240
+SCREEN_HEIGHT = 240
+# 最下方一行保留給效能資訊（PROFILE），應用程式不要畫到這一行；圓形螢幕在這裡約 12 個字元寬
+OVERLAY_X = 72
+OVERLAY_Y = 216
+
+# 顏色定義
+BLACK = gc9a01.BLACK
+WHITE = gc9a01.WHITE
+RED = gc9a01.RED
+GREEN = gc9a01.GREEN
+BLUE = gc9a01.BLUE
+YELLOW = gc9a01.color565(255, 255, 0)
+GRAY = gc9a01.color565(128, 128, 128)
+ORANGE = gc9a01.color565(255, 165, 0)
+
+# 文字點陣快取的容量（位元組）；8x16 字型每個字元 256 位元組
+GLYPH_BYTES = font.WIDTH * font.HEIGHT * 2
+TEXT_CACHE_BYTES = 4 * 1024
+
+# RLE 圖示每次解碼後傳送的列數；解碼緩衝區為 寬 x 列數 x 2 位元組（40 像素寬 640 位元組）
+ICON_CHUNK_ROWS = 8
+ICON_PACKET_MAX = 1 + 128 * 2  # 最長的封包：控制位元組加 128 個像素
+# 每次從 flash 讀取的位元組；至少兩個最長的封包，搬移剩餘資料時來源與目的不重疊
+ICON_READ_BYTES = 2 * ICON_PACKET_MAX - 2
+
+
+class TextRenderer:
+    """文字點陣快取：把文字轉成 RGB565 點陣，每段文字只用一次 blit_buffer
+
+    不含數字的短字串整段快取；含數字的字串（時間、分數）與超過容量四分之一的
+    長字串由快取的單一字元拼成，避免每分鐘都新增一筆整段快取，也避免一段長字串
+    擠掉其他項目。快取總量超過 max_bytes 時淘汰最久沒用到的項目。
+    只支援寬度 8 的字型（每列一個位元組）。
+    """
+    def __init__(self, max_bytes=TEXT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.cache = {}  # (文字, 前景色, 背景色) -> [點陣, 最後使用序號]
+        self.size = 0
+        self.uses = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._scratch = bytearray(0)  # 拼字用的緩衝區，只會變大
+    
+    def text(self, display, text, x, y, color, background=BLACK):
+        """在 (x, y) 畫出文字"""
+        n = len(text)
+        if not n:
+            return
+        if n * GLYPH_BYTES > self.max_bytes // 4:
+            # 長字串整段快取會擠掉其他項目，改由單一字元拼成
+            buf = self._compose(text, color, background)
+        else:
+            for ch in text:
+                if '0' <= ch <= '9':
+                    buf = self._compose(text, color, background)
+                    break
+            else:
+                buf = self._lookup(text, color, background)
+        display.blit_buffer(buf, x, y, n * font.WIDTH, font.HEIGHT)
+    
+    def clear(self):
+        """清空快取並釋放拼字緩衝區（應用程式卸載時呼叫，讓它的字串也能回收）"""
+        self.cache = {}
+        self.size = 0
+        self._scratch = bytearray(0)
+    
+    def _lookup(self, text, color, background):
+        """取得整段文字的點陣，沒有快取時轉換並存入"""
+        key = (text, color, background)
+        self.uses += 1
+        entry = self.cache.get(key)
+        if entry:
+            self.hits += 1
+            entry[1] = self.uses
+            return entry[0]
+        
+        self.misses += 1
+        buf = self._render(text, color, background)
+        if len(buf) <= self.max_bytes:
+            while self.size + len(buf) > self.max_bytes:
+                self._evict()
+            self.cache[key] = [buf, self.uses]
+            self.size += len(buf)
+        return buf
+    
+    def _evict(self):
+        """淘汰最久沒用到的項目"""
+        oldest = None
+        oldest_use = self.uses + 1
+        for key, entry in self.cache.items():
+            if entry[1] < oldest_use:
+                oldest = key
+                oldest_use = entry[1]
+        self.size -= len(self.cache.pop(oldest)[0])
+        self.evictions += 1
+    
+    def _compose(self, text, color, background):
+        """由快取的單一字元拼出整段文字的點陣"""
+        row = font.WIDTH * 2
+        stride = len(text) * row
+        size = stride * font.HEIGHT
+        if len(self._scratch) < size:
+            self._scratch = bytearray(size)
+        scratch = self._scratch
+        for i in range(len(text)):
+            glyph = memoryview(self._lookup(text[i], color, background))
+            dst = i * row
+            for src in range(0, row * font.HEIGHT, row):
+                scratch[dst:dst + row] = glyph[src:src + row]
+                dst += stride
+        return memoryview(scratch)[:size]
+    
+    def _render(self, text, color, background):
+        """把文字轉成大端序 RGB565 點陣"""
+        # 半個位元組（4 個像素）對應的 8 個位元組
+        pixels = ((background >> 8, background & 0xFF), (color >> 8, color & 0xFF))
+        nibbles = []
+        for bits in range(16):
+            chunk = bytearray(8)
+            for p in range(4):
+                chunk[2 * p], chunk[2 * p + 1] = pixels[(bits >> (3 - p)) & 1]
+            nibbles.append(chunk)
+        
+        row = font.WIDTH * 2
+        stride = len(text) * row
+        buf = bytearray(stride * font.HEIGHT)
+        glyphs = font.FONT
+        for i in range(len(text)):
+            code = ord(text[i])
+            dst = i * row
+            # 字型沒有的字元（例如中文）畫成背景色
+            has_glyph = font.FIRST <= code < font.LAST
+            base = (code - font.FIRST) * font.HEIGHT
+            for r in range(font.HEIGHT):
+                bits = glyphs[base + r] if has_glyph else 0
+                buf[dst:dst + 8] = nibbles[bits >> 4]
+                buf[dst + 8:dst + 16] = nibbles[bits & 0x0F]
+                dst += stride
+        return buf
+
+text_renderer = TextRenderer()
+
+class IconRenderer:
+    """從 flash 串流解碼 RLE 壓縮的 RGB565 圖示，每解碼 chunk_rows 列就傳送一次
+
+    檔案由 tools/png2rle.py 產生：b"RL"、寬、高（各 1 位元組），接著逐列的封包。
+    控制位元組 c >= 0x80 時下一個像素重複 c - 127 次，否則接著 c + 1 個像素原樣
+    複製；像素為大端序 RGB565。讀取與解碼的緩衝區第一次使用時配置後重複使用，
+    整張圖示不會同時存在記憶體中。
+    """
+    def __init__(self, chunk_rows=ICON_CHUNK_ROWS):
+        self.chunk_rows = chunk_rows
+        self._src = bytearray(0)  # flash 讀取緩衝區
+        self._rows = bytearray(0)  # 解碼後的列，只會變大
+        self.draws = 0
+        self.failures = 0
+    
+    def draw(self, display, path, x, y):
+        """在 (x, y) 畫出圖示，回傳 (寬, 高)；檔案不存在或損壞時回傳 None"""
+        try:
+            f = open(path, "rb")
+        except OSError:
+            self.failures += 1
+            return None
+        try:
+            size = self._stream(display, f, x, y)
+        finally:
+            f.close()
+        if size is None:
+            self.failures += 1
+        else:
+            self.draws += 1
+        return size
+    
+    def _stream(self, display, f, x, y):
+        if not self._src:
+            self._src = bytearray(ICON_READ_BYTES)
+        src = self._src
+        view = memoryview(src)
+        end = f.readinto(src)
+        if end < 4 or src[0] != 0x52 or src[1] != 0x4C:  # b"RL"
+            return None
+        width = src[2]
+        height = src[3]
+        stride = width * 2
+        if len(self._rows) < stride * self.chunk_rows:
+            self._rows = bytearray(stride * self.chunk_rows)
+        rows = self._rows
+        out = memoryview(rows)
+        more = end == len(src)
+        pos = 4
+        row = 0
+        while row < height:
+            n = min(self.chunk_rows, height - row)
+            size = n * stride
+            dst = 0
+            while dst < size:
+                # 剩下不到一個最長的封包時，把剩餘的資料搬到開頭再讀
+                if more and end - pos < ICON_PACKET_MAX:
+                    left = end - pos
+                    view[:left] = view[pos:end]
+                    got = f.readinto(view[left:])
+                    more = got == len(src) - left
+                    end = left + got
+                    pos = 0
+                if pos >= end:
+                    return None
+                c = src[pos]
+                if c & 0x80:
+                    count = (c - 127) * 2
+                    if pos + 3 > end or dst + count > size:
+                        return None
+                    rows[dst] = src[pos + 1]
+                    rows[dst + 1] = src[pos + 2]
+                    # 倍增複製，不逐像素執行迴圈
+                    done = 2
+                    while done < count:
+                        k = min(done, count - done)
+                        out[dst + done:dst + done + k] = out[dst:dst + k]
+                        done += k
+                    pos += 3
+                else:
+                    count = (c + 1) * 2
+                    if pos + 1 + count > end or dst + count > size:
+                        return None
+                    out[dst:dst + count] = view[pos + 1:pos + 1 + count]
+                    pos += 1 + count
+                dst += count
+            display.blit_buffer(out[:size], x, y + row, width, n)
+            row += n
+        return width, height
+
+icon_renderer = IconRenderer()
+
+class TextField:
+    """保留式文字欄位：記住上次顯示的內容，只重畫有變動的字元"""
+    def __init__(self, x, y, color):
+        self.x = x
+        self.y = y
+        self.color = color
+        self.value = ""
+        self.drawn_color = None
+    
+    def invalidate(self):
+        """畫面已被清除，下次更新時完整重畫"""
+        self.value = ""
+        self.drawn_color = None
+    
+    def update(self, display, value, color=None):
+        """更新欄位內容，回傳是否有繪圖"""
+        if color is None:
+            color = self.color
+        old = self.value
+        if value == old and color == self.drawn_color:
+            return False
+        
+        width = font.WIDTH
+        common = min(len(value), len(old))
+        if color != self.drawn_color:
+            # 顏色改變，整個欄位重畫
+            common = 0
+        
+        # 重畫內容不同的連續字元（文字背景色會蓋掉舊字）
+        i = 0
+        while i < common:
+            if value[i] == old[i]:
+                i += 1
+                continue
+            j = i + 1
+            while j < common and value[j] != old[j]:
+                j += 1
+            self._draw(display, value[i:j], i, color)
+            i = j
+        if len(value) > common:
+            self._draw(display, value[common:], common, color)
+        
+        # 新內容較短時清除多出來的舊字
+        if len(old) > len(value):
+            display.fill_rect(self.x + len(value) * width, self.y,
+                              (len(old) - len(value)) * width, font.HEIGHT, BLACK)
+        
+        self.value = value
+        self.drawn_color = color
+        return True
+    
+    def overlaps(self, x0, y0, x1, y1):
+        """目前的文字是否與矩形 [x0, x1) x [y0, y1) 重疊"""
+        return (self.value != "" and x0 < self.x + len(self.value) * font.WIDTH and x1 > self.x
+                and y0 < self.y + font.HEIGHT and y1 > self.y)
+    
+    def repaint(self, display):
+        """重畫目前的內容（被其他圖形蓋掉後使用）"""
+        if self.value:
+            self._draw(display, self.value, 0, self.drawn_color)
+    
+    def _draw(self, display, text, index, color):
+        """畫出從第 index 個字元開始的一段文字"""
+        text_renderer.text(display, text, self.x + index * font.WIDTH, self.y, color, BLACK)
+
+class IconField:
+    """保留式圖示欄位：記住上次畫的圖示檔，只在改變時從 flash 重畫"""
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.value = ""  # 圖示檔路徑，"" 表示空白
+        self.width = 0  # 畫面上圖示的大小，畫不出來時為 0
+        self.height = 0
+    
+    def invalidate(self):
+        """畫面已被清除，下次更新時完整重畫"""
+        self.value = ""
+        self.width = self.height = 0
+    
+    def update(self, display, path):
+        """更新欄位的圖示（"" 清除），回傳是否有繪圖"""
+        if path == self.value:
+            return False
+        old_width, old_height = self.width, self.height
+        size = icon_renderer.draw(display, path, self.x, self.y) if path else None
+        self.width, self.height = size or (0, 0)
+        # 新圖示較小或畫不出來時清除多出來的舊圖
+        if old_width > self.width:
+            display.fill_rect(self.x + self.width, self.y, old_width - self.width, old_height, BLACK)
+        if old_height > self.height:
+            display.fill_rect(self.x, self.y + self.height, min(old_width, self.width),
+                              old_height - self.height, BLACK)
+        self.value = path
+        return True
+    
+    def overlaps(self, x0, y0, x1, y1):
+        """目前的圖示是否與矩形 [x0, x1) x [y0, y1) 重疊"""
+        return (self.width > 0 and x0 < self.x + self.width and x1 > self.x
+                and y0 < self.y + self.height and y1 > self.y)
+    
+    def repaint(self, display):
+        """重畫目前的圖示（被其他圖形蓋掉後使用）"""
+        if self.width:
+            icon_renderer.draw(display, self.value, self.x, self.y)